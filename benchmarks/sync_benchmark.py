@@ -0,0 +1,129 @@
+"""
+Benchmarks syncing the database with the Replit Migrator Database Server, using the bundled
+local server. Reports the latency, payload bytes and peak client memory of uploads and downloads.
+
+Run this file as a module from the top level directory of this project:
+`python -m benchmarks.sync_benchmark [--migrations 5] [--projects 2000] [--messages 1000] [--legacy]`
+
+Memory is traced with tracemalloc, which slows the timed operations. Pass --no-memory for
+accurate latencies.
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import requests
+
+from replit_migrator.database_handler import DatabaseHandler
+from benchmarks.write_projects_benchmark import generate_projects
+
+
+USERNAME = 'benchmark'
+PASSWORD = 'benchmark'
+
+
+def start_server(legacy):
+    """
+    Starts the local server in a separate process, so that its work is not counted as client memory.
+    Returns the process and the server's API root URL.
+    """
+
+    command = [sys.executable, '-m', 'replit_migrator.local_server', '--port', '0']
+    if legacy:
+        command.append('--no-streaming')
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+
+    # The server prints its URL once it is ready.
+    url = process.stdout.readline().split()[-1]
+
+    return process, url
+
+
+def populate_database(data_handler, n_migrations, n_projects, n_messages):
+    """
+    Fills a database with migrations of n_projects projects each, and n_messages chat messages.
+    """
+
+    for i in range(n_migrations):
+        migration_id = data_handler.create_migration_table(time.strftime('%Y-%m-%d %H:%M:%S'))
+        data_handler.write_projects(generate_projects(n_projects, version=i), migration_id)
+
+    messages = [{'role': 'user' if i % 2 == 0 else 'assistant', 'content': f'Message {i} about my Repls.'} for i in range(n_messages)]
+    data_handler.append_chat_messages(messages, data_handler.get_latest_conversation_id())
+
+
+def measure(label, api_root_url, trace_memory, function):
+    """
+    Runs a single sync operation and prints its latency, payload bytes and peak client memory.
+    """
+
+    # Reset the server's traffic counts.
+    requests.get(f'{api_root_url}stats/')
+
+    if trace_memory:
+        tracemalloc.start()
+    start_time = time.perf_counter()
+    function()
+    elapsed = time.perf_counter() - start_time
+    peak_memory = tracemalloc.get_traced_memory()[1] if trace_memory else None
+    if trace_memory:
+        tracemalloc.stop()
+
+    traffic = requests.get(f'{api_root_url}stats/').json()
+    memory = f'{peak_memory / 1024**2:>10.1f} MiB' if peak_memory is not None else f'{"-":>14}'
+    print(f'{label:<32}{elapsed:>10.3f} s{traffic["bytes_received"]:>14,} B{traffic["bytes_sent"]:>14,} B{memory}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark DatabaseHandler uploads to and downloads from the Replit Migrator Database Server.')
+    parser.add_argument('--migrations', type=int, default=5, help='Number of migrations in the database.')
+    parser.add_argument('--projects', type=int, default=2000, help='Number of projects in each migration.')
+    parser.add_argument('--messages', type=int, default=1000, help='Number of chat messages in the database.')
+    parser.add_argument('--legacy', action='store_true', help='Sync without the streaming endpoint, like with an older server.')
+    parser.add_argument('--no-memory', action='store_true', help='Do not trace memory usage, which slows syncing.')
+    args = parser.parse_args()
+
+    process, api_root_url = start_server(args.legacy)
+    trace_memory = not args.no_memory
+
+    try:
+        # Register the benchmark user, as the login screen does.
+        requests.post(f'{api_root_url}register/', data={'username': USERNAME, 'password': PASSWORD})
+
+        with tempfile.TemporaryDirectory() as directory:
+            # Databases are not logged in, so writes are not uploaded until requested below.
+            data_handler = DatabaseHandler(os.path.join(directory, 'upload.sqlite3'), api_root_url)
+            populate_database(data_handler, args.migrations, args.projects, args.messages)
+            fresh_data_handler = DatabaseHandler(os.path.join(directory, 'download.sqlite3'), api_root_url)
+
+            n_rows = args.migrations * (args.projects + 1) + args.messages
+            print(f'Syncing a database of {n_rows:,} rows ({"form" if args.legacy else "streaming"} endpoints).')
+            print(f'{"":<32}{"Latency":>12}{"Uploaded":>16}{"Downloaded":>16}{"Peak memory":>14}')
+
+            measure('Full upload', api_root_url, trace_memory, lambda: data_handler.upload_database_to_server(USERNAME, PASSWORD))
+            measure('Upload, no changes', api_root_url, trace_memory, lambda: data_handler.upload_database_to_server(USERNAME, PASSWORD))
+
+            # Change every tenth project of the latest migration.
+            migration_id = data_handler.get_migration_tables()[-1]['id']
+            data_handler.write_projects(generate_projects(args.projects, version=args.migrations), migration_id, upsert=True)
+            measure('Delta upload, 10% of migration', api_root_url, trace_memory, lambda: data_handler.upload_database_to_server(USERNAME, PASSWORD))
+
+            measure('Download into empty database', api_root_url, trace_memory, lambda: fresh_data_handler.download_database_from_server(USERNAME, PASSWORD))
+            measure('Download, no changes', api_root_url, trace_memory, lambda: fresh_data_handler.download_database_from_server(USERNAME, PASSWORD))
+
+            # Check that the downloaded database matches the uploaded one.
+            downloaded_projects = {name: project.to_dict() for name, project in fresh_data_handler.read_projects(migration_id).items()}
+            assert downloaded_projects == {name: project.to_dict() for name, project in data_handler.read_projects(migration_id).items()}
+            assert len(fresh_data_handler.read_chat_history()) == args.messages
+    finally:
+        process.terminate()
+        process.wait()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""
+Benchmarks the rate at which DatabaseHandler writes project data, in rows per second.
+
+Run this file as a module from the top level directory of this project:
+`python -m benchmarks.write_projects_benchmark [--rows 100000]`
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+from replit_migrator.database_handler import DatabaseHandler
+from replit_migrator.project_record import ProjectRecord
+
+
+def generate_projects(n_rows, version=0):
+    """
+    Generates a dictionary of n_rows project records. Changing version changes the size of every tenth project.
+    """
+
+    projects = {}
+    for i in range(n_rows):
+        name = f'project-{i}'
+        size = f'{(i % 1000) + (version if i % 10 == 0 else 0)} KiB'
+        projects[name] = ProjectRecord(name, f'folder-{i % 50}/', f'https://replit.com/@user/{name}', f'{i % 12 + 1} months ago', size)
+
+    return projects
+
+
+def write_projects_per_row(data_handler, projects, migration_id):
+    """
+    Writes projects with one INSERT per row, as DatabaseHandler did before bulk writes, for comparison.
+    """
+
+    data_handler.cursor.execute('DELETE FROM projects WHERE migration_id = ?;', (migration_id,))
+    for project in projects.values():
+        data_handler.cursor.execute('''
+            INSERT INTO projects (migration_id, name, path, link, last_modified, size)
+            VALUES (?, ?, ?, ?, ?, ?);
+        ''', (migration_id, project.name, project.path, project.link, project.last_modified, project.size))
+    data_handler.conn.commit()
+
+
+def time_write(label, n_rows, function):
+    """
+    Times a single write and prints its rate.
+    """
+
+    start_time = time.perf_counter()
+    function()
+    elapsed = time.perf_counter() - start_time
+    print(f'{label:<40}{elapsed:>10.3f} s{n_rows / elapsed:>14,.0f} rows/s')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark DatabaseHandler project writes.')
+    parser.add_argument('--rows', type=int, default=100000, help='Number of projects in the migration.')
+    args = parser.parse_args()
+
+    # Generate project data before timing.
+    projects = generate_projects(args.rows)
+    changed_projects = generate_projects(args.rows, version=1)
+
+    with tempfile.TemporaryDirectory() as directory:
+        # Use a fresh on-disk database, which is not logged in, so no uploads are made.
+        data_handler = DatabaseHandler(os.path.join(directory, 'benchmark.sqlite3'), None)
+        migration_id = data_handler.create_migration_table(time.strftime('%Y-%m-%d %H:%M:%S'))
+
+        # Populate the migration first, so every timed write replaces existing rows.
+        data_handler.write_projects(projects, migration_id)
+
+        print(f'Rewriting a migration of {args.rows:,} projects.')
+        time_write('Per-row INSERT (previous behaviour)', args.rows, lambda: write_projects_per_row(data_handler, projects, migration_id))
+        time_write('Bulk replace', args.rows, lambda: data_handler.write_projects(projects, migration_id))
+        time_write('Bulk upsert, no changes', args.rows, lambda: data_handler.write_projects(projects, migration_id, upsert=True))
+        time_write('Bulk upsert, 10% changed', args.rows, lambda: data_handler.write_projects(changed_projects, migration_id, upsert=True))
+
+        # Check that the final write was stored correctly.
+        assert data_handler.read_projects(migration_id)['project-0'].size == changed_projects['project-0'].size
+
+
+if __name__ == '__main__':
+    main()
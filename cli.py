@@ -0,0 +1,159 @@
+"""
+The command line interface for this application, for operations which do not need the GUI.
+
+Run this file while inside its direct parent directory (ex. `python cli.py batch manifest.json`).
+Run `python cli.py --help` for a list of commands.
+"""
+
+import argparse
+import os
+import sys
+
+from replit_migrator import config
+from replit_migrator.batch_handler import BatchHandler
+from replit_migrator.database_handler import DatabaseHandler
+from replit_migrator.search_handler import SearchHandler
+
+
+def batch(args):
+    """
+    Migrates several Replit accounts listed in a manifest.
+    """
+
+    batch_handler = BatchHandler(args.output_root, workers=args.workers, browsers=args.browsers)
+    accounts = batch_handler.read_manifest(args.manifest)
+    results = batch_handler.run(accounts)
+
+    # Exit with an error code if any account failed.
+    if any(result['status'] != 'complete' for result in results):
+        sys.exit(1)
+
+
+def export_database(args):
+    """
+    Exports the migration history and chat history to an NDJSON file.
+    """
+
+    data_handler = DatabaseHandler(args.db_path, config.API_ROOT_URL)
+    n_rows = data_handler.export_database_to_file(args.path)
+    print(f'Exported {n_rows} rows to {args.path}.')
+
+
+def import_database(args):
+    """
+    Replaces the migration history and chat history with the contents of an NDJSON file.
+    """
+
+    data_handler = DatabaseHandler(args.db_path, config.API_ROOT_URL)
+    n_rows = data_handler.import_database_from_file(args.path)
+    print(f'Imported {n_rows} rows from {args.path}.')
+
+
+def prune(args):
+    """
+    Deletes expired migrations under a retention policy, then compacts the database.
+    """
+
+    data_handler = DatabaseHandler(args.db_path, config.API_ROOT_URL)
+    size_before = get_database_size(args.db_path)
+
+    pruned = data_handler.prune_migrations(args.keep_last, args.keep_days)
+    print(f'Pruned {len(pruned)} migrations' + (f' ({", ".join(str(id) for id in pruned)}).' if pruned else '.'))
+
+    if not args.no_compact:
+        data_handler.compact_database()
+        print(f'Compacted database from {size_before / 1024**2:.1f} MiB to {get_database_size(args.db_path) / 1024**2:.1f} MiB.')
+
+
+def pin(args):
+    """
+    Pins or unpins a migration, so that it is never pruned.
+    """
+
+    data_handler = DatabaseHandler(args.db_path, config.API_ROOT_URL)
+    if not data_handler.set_migration_pinned(args.migration_id, not args.unpin):
+        print(f'Migration {args.migration_id} does not exist.')
+        sys.exit(1)
+    print(f'Migration {args.migration_id} {"unpinned" if args.unpin else "pinned"}.')
+
+
+def reindex(args):
+    """
+    Updates the file statistics and full-text index of a migration with changes made to its extracted files.
+    """
+
+    data_handler = DatabaseHandler(args.db_path, config.API_ROOT_URL)
+
+    # Default to the latest migration, and the output directory it was recorded with.
+    migrations = {migration['id']: migration for migration in data_handler.get_migration_tables()}
+    migration_id = args.migration_id if args.migration_id is not None else max(migrations, default=None)
+    if migration_id not in migrations:
+        print('No migrations recorded.' if args.migration_id is None else f'Migration {args.migration_id} does not exist.')
+        sys.exit(1)
+    output_path = args.output_path or migrations[migration_id]['output_path'] or config.OUTPUT_PATH
+
+    summary = SearchHandler(data_handler).update_index(migration_id, output_path)
+    print(f'Migration {migration_id}: {summary["added_files"]} files added, {summary["changed_files"]} changed and '
+          f'{summary["deleted_files"]} deleted since last indexed. Indexed {summary["indexed_files"]} files.')
+
+
+def get_database_size(db_path):
+    """
+    Returns the size of a database in bytes, including its write-ahead log.
+    """
+
+    return sum(os.path.getsize(path) for path in [db_path, f'{db_path}-wal'] if os.path.exists(path))
+
+
+def main():
+    """
+    Parses command line arguments and runs the requested command.
+    """
+
+    parser = argparse.ArgumentParser(description='Replit Migrator command line interface.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    # Batch migration command.
+    batch_parser = subparsers.add_parser('batch', help='Migrate several Replit accounts listed in a JSON manifest.')
+    batch_parser.add_argument('manifest', help='Path to a JSON manifest: {"accounts": [{"username", "email", "password"}, ...]}.')
+    batch_parser.add_argument('--output-root', default=config.OUTPUT_PATH, help='Directory in which each account gets its own output directory.')
+    batch_parser.add_argument('--workers', type=int, default=4, help='Maximum number of accounts migrated at once.')
+    batch_parser.add_argument('--browsers', type=int, default=2, help='Maximum number of browsers running at once, across all accounts.')
+    batch_parser.set_defaults(function=batch)
+
+    # Export and import commands.
+    export_parser = subparsers.add_parser('export', help='Export migration history and chat history to a newline-delimited JSON file.')
+    export_parser.add_argument('path', help='Path of the file to write. Paths ending in .gz are gzip-compressed.')
+    export_parser.add_argument('--db-path', default=config.DB_PATH, help='Path of the database to export.')
+    export_parser.set_defaults(function=export_database)
+    import_parser = subparsers.add_parser('import', help='Replace migration history and chat history with the contents of an exported file.')
+    import_parser.add_argument('path', help='Path of a file written by the export command.')
+    import_parser.add_argument('--db-path', default=config.DB_PATH, help='Path of the database to import into.')
+    import_parser.set_defaults(function=import_database)
+
+    # Retention commands.
+    prune_parser = subparsers.add_parser('prune', help='Delete migrations which are expired under a retention policy, then compact the database.')
+    prune_parser.add_argument('--keep-last', type=int, default=config.RETENTION_KEEP_LAST, help="Keep each account's last N migrations.")
+    prune_parser.add_argument('--keep-days', type=int, default=config.RETENTION_KEEP_DAYS, help='Keep migrations made within the last N days.')
+    prune_parser.add_argument('--no-compact', action='store_true', help='Skip compacting the database (VACUUM and ANALYZE).')
+    prune_parser.add_argument('--db-path', default=config.DB_PATH, help='Path of the database to prune.')
+    prune_parser.set_defaults(function=prune)
+    pin_parser = subparsers.add_parser('pin', help='Pin a migration, so that it is never pruned.')
+    pin_parser.add_argument('migration_id', type=int, help='Id of the migration to pin.')
+    pin_parser.add_argument('--unpin', action='store_true', help='Unpin the migration instead.')
+    pin_parser.add_argument('--db-path', default=config.DB_PATH, help='Path of the database containing the migration.')
+    pin_parser.set_defaults(function=pin)
+
+    # Search index command.
+    reindex_parser = subparsers.add_parser('reindex', help='Update the content search index with files added, changed or deleted in the output directory.')
+    reindex_parser.add_argument('migration_id', type=int, nargs='?', help='Id of the migration to update (by default, the latest).')
+    reindex_parser.add_argument('--output-path', help="Output directory of the migration (by default, the one it was recorded with, or 'output/').")
+    reindex_parser.add_argument('--db-path', default=config.DB_PATH, help='Path of the database containing the migration.')
+    reindex_parser.set_defaults(function=reindex)
+
+    args = parser.parse_args()
+    args.function(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,7 +1,9 @@
 import tkinter as tk
 
 # Import all screens.
+from replit_migrator import config
 from replit_migrator.database_handler import DatabaseHandler
+from replit_migrator.sync_handler import SyncHandler
 from replit_migrator.style_handler import StyleHandler
 from replit_migrator.screens.scraper_screen import ScraperScreen
 from replit_migrator.screens.home_screen import HomeScreen
@@ -31,20 +33,22 @@ class AppHandler:
         self.root.iconbitmap('replit_migrator/icon.ico')
 
         # Create constant variable for the Replit Migrator Database API endpoint.
-        self.API_ROOT_URL = 'https://brianz1alt2.pythonanywhere.com/'
+        self.API_ROOT_URL = config.API_ROOT_URL
 
         # Initialize data handler.
-        self.data_handler = DatabaseHandler('replit_migrator/db.sqlite3', self.API_ROOT_URL)
+        self.data_handler = DatabaseHandler(config.DB_PATH, self.API_ROOT_URL)
+
+        # Upload changes to the server in the background, to keep the GUI responsive.
+        self.sync_handler = SyncHandler(self.data_handler)
+        self.data_handler.sync_handler = self.sync_handler
 
         # Create variable to persist selected project ID when changing screens.
         self.selected_project_id = None
 
-        # Upon app startup, check if user is logged in.
-        if self.data_handler.check_if_logged_in():
-            # User is logged in. Get their login details.
-            login_details = self.data_handler.read_login_details()
-            # Update local database to latest version from server.
-            self.data_handler.download_database_from_server(login_details['username'], login_details['password'])
+        # Upon app startup, update local database to latest version from server (if user is logged in) in the background.
+        # Screens are drawn from the local database in the meantime.
+        self.sync_handler.request_refresh()
+        self.displayed_refresh_count = 0
 
         # Create consistent styles for all widgets.
         self.style_handler = StyleHandler()
@@ -54,8 +58,18 @@ class AppHandler:
         self.screen = None
         self.change_screen('home')
 
+        # Redraw the home screen if a refresh changes the local database.
+        self.root.after(500, self.check_for_refresh)
+
         # Start the Tkinter main loop.
-        self.root.mainloop()
+        try:
+            self.root.mainloop()
+
+            # Window closed (its widgets are destroyed). Stop background work of the displayed screen.
+            self.screen.leave()
+        finally:
+            # Finish uploading any queued changes before exiting, even if stopping the screen failed.
+            self.sync_handler.stop(flush=True)
 
 
     def change_screen(self, screen):
@@ -63,8 +77,9 @@ class AppHandler:
         Handles changing between screens.
         """
 
-        # Remove existing screen from display.
+        # Remove existing screen from display, stopping its background work.
         if self.screen is not None:
+            self.screen.leave()
             try:
                 self.screen.frame.pack_forget()
             except tk.TclError:
@@ -97,6 +112,20 @@ class AppHandler:
         self.screen.frame.pack(fill=tk.BOTH, expand=True)
 
 
+    def check_for_refresh(self):
+        """
+        Redraws the home screen if the local database has been refreshed from the server since it was drawn.
+
+        Other screens are left as they are, to avoid discarding user input.
+        """
+
+        if self.sync_handler.refresh_count != self.displayed_refresh_count and isinstance(self.screen, HomeScreen):
+            self.displayed_refresh_count = self.sync_handler.refresh_count
+            self.change_screen('home')
+
+        self.root.after(500, self.check_for_refresh)
+
+
     def select_project(self, project_id):
         """
         Selects a project to scrape.
@@ -0,0 +1,191 @@
+import os
+import json
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from replit_migrator import config
+from replit_migrator.database_handler import DatabaseHandler
+from replit_migrator.extraction_handler import ExtractionHandler
+from replit_migrator.migration_handler import MigrationHandler
+
+
+class BatchHandler:
+    """
+    Handles migrating several Replit accounts at once, as listed in a manifest.
+
+    Accounts are migrated concurrently by a pool of workers. Each running browser holds
+    a slot in a shared browser budget, so extraction of one account can overlap with
+    scraping of another without exceeding the number of browsers allowed. Every account
+    is written to its own output directory and migration record.
+    """
+
+
+    def __init__(self, output_root, workers=4, browsers=2, db_path=config.DB_PATH, api_root_url=config.API_ROOT_URL):
+        # Initialize core attributes from parameters.
+        self.output_root = output_root
+        self.workers = workers
+
+        # Shared by all workers, each of which gets its own connection to the database.
+        self.data_handler = DatabaseHandler(db_path, api_root_url)
+
+        # Limits the number of browsers running at once, across all workers.
+        self.browser_semaphore = threading.BoundedSemaphore(browsers)
+
+        # Serializes status output from concurrent workers.
+        self.print_lock = threading.Lock()
+
+
+    def read_manifest(self, manifest_path):
+        """
+        Reads the list of accounts to migrate from a JSON manifest, in the format:
+        {"accounts": [{"username": "...", "email": "...", "password": "..."}, ...]}
+        """
+
+        with open(manifest_path, 'r') as file:
+            manifest = json.load(file)
+
+        # Validate that every account has the required fields.
+        accounts = manifest['accounts']
+        for account in accounts:
+            for field in ['username', 'email', 'password']:
+                if not account.get(field):
+                    raise ValueError(f'Manifest account is missing required field "{field}".')
+
+        return accounts
+
+
+    def run(self, accounts):
+        """
+        Migrates all accounts concurrently, then reports and returns the per-account results.
+        """
+
+        os.makedirs(self.output_root, exist_ok=True)
+
+        # Migrate accounts in a pool of workers, preserving manifest order in the results.
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            results = list(executor.map(self.migrate_account, accounts))
+
+        # Prune migrations which have expired under the retention policy, now that every account has a new migration.
+        pruned = self.data_handler.prune_migrations(config.RETENTION_KEEP_LAST, config.RETENTION_KEEP_DAYS)
+        if len(pruned) > 0:
+            print(f'Pruned {len(pruned)} expired migrations.', flush=True)
+
+        # Report results to the console and save them alongside the output.
+        self.print_report(results)
+        with open(os.path.join(self.output_root, 'batch_report.json'), 'w') as file:
+            json.dump(results, file, indent=4)
+
+        return results
+
+
+    def migrate_account(self, account):
+        """
+        Migrates a single account into its own output directory, returning a dictionary
+        describing the result and throughput of the migration.
+        """
+
+        username = account['username']
+        output_path = os.path.join(os.path.abspath(self.output_root), username, '')
+
+        # Create dictionary to describe result.
+        result = {
+            'username': username,
+            'output_path': output_path,
+            'status': 'failed',
+            'error': None,
+            'migration_id': None,
+            'projects': 0,
+            'failed_projects': 0,
+            'extracted_files': 0,
+            'extracted_bytes': 0,
+            'elapsed_seconds': 0
+        }
+
+        start_time = time.time()
+        try:
+            # Output directory must not exist beforehand, to prevent file/project name conflicts.
+            os.makedirs(output_path)
+
+            migration_handler = MigrationHandler(
+                self.data_handler,
+                self.create_extraction_handler(),
+                output_path,
+                lambda text, indent=0: self.print_status(username, text, indent),
+                lambda title, message: self.print_status(username, f'{title}: continuing without confirmation in batch mode.')
+            )
+
+            # Scrape and download all repls, holding a browser slot until downloads have finished.
+            with self.browser_semaphore:
+                migration_handler.scrape(username, account['email'], account['password'], confirm_downloads=False)
+
+            # Write data to database.
+            self.print_status(username, 'Updating database...')
+            migration_id = self.data_handler.create_migration_table(time.strftime('%Y-%m-%d %H:%M:%S'), username, output_path)
+            self.data_handler.write_projects(migration_handler.projects, migration_id)
+
+            # Organize files into folders based on file hierarchy.
+            self.print_status(username, 'Organizing files...')
+            summary = migration_handler.organize_files(migration_id)
+
+            # Record result.
+            result['status'] = 'complete'
+            result['migration_id'] = migration_id
+            result['projects'] = len(migration_handler.projects)
+            result['failed_projects'] = summary['failed_projects']
+            result['extracted_files'] = summary['extracted_files']
+            result['extracted_bytes'] = summary['extracted_bytes']
+            self.print_status(username, 'Migration complete.')
+
+        except Exception as e:
+            # Record failure, without interrupting other accounts.
+            result['error'] = f'{type(e).__name__}: {e}'
+            self.print_status(username, f'Migration failed. {result["error"]}')
+        finally:
+            # Worker threads are reused for other accounts, but may sit idle for a long time.
+            self.data_handler.close_thread_connection()
+
+        result['elapsed_seconds'] = round(time.time() - start_time, 2)
+
+        return result
+
+
+    def create_extraction_handler(self):
+        """
+        Creates an extraction handler, with size limits (in bytes) optionally set from environment variables (see config).
+        """
+
+        return ExtractionHandler(
+            max_file_size=config.MAX_FILE_SIZE,
+            max_project_size=config.MAX_PROJECT_SIZE,
+            ignore_file_path=config.IGNORE_FILE_PATH
+        )
+
+
+    def print_status(self, username, text, indent=0):
+        """
+        Prints a status update for an account to the console, with indent if specified.
+        """
+
+        with self.print_lock:
+            print(f'[{username}] ' + '\t'*indent + text, flush=True)
+
+
+    def print_report(self, results):
+        """
+        Prints a table summarizing the result and throughput of every account.
+        """
+
+        print()
+        print(f'{"Account":<24}{"Status":<10}{"Projects":>10}{"Failed":>8}{"Files":>10}{"MiB":>10}{"Seconds":>10}{"Proj/min":>10}')
+        for result in results:
+            elapsed = max(result['elapsed_seconds'], 0.01)
+            mebibytes = result['extracted_bytes'] / 1024**2
+            projects_per_minute = result['projects'] / elapsed * 60
+            print(f'{result["username"]:<24}{result["status"]:<10}{result["projects"]:>10}{result["failed_projects"]:>8}'
+                  f'{result["extracted_files"]:>10}{mebibytes:>10.1f}{result["elapsed_seconds"]:>10.1f}{projects_per_minute:>10.1f}')
+
+        # Print details of failed accounts.
+        for result in results:
+            if result['error'] is not None:
+                print(f'{result["username"]} failed: {result["error"]}')
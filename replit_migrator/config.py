@@ -0,0 +1,50 @@
+"""
+Application-wide configuration constants, shared by the GUI and the command line interface.
+"""
+
+import os
+
+
+def read_int_env(name):
+    """
+    Reads a non-negative integer from an environment variable. Returns None if the variable is unset or malformed,
+    so that the default applies, rather than failing at startup.
+    """
+
+    value = os.getenv(name)
+    if not value:
+        return None
+
+    try:
+        number = int(value)
+    except ValueError:
+        number = -1
+    if number < 0:
+        print(f'Ignoring {name}={value!r}, which is not a non-negative integer.')
+        return None
+
+    return number
+
+
+# Location of the local SQLite3 database.
+DB_PATH = 'replit_migrator/db.sqlite3'
+
+# Root URL of the Replit Migrator Database API. May be overridden (ex. to use a local server) by an environment variable.
+API_ROOT_URL = os.getenv('REPLIT_MIGRATOR_API_URL', 'https://brianz1alt2.pythonanywhere.com/')
+
+# Retention policy for old migrations, applied after each migration (see DatabaseHandler.prune_migrations()).
+# Keeps each account's last RETENTION_KEEP_LAST migrations and those from the last RETENTION_KEEP_DAYS days.
+# Either may be set by an environment variable; unset rules are not applied, so by default every migration is kept.
+RETENTION_KEEP_LAST = read_int_env('REPLIT_MIGRATOR_KEEP_LAST')
+RETENTION_KEEP_DAYS = read_int_env('REPLIT_MIGRATOR_KEEP_DAYS')
+
+# Size limits (in bytes) of extracted files and projects. Unset limits use ExtractionHandler's defaults.
+MAX_FILE_SIZE = read_int_env('REPLIT_MAX_FILE_SIZE')
+MAX_PROJECT_SIZE = read_int_env('REPLIT_MAX_PROJECT_SIZE')
+
+# Directory (relative to the working directory) which the GUI downloads migrations to. Migrations recorded without an
+# output path, by older versions, were also downloaded there.
+OUTPUT_PATH = 'output/'
+
+# Location of the file listing Replit configuration files to ignore during extraction.
+IGNORE_FILE_PATH = 'replit_ignore.txt'
@@ -1,28 +1,275 @@
 import sqlite3
 import requests
 import json
+import gzip
+import time
+import re
+import threading
+import itertools
+import types
+import collections
+
+from replit_migrator import sync_stream
+from replit_migrator.project_record import ProjectRecord
+
+# The regular expression parser is only exposed as a private module since Python 3.11.
+try:
+    from re import _parser as sre_parse
+except ImportError:
+    import sre_parse
 
 
 class DatabaseHandler:
     """
     Handles all operations related to data, including read/write to both local
     and server database.
+
+    The handler may be used from several threads at once (ex. the scraper worker thread,
+    batch migration workers and the GUI). SQLite connections cannot be shared between
+    threads, so each thread lazily opens its own connection. The database uses WAL
+    journaling, so readers never wait for writers and writers only wait for each other.
     """
 
 
+    # Seconds a connection waits for another connection's write to finish before failing.
+    BUSY_TIMEOUT = 30
+
+    # Columns of each table synced with the server, in the order they are streamed.
+    SYNCED_COLUMNS = {
+        'migrations': ['id', 'date_time', 'account', 'output_path'],
+        'projects': ['migration_id', 'name', 'path', 'link', 'last_modified', 'size', 'size_bytes', 'modified_at'],
+        'chat_history': ['id', 'role', 'content', 'conversation_id', 'created_at']
+    }
+
+    # Columns identifying each row of the synced tables.
+    SYNCED_KEYS = {
+        'migrations': ['id'],
+        'projects': ['migration_id', 'name'],
+        'chat_history': ['id']
+    }
+
+    # Maximum number of migrations whose projects are cached at once (see read_cached()). The least recently read is evicted first.
+    MAX_CACHED_PROJECT_TABLES = 2
+
+    # Number of low bits of a file_lines rowid holding the line number. The remaining bits hold the file_contents id.
+    LINE_NUMBER_BITS = 32
+
+    # Counter used to give each in-memory database a unique name.
+    memory_database_counter = itertools.count()
+
+
     def __init__(self, DB_PATH, API_ROOT_URL):
         # Initialize core attributes from parameters.
         self.DB_PATH = DB_PATH
         self.API_ROOT_URL = API_ROOT_URL
 
-        # Initialize database connection and cursor.
-        self.conn = sqlite3.connect(DB_PATH)
-        self.cursor = self.conn.cursor()
+        # Stores the connection and cursor of each thread.
+        self.thread_data = threading.local()
+        self.connections = []
+        self.connections_lock = threading.Lock()
+
+        # An in-memory database is private to its connection, so every thread connects to a named, shared one instead.
+        # Shared in-memory databases use table-level locks without waiting, so they are only suited to single-threaded use.
+        self.memory_uri = None
+        if DB_PATH == ':memory:':
+            self.memory_uri = f'file:replit_migrator_{next(self.memory_database_counter)}?mode=memory&cache=shared'
+
+        # Uploads changes in the background if set (see SyncHandler). Otherwise, changes are uploaded synchronously.
+        self.sync_handler = None
+
+        # Whether the server supports streamed sync payloads. None until the first streaming request.
+        self.streaming_supported = None
+
+        # Caches results of frequent reads, shared by all threads (see read_cached()).
+        # Entries are invalidated by the writes which change them, so only writes made through this handler are seen.
+        # Entries are kept in order of use, so that the least recently read projects can be evicted.
+        self.cache = collections.OrderedDict()
+        self.cache_lock = threading.Lock()
+        self.cache_generation = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
 
         # Create database tables if they don't exist.
         self.create_tables()
 
 
+    @property
+    def conn(self):
+        """
+        The database connection of the calling thread, opened on first use.
+        """
+
+        conn = getattr(self.thread_data, 'conn', None)
+        if conn is None:
+            conn = self.connect()
+            self.thread_data.conn = conn
+            self.thread_data.cursor = conn.cursor()
+
+        return conn
+
+
+    @property
+    def cursor(self):
+        """
+        The database cursor of the calling thread, created on first use.
+        """
+
+        # Accessing the connection ensures the cursor exists.
+        self.conn
+
+        return self.thread_data.cursor
+
+
+    def connect(self):
+        """
+        Opens a new connection to the database and configures it.
+        """
+
+        # Each connection is only used by the thread which opened it, but may be closed by close() from any thread.
+        if self.memory_uri is not None:
+            conn = sqlite3.connect(self.memory_uri, timeout=self.BUSY_TIMEOUT, uri=True, check_same_thread=False)
+        else:
+            conn = sqlite3.connect(self.DB_PATH, timeout=self.BUSY_TIMEOUT, check_same_thread=False)
+
+        # Use write-ahead logging, so reads run concurrently with writes. This setting persists in the database file.
+        conn.execute('PRAGMA journal_mode = WAL;')
+        # Only sync at checkpoints. Safe in WAL mode: a power loss may lose the latest commits, but never corrupts the database.
+        conn.execute('PRAGMA synchronous = NORMAL;')
+        # Keep temporary tables and indexes in memory, and allow a larger page cache (negative values are KiB).
+        conn.execute('PRAGMA temp_store = MEMORY;')
+        conn.execute('PRAGMA cache_size = -16000;')
+
+        # Allow regular expression matching in queries (ex. searching files by name).
+        conn.create_function('REGEXP', 2, self.regexp, deterministic=True)
+
+        # Keep track of connection so that it can be closed later.
+        with self.connections_lock:
+            self.connections.append(conn)
+
+        return conn
+
+
+    def close_thread_connection(self):
+        """
+        Closes the database connection of the calling thread, if it has one. Worker threads call this
+        when they finish, so that connections (and their page caches) don't accumulate over a long session.
+        The thread reconnects if it uses the handler again.
+        """
+
+        conn = getattr(self.thread_data, 'conn', None)
+        if conn is None:
+            return
+
+        with self.connections_lock:
+            if conn in self.connections:
+                self.connections.remove(conn)
+        conn.close()
+        self.thread_data.conn = None
+        self.thread_data.cursor = None
+
+
+    @staticmethod
+    def regexp(pattern, value):
+        """
+        Implements SQLite's REGEXP operator (value REGEXP pattern), searching value for the regular expression pattern.
+        """
+
+        return value is not None and re.search(pattern, value) is not None
+
+
+    @staticmethod
+    def get_literal_prefix(pattern):
+        """
+        Returns the text which every string matched by a regular expression anchored at the start
+        begins with (ex. 'main.' for '^main\\.py'), or '' if there is none.
+        """
+
+        parsed = sre_parse.parse(pattern)
+
+        # Case-insensitive patterns match other prefixes, and multiline patterns may match after any newline.
+        if parsed.state.flags & (re.IGNORECASE | re.MULTILINE) or len(parsed) == 0:
+            return ''
+        op, av = parsed[0]
+        if op is not sre_parse.AT or av not in (sre_parse.AT_BEGINNING, sre_parse.AT_BEGINNING_STRING):
+            return ''
+
+        # Collect the literals following the anchor, up to the first other item (ex. a repeat or a group).
+        prefix = ''
+        for op, av in parsed[1:]:
+            if op is not sre_parse.LITERAL:
+                break
+            prefix += chr(av)
+
+        return prefix
+
+
+    def close(self):
+        """
+        Closes the database connections of all threads.
+        """
+
+        with self.connections_lock:
+            for conn in self.connections:
+                conn.close()
+            self.connections = []
+
+        # Force threads to reconnect if the handler is used again.
+        self.thread_data = threading.local()
+
+
+    def read_cached(self, key, read):
+        """
+        Returns the cached result of a read identified by key, calling read() to fill the cache on a miss.
+        Projects are cached for at most MAX_CACHED_PROJECT_TABLES migrations, so memory usage does not
+        grow with the number of migrations read.
+        """
+
+        with self.cache_lock:
+            if key in self.cache:
+                self.cache_hits += 1
+                self.cache.move_to_end(key)
+                return self.cache[key]
+            self.cache_misses += 1
+            generation = self.cache_generation
+
+        value = read()
+
+        # Only cache the result if nothing was invalidated during the read, as it may be outdated.
+        with self.cache_lock:
+            if self.cache_generation == generation:
+                self.cache[key] = value
+
+                # Evict the least recently read projects, keyed by ('projects', migration id).
+                if isinstance(key, tuple) and key[0] == 'projects':
+                    project_keys = [cached_key for cached_key in self.cache if isinstance(cached_key, tuple) and cached_key[0] == 'projects']
+                    for cached_key in project_keys[:-self.MAX_CACHED_PROJECT_TABLES]:
+                        del self.cache[cached_key]
+
+        return value
+
+
+    def invalidate_cache(self, *keys):
+        """
+        Removes the given entries from the cache, or all entries if none are given.
+        """
+
+        with self.cache_lock:
+            self.cache_generation += 1
+            if len(keys) == 0:
+                self.cache.clear()
+            for key in keys:
+                self.cache.pop(key, None)
+
+
+    def get_cache_stats(self):
+        """
+        Returns the number of cache hits, misses and entries since the handler was created.
+        """
+
+        with self.cache_lock:
+            return {'hits': self.cache_hits, 'misses': self.cache_misses, 'entries': len(self.cache)}
+
+
     def create_tables(self):
         """
         Create database tables essential to program function.
@@ -32,19 +279,80 @@ class DatabaseHandler:
         self.cursor.execute('''
             CREATE TABLE IF NOT EXISTS migrations (
                 id INTEGER PRIMARY KEY,
-                date_time TEXT
+                date_time TEXT,
+                account TEXT,
+                output_path TEXT,
+                pinned INTEGER NOT NULL DEFAULT 0
+            );
+        ''')
+
+        # Add columns introduced after the migrations table was first created, for existing databases.
+        migration_columns = [row[1] for row in self.cursor.execute('PRAGMA table_info(migrations);').fetchall()]
+        for column in ['account', 'output_path']:
+            if column not in migration_columns:
+                self.cursor.execute(f'ALTER TABLE migrations ADD COLUMN {column} TEXT;')
+        # pinned marks migrations which are never pruned (see prune_migrations()). Pins are kept on this machine only, so they are not synced.
+        if 'pinned' not in migration_columns:
+            self.cursor.execute('ALTER TABLE migrations ADD COLUMN pinned INTEGER NOT NULL DEFAULT 0;')
+
+        # Create projects table (contains data for every Repl project of every migration).
+        self.cursor.execute('''
+            CREATE TABLE IF NOT EXISTS projects (
+                id INTEGER PRIMARY KEY,
+                migration_id INTEGER,
+                name TEXT,
+                path TEXT,
+                link TEXT,
+                last_modified TEXT,
+                size TEXT,
+                size_bytes INTEGER,
+                modified_at INTEGER
             );
         ''')
 
-        # Create chat_history table (contains chat history with chat bot).
+        # Add columns introduced after the projects table was first created, for existing databases.
+        # size_bytes and modified_at hold the scraped size and last modified date, resolved to bytes and a Unix timestamp.
+        project_columns = [row[1] for row in self.cursor.execute('PRAGMA table_info(projects);').fetchall()]
+        for column in ['size_bytes', 'modified_at']:
+            if column not in project_columns:
+                self.cursor.execute(f'ALTER TABLE projects ADD COLUMN {column} INTEGER;')
+
+        self.cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS projects_migration_name ON projects (migration_id, name);')
+        self.cursor.execute('CREATE INDEX IF NOT EXISTS projects_name ON projects (name);')
+        self.cursor.execute('CREATE INDEX IF NOT EXISTS projects_path ON projects (path);')
+        self.cursor.execute('CREATE INDEX IF NOT EXISTS projects_modified_at ON projects (migration_id, modified_at);')
+        self.cursor.execute('CREATE INDEX IF NOT EXISTS projects_size_bytes ON projects (migration_id, size_bytes);')
+
+        # Relative dates can't be range searched, so the index on the scraped string is replaced by the one on modified_at.
+        self.cursor.execute('DROP INDEX IF EXISTS projects_last_modified;')
+
+        # Move project data from databases created before the projects table existed.
+        self.migrate_legacy_project_tables()
+
+        # Resolve sizes and dates of projects written by older versions.
+        self.backfill_project_values()
+
+        # Create chat_history table (contains chat history with chat bot). Messages are only ever appended.
         self.cursor.execute('''
             CREATE TABLE IF NOT EXISTS chat_history (
                 id INTEGER PRIMARY KEY,
                 role TEXT,
-                content TEXT
+                content TEXT,
+                conversation_id INTEGER,
+                created_at TEXT
             );
         ''')
 
+        # Add columns introduced after the chat_history table was first created, for existing databases.
+        # Existing messages belong to the first conversation.
+        chat_history_columns = [row[1] for row in self.cursor.execute('PRAGMA table_info(chat_history);').fetchall()]
+        if 'conversation_id' not in chat_history_columns:
+            self.cursor.execute('ALTER TABLE chat_history ADD COLUMN conversation_id INTEGER;')
+            self.cursor.execute('UPDATE chat_history SET conversation_id = 1;')
+        if 'created_at' not in chat_history_columns:
+            self.cursor.execute('ALTER TABLE chat_history ADD COLUMN created_at TEXT;')
+        self.cursor.execute('CREATE INDEX IF NOT EXISTS chat_history_conversation ON chat_history (conversation_id, id);')
+
         # Create login_details table (contains user login details for Replit Migrator Database Server).
         self.cursor.execute('''
             CREATE TABLE IF NOT EXISTS login_details (
@@ -54,230 +362,1046 @@ class DatabaseHandler:
             );
         ''')
 
+        # Create extraction_fingerprints table (identifies the zip file each project was last extracted from, and the
+        # latest migration whose file statistics were recorded from the extracted tree).
+        self.cursor.execute('''
+            CREATE TABLE IF NOT EXISTS extraction_fingerprints (
+                id INTEGER PRIMARY KEY,
+                project_path TEXT UNIQUE,
+                zip_size INTEGER,
+                crc_digest TEXT,
+                migration_id INTEGER
+            );
+        ''')
+
+        # Add migration_id for existing databases. Fingerprints recorded before are never pruned (see prune_migrations()).
+        fingerprint_columns = [row[1] for row in self.cursor.execute('PRAGMA table_info(extraction_fingerprints);').fetchall()]
+        if 'migration_id' not in fingerprint_columns:
+            self.cursor.execute('ALTER TABLE extraction_fingerprints ADD COLUMN migration_id INTEGER;')
+
+        # Create files table (contains statistics for every file extracted from a project, gathered during extraction).
+        self.cursor.execute('''
+            CREATE TABLE IF NOT EXISTS files (
+                id INTEGER PRIMARY KEY,
+                migration_id INTEGER,
+                project_path TEXT,
+                relative_path TEXT,
+                name TEXT,
+                extension TEXT,
+                size INTEGER,
+                mtime INTEGER,
+                line_count INTEGER,
+                is_text INTEGER,
+                content_hash TEXT
+            );
+        ''')
+
+        # Add columns introduced after the files table was first created, for existing databases.
+        # name is the file name without its directory, and mtime the file's modification time (as a Unix timestamp) in the zip file.
+        file_columns = [row[1] for row in self.cursor.execute('PRAGMA table_info(files);').fetchall()]
+        if 'name' not in file_columns:
+            self.cursor.execute('ALTER TABLE files ADD COLUMN name TEXT;')
+            rows = self.cursor.execute('SELECT id, relative_path FROM files;').fetchall()
+            self.cursor.executemany('UPDATE files SET name = ? WHERE id = ?;', [(relative_path.split('/')[-1], id) for id, relative_path in rows])
+        if 'mtime' not in file_columns:
+            self.cursor.execute('ALTER TABLE files ADD COLUMN mtime INTEGER;')
+
+        self.cursor.execute('CREATE INDEX IF NOT EXISTS files_project ON files (migration_id, project_path);')
+        self.cursor.execute('CREATE INDEX IF NOT EXISTS files_name ON files (migration_id, name);')
+        self.cursor.execute('CREATE INDEX IF NOT EXISTS files_extension ON files (migration_id, extension);')
+        self.cursor.execute('CREATE INDEX IF NOT EXISTS files_content_hash ON files (content_hash);')
+
+        # Create the full-text index of the contents of extracted text files (see SearchHandler).
+        self.create_content_index()
+
+        # Create change tracking tables and triggers, used to upload only changed rows to the server.
+        self.create_change_tracking()
+
         # Commit changes to database.
         self.conn.commit()
 
 
-    def create_migration_table(self, date_time):
+    def create_content_index(self):
+        """
+        Create the tables holding the full-text index of file contents, if supported by SQLite.
+
+        Each distinct file content (identified by its hash, so that files which are unchanged
+        between migrations are only indexed once) has a row in file_contents. Every line of it
+        is a row of the file_lines FTS5 table, using the trigram tokenizer so that any substring
+        of at least three characters can be matched. The rowid of a line combines the id of its
+        content and its line number (see LINE_NUMBER_BITS), so all lines of a content can be
+        found or deleted by rowid range.
+        """
+
+        self.cursor.execute('''
+            CREATE TABLE IF NOT EXISTS file_contents (
+                id INTEGER PRIMARY KEY,
+                content_hash TEXT UNIQUE
+            );
+        ''')
+
+        # FTS5 and its trigram tokenizer (SQLite 3.34+) may not be compiled in, in which case content search scans the files.
+        try:
+            self.cursor.execute("CREATE VIRTUAL TABLE IF NOT EXISTS file_lines USING fts5(line, tokenize='trigram');")
+            self.content_index_supported = True
+        except sqlite3.OperationalError:
+            self.content_index_supported = False
+
+
+    def create_change_tracking(self):
+        """
+        Create the tables and triggers which track changes to synced data.
+
+        Every insert, update and delete on the migrations, projects and chat_history tables
+        appends the key of the affected row to the change_log table. Entries are removed once
+        the server acknowledges them.
+
+        Changes are only logged while they may be needed for a delta upload: once the server has
+        acknowledged a version, or while a full upload is in progress (its synced_seq is NULL, see
+        upload_full_database_to_server()). Otherwise (ex. when not logged in, or when the server
+        does not support versioning), the next upload sends the whole database anyway.
+        """
+
+        # Create change_log table (contains keys of rows changed since the last acknowledged sync).
+        # row_id is the id of the row (migration id for projects) and row_name is the project name, if applicable.
+        self.cursor.execute('''
+            CREATE TABLE IF NOT EXISTS change_log (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                table_name TEXT,
+                row_id INTEGER,
+                row_name TEXT
+            );
+        ''')
+
+        # Create sync_state table (contains the server version this database was last synced with, and for which user).
+        self.cursor.execute('''
+            CREATE TABLE IF NOT EXISTS sync_state (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                username TEXT,
+                server_version INTEGER,
+                synced_seq INTEGER
+            );
+        ''')
+
+        # Create triggers to log changes. Updates log the new key; keys are never changed by this application. Only
+        # updates of synced columns are logged, so that local-only columns (ex. migrations.pinned) are never uploaded.
+        # Triggers are recreated, so that databases created by older versions use the current definitions.
+        tracked_tables = {
+            'migrations': ('id', 'NULL'),
+            'projects': ('migration_id', 'name'),
+            'chat_history': ('id', 'NULL')
+        }
+        for table_name, (id_column, name_column) in tracked_tables.items():
+            update_event = f'UPDATE OF {", ".join(self.SYNCED_COLUMNS[table_name])}'
+            for event, row in [('INSERT', 'NEW'), (update_event, 'NEW'), ('DELETE', 'OLD')]:
+                row_name = 'NULL' if name_column == 'NULL' else f'{row}.{name_column}'
+                trigger_name = f'{table_name}_log_{event.split()[0].lower()}'
+                self.cursor.execute(f'DROP TRIGGER IF EXISTS {trigger_name};')
+                self.cursor.execute(f'''
+                    CREATE TRIGGER {trigger_name} AFTER {event} ON {table_name}
+                    WHEN EXISTS (SELECT 1 FROM sync_state WHERE server_version IS NOT NULL OR synced_seq IS NULL)
+                    BEGIN
+                        INSERT INTO change_log (table_name, row_id, row_name) VALUES ('{table_name}', {row}.{id_column}, {row_name});
+                    END;
+                ''')
+
+        # Remove entries which can no longer be needed (ex. logged by older versions, which logged every change).
+        self.cursor.execute('DELETE FROM change_log WHERE NOT EXISTS (SELECT 1 FROM sync_state WHERE server_version IS NOT NULL);')
+
+
+    def migrate_legacy_project_tables(self):
+        """
+        Moves project data out of the per-migration projects_{id} tables used by older
+        versions of this application into the projects table, then drops them.
+        """
+
+        # Find legacy tables.
+        self.cursor.execute('SELECT name FROM sqlite_master WHERE type="table";')
+        legacy_tables = [table[0] for table in self.cursor.fetchall() if re.fullmatch(r'projects_\d+', table[0])]
+
+        # Copy rows of each legacy table into the projects table under its migration id.
+        for table_name in legacy_tables:
+            migration_id = int(table_name.split('_')[1])
+            self.cursor.execute(f'''
+                INSERT OR REPLACE INTO projects (migration_id, name, path, link, last_modified, size)
+                SELECT ?, name, path, link, last_modified, size FROM {table_name};
+            ''', (migration_id,))
+            self.cursor.execute(f'DROP TABLE {table_name};')
+
+
+    def backfill_project_values(self):
         """
-        Create a table to hold data for all projects, for a single migration.
+        Fills in the size in bytes and modification timestamp of projects written by older versions,
+        which only stored the scraped strings, without committing. Relative dates are resolved against
+        the date of each project's migration. Values which cannot be resolved are left empty.
+        """
+
+        self.cursor.execute('''
+            SELECT projects.id, projects.last_modified, projects.size, projects.size_bytes, projects.modified_at, migrations.date_time
+            FROM projects JOIN migrations ON migrations.id = projects.migration_id
+            WHERE projects.size_bytes IS NULL OR projects.modified_at IS NULL;
+        ''')
+
+        # Only update rows for which a value was resolved, to avoid logging unchanged rows.
+        updates = []
+        for id, last_modified, size, size_bytes, modified_at, date_time in self.cursor.fetchall():
+            reference_time = time.mktime(time.strptime(date_time, '%Y-%m-%d %H:%M:%S'))
+            resolved_size_bytes = size_bytes if size_bytes is not None or size is None else ProjectRecord.parse_size(size)
+            resolved_modified_at = modified_at if modified_at is not None or last_modified is None else ProjectRecord.parse_relative_time(last_modified, reference_time)
+            if (resolved_size_bytes, resolved_modified_at) != (size_bytes, modified_at):
+                updates.append((resolved_size_bytes, resolved_modified_at, id))
 
-        Each record in the table contains data for a single Repl project.
+        self.cursor.executemany('UPDATE projects SET size_bytes = ?, modified_at = ? WHERE id = ?;', updates)
+
+
+    def create_migration_table(self, date_time, account=None, output_path=None):
+        """
+        Creates a migration record, under which the data for all projects of a single
+        migration is stored in the projects table.
+
+        The Replit account and output directory of the migration are recorded if specified.
+        Returns the id of the new migration.
         """
 
         # Add details of this migration to the migrations table.
-        self.cursor.execute('INSERT INTO migrations (date_time) VALUES (?);', (date_time,))
+        self.cursor.execute('INSERT INTO migrations (date_time, account, output_path) VALUES (?, ?, ?);', (date_time, account, output_path))
 
         # Get id of this migration from migrations table.
         id = self.cursor.execute('SELECT last_insert_rowid();').fetchone()[0]
 
-        # Create table for this migration.
-        self.cursor.execute(f'''
-            CREATE TABLE IF NOT EXISTS projects_{id} (
-                id INTEGER PRIMARY KEY,
-                name TEXT,
-                path TEXT,
-                link TEXT,
-                last_modified TEXT,
-                size TEXT
-            );
-        ''')
+        # Commit changes to database.
+        self.conn.commit()
+        self.invalidate_cache('migrations')
+
+        return id
+
+
+    def set_migration_pinned(self, migration_id, pinned=True):
+        """
+        Pins or unpins a migration. Pinned migrations are never pruned.
+        Returns False if the migration does not exist.
+        """
+
+        self.cursor.execute('UPDATE migrations SET pinned = ? WHERE id = ?;', (int(pinned), migration_id))
+        updated = self.cursor.rowcount > 0
 
         # Commit changes to database.
         self.conn.commit()
 
+        return updated
+
+
+    def get_expired_migrations(self, keep_last=None, keep_days=None):
+        """
+        Returns the ids of migrations which are expired under a retention policy. Each account's
+        migrations are considered separately. A migration is kept if it is pinned, is its account's
+        latest, is one of its account's keep_last latest, or was made within the last keep_days days.
+        Rules which are None are not applied, so no migrations expire if both are None.
+        """
+
+        # Exit if no retention policy is set.
+        if keep_last is None and keep_days is None:
+            return []
+
+        cutoff_time = time.time() - keep_days*24*60*60 if keep_days is not None else None
+
+        # Rank each account's migrations from latest to earliest.
+        expired = []
+        account_counts = {}
+        for id, date_time, account, pinned in self.cursor.execute('SELECT id, date_time, account, pinned FROM migrations ORDER BY id DESC;').fetchall():
+            rank = account_counts.get(account, 0)
+            account_counts[account] = rank + 1
+
+            if pinned or rank == 0:
+                continue
+            if keep_last is not None and rank < keep_last:
+                continue
+            if cutoff_time is not None:
+                try:
+                    if time.mktime(time.strptime(date_time, '%Y-%m-%d %H:%M:%S')) >= cutoff_time:
+                        continue
+                except (TypeError, ValueError):
+                    # Unknown date, so the migration can't be shown to be old enough to prune.
+                    continue
+            expired.append(id)
+
+        return expired
+
+
+    def prune_migrations(self, keep_last=None, keep_days=None):
+        """
+        Deletes migrations which are expired under a retention policy (see get_expired_migrations()),
+        along with their projects and file statistics, in a single transaction. If user is logged in,
+        the deletions are uploaded to the Replit Migrator Database Server (see request_sync()).
+
+        Space freed is reused by later writes. Run compact_database() to also shrink the database file.
+        Returns the ids of the pruned migrations.
+        """
+
+        expired = self.get_expired_migrations(keep_last, keep_days)
+        if len(expired) == 0:
+            return []
+
+        with self.conn:
+            ids = [(id,) for id in expired]
+            self.cursor.executemany('DELETE FROM projects WHERE migration_id = ?;', ids)
+            self.cursor.executemany('DELETE FROM migrations WHERE id = ?;', ids)
+            self.delete_migration_files(expired)
+
+        # Remove contents of files which only pruned migrations had from the full-text index.
+        self.delete_unreferenced_contents()
+
+        self.invalidate_cache('migrations', *[('projects', id) for id in expired])
+        self.request_sync()
+
+        return expired
+
+
+    def delete_migration_files(self, migration_ids):
+        """
+        Deletes the file statistics and extraction fingerprints of migrations which were removed, without
+        committing. Run delete_unreferenced_contents() afterwards to remove their contents from the index.
+        """
+
+        ids = [(id,) for id in migration_ids]
+        self.cursor.executemany('DELETE FROM files WHERE migration_id = ?;', ids)
+        # Trees last recorded by a removed migration have no file statistics left to copy, so they are extracted again.
+        self.cursor.executemany('DELETE FROM extraction_fingerprints WHERE migration_id = ?;', ids)
+
+
+    def compact_database(self):
+        """
+        Shrinks the database file and refreshes the statistics used by the query planner.
+
+        Change log entries are also discarded if the database has never been synced with the
+        server, as the first sync uploads the whole database anyway.
+        """
+
+        with self.conn:
+            self.cursor.execute('DELETE FROM change_log WHERE NOT EXISTS (SELECT 1 FROM sync_state WHERE server_version IS NOT NULL);')
+
+        # Both statements must run outside of a transaction. VACUUM rewrites the database without free pages.
+        self.conn.execute('ANALYZE;')
+        self.conn.execute('VACUUM;')
+
+        # Empty the write-ahead log into the database file, so that its space is released too.
+        self.conn.execute('PRAGMA wal_checkpoint(TRUNCATE);')
+
 
     def get_migration_tables(self):
         """
         Retrieves the details of all entries in the migrations table and returns them as a list,
-        where each entry is a dictionary containing the id and date_time of the migration.
+        where each entry is a dictionary containing the id, date_time, account and output_path of the migration.
         """
 
-        # Get all entries from the migrations table.
-        self.cursor.execute('SELECT * FROM migrations;')
-        rows = self.cursor.fetchall()
+        # Get all entries from the migrations table, or from the cache if they have not changed since last read.
+        rows = self.read_cached('migrations', lambda: self.cursor.execute('SELECT id, date_time, account, output_path FROM migrations ORDER BY id;').fetchall())
 
         # Reformat data into a list of dictionaries.
         migrations = []
         for row in rows:
-            id, date_time = row
-            migrations.append({'id': id, 'date_time': date_time})
+            id, date_time, account, output_path = row
+            migrations.append({'id': id, 'date_time': date_time, 'account': account, 'output_path': output_path})
+
+        return migrations
+
+
+    def write_projects(self, projects, table_id=None, login_details=None, upsert=False):
+        """
+        Writes project data for the specified migration, identified by id, in a single transaction.
+        If user is logged in, projects are uploaded to the Replit Migrator Database Server (see request_sync()).
+
+        By default, all existing projects of the migration are replaced. If upsert is True,
+        existing rows are updated in place instead, and only rows of removed projects are deleted.
+        """
+
+        # If migration id not specified, use id of the latest migration created.
+        if table_id is None:
+            table_id = self.cursor.execute('SELECT id FROM migrations ORDER BY id DESC LIMIT 1;').fetchone()[0]
+
+        # Write all rows in one transaction, which is committed on success and rolled back on error.
+        with self.conn:
+            self.insert_projects(table_id, projects, upsert)
+        self.invalidate_cache(('projects', int(table_id)))
+
+        # Upload projects to the Replit Migrator Database Server.
+        self.request_sync()
+
+
+    def insert_projects(self, migration_id, projects, upsert=False):
+        """
+        Inserts project data for the specified migration with batched statements, without committing.
+        See write_projects() for the meaning of upsert.
+        """
+
+        # Form rows of project data lazily. Each statement is prepared once and executed for every row.
+        rows = ((migration_id, project.name, project.path, project.link, project.last_modified, project.size, project.size_bytes, project.modified_at)
+                for project in projects.values())
+
+        if not upsert:
+            # Delete all existing projects of the migration, then insert new rows.
+            self.cursor.execute('DELETE FROM projects WHERE migration_id = ?;', (migration_id,))
+            self.cursor.executemany('''
+                INSERT INTO projects (migration_id, name, path, link, last_modified, size, size_bytes, modified_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?);
+            ''', rows)
+            return
+
+        # Insert new projects and update changed ones. Unchanged rows are left untouched.
+        self.cursor.executemany('''
+            INSERT INTO projects (migration_id, name, path, link, last_modified, size, size_bytes, modified_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (migration_id, name) DO UPDATE SET
+                path = excluded.path,
+                link = excluded.link,
+                last_modified = excluded.last_modified,
+                size = excluded.size,
+                size_bytes = excluded.size_bytes,
+                modified_at = excluded.modified_at
+            WHERE projects.path IS NOT excluded.path
+                OR projects.link IS NOT excluded.link
+                OR projects.last_modified IS NOT excluded.last_modified
+                OR projects.size IS NOT excluded.size
+                OR projects.size_bytes IS NOT excluded.size_bytes
+                OR projects.modified_at IS NOT excluded.modified_at;
+        ''', rows)
+
+        # Delete projects which no longer exist, using a temporary table of the written names.
+        self.cursor.execute('CREATE TEMP TABLE IF NOT EXISTS written_project_names (name TEXT PRIMARY KEY);')
+        self.cursor.execute('DELETE FROM written_project_names;')
+        self.cursor.executemany('INSERT OR IGNORE INTO written_project_names (name) VALUES (?);', ((name,) for name in projects))
+        self.cursor.execute('''
+            DELETE FROM projects
+            WHERE migration_id = ? AND name NOT IN (SELECT name FROM written_project_names);
+        ''', (migration_id,))
+
+
+    def read_projects(self, table_id=None):
+        """
+        Reads project data of the specified migration and returns it as a dictionary
+        of ProjectRecord objects, keyed by project name.
+
+        Results are cached until the projects of the migration are written.
+        """
+
+        # If id not specified, use id of the latest migration created.
+        if table_id is None:
+            table_id = self.get_migration_tables()[-1]['id']
+
+        # Copy the cached dictionary, so that callers may modify it.
+        return dict(self.read_shared_projects(table_id))
+
+
+    def read_shared_projects(self, table_id=None):
+        """
+        Reads project data of the specified migration like read_projects(), but returns a read-only
+        view of the cached dictionary shared by all callers, rather than a copy. Screens read project
+        data through this when it is needed, so that they never hold outdated copies.
+        """
+
+        # If id not specified, use id of the latest migration created.
+        if table_id is None:
+            table_id = self.get_migration_tables()[-1]['id']
+
+        return types.MappingProxyType(self.read_cached(('projects', int(table_id)), lambda: self.query_projects(table_id)))
+
+
+    def query_projects(self, table_id):
+        """
+        Reads project data of the specified migration from the database, bypassing the cache.
+        """
+
+        # Get all projects of the migration.
+        self.cursor.execute('SELECT name, path, link, last_modified, size, size_bytes, modified_at FROM projects WHERE migration_id = ?;', (table_id,))
+
+        return self.rows_to_project_records(self.cursor.fetchall())
+
+
+    def read_projects_modified_between(self, start_time, end_time, table_id=None):
+        """
+        Reads the projects of the specified migration (by default, the latest) which were last modified
+        in the given interval of Unix timestamps, including the start and excluding the end, using the
+        index on modification time. Returns a dictionary of ProjectRecord objects, keyed by project name.
+        """
+
+        # If id not specified, use id of the latest migration created.
+        if table_id is None:
+            table_id = self.get_migration_tables()[-1]['id']
+
+        self.cursor.execute('''
+            SELECT name, path, link, last_modified, size, size_bytes, modified_at FROM projects
+            WHERE migration_id = ? AND modified_at >= ? AND modified_at < ?
+            ORDER BY modified_at DESC;
+        ''', (table_id, start_time, end_time))
+
+        return self.rows_to_project_records(self.cursor.fetchall())
+
+
+    def read_project_totals(self, table_id=None):
+        """
+        Returns the number of projects of the specified migration (by default, the latest) and their
+        total size in bytes, aggregated by the database. Projects of unknown size are not counted in the total.
+        """
+
+        # If id not specified, use id of the latest migration created.
+        if table_id is None:
+            table_id = self.get_migration_tables()[-1]['id']
+
+        count, size_bytes = self.cursor.execute('SELECT COUNT(*), TOTAL(size_bytes) FROM projects WHERE migration_id = ?;', (table_id,)).fetchone()
+
+        return {'projects': count, 'size_bytes': int(size_bytes)}
+
+
+    def rows_to_project_records(self, rows):
+        """
+        Converts rows of (name, path, link, last_modified, size, size_bytes, modified_at) into a
+        dictionary of ProjectRecord objects, keyed by project name.
+        """
+
+        projects = {}
+        for row in rows:
+            name, path, link, last_modified, size, size_bytes, modified_at = row
+            projects[name] = ProjectRecord(name, path, link, last_modified, size, size_bytes=size_bytes, modified_at=modified_at)
+
+        return projects
+
+
+    def read_project_history(self, name):
+        """
+        Reads the data of a project across every migration in which it appears, ordered from
+        oldest to newest. Returns a list of dictionaries containing the migration id, migration
+        date_time and ProjectRecord of each appearance.
+        """
+
+        # Get all appearances of the project, using the index on project name.
+        self.cursor.execute('''
+            SELECT migrations.id, migrations.date_time, projects.path, projects.link, projects.last_modified, projects.size, projects.size_bytes, projects.modified_at
+            FROM projects JOIN migrations ON migrations.id = projects.migration_id
+            WHERE projects.name = ?
+            ORDER BY migrations.id;
+        ''', (name,))
+        rows = self.cursor.fetchall()
+
+        # Reformat data into a list of dictionaries.
+        history = []
+        for row in rows:
+            migration_id, date_time, path, link, last_modified, size, size_bytes, modified_at = row
+            history.append({
+                'migration_id': migration_id,
+                'date_time': date_time,
+                'project': ProjectRecord(name, path, link, last_modified, size, size_bytes=size_bytes, modified_at=modified_at)
+            })
+
+        return history
+
+
+    def append_chat_messages(self, messages, conversation_id):
+        """
+        Appends messages (dictionaries containing the role and content) to a conversation, timestamped
+        with the current time, and returns their ids. Only the new rows are written, so the cost does
+        not grow with the length of the conversation.
+        If user is logged in, new messages are uploaded to the Replit Migrator Database Server (see request_sync()).
+        """
+
+        created_at = time.strftime('%Y-%m-%d %H:%M:%S')
+
+        # Insert all messages in one transaction, which is committed on success and rolled back on error.
+        ids = []
+        with self.conn:
+            for message in messages:
+                self.cursor.execute('''
+                    INSERT INTO chat_history (role, content, conversation_id, created_at)
+                    VALUES (?, ?, ?, ?);
+                ''', (message['role'], message['content'], conversation_id, created_at))
+                ids.append(self.cursor.lastrowid)
+
+        # Upload new messages to the Replit Migrator Database Server.
+        self.request_sync()
+
+        return ids
+
+
+    def clear_chat_history(self, conversation_id=None):
+        """
+        Deletes the messages of a conversation (by default, the latest). Other conversations are kept.
+        """
+
+        if conversation_id is None:
+            conversation_id = self.get_latest_conversation_id()
+
+        with self.conn:
+            self.cursor.execute('DELETE FROM chat_history WHERE conversation_id = ?;', (conversation_id,))
+
+        # Upload deletion to the Replit Migrator Database Server.
+        self.request_sync()
+
+
+    def get_latest_conversation_id(self):
+        """
+        Returns the id of the latest conversation, or 1 if there is no chat history.
+        """
+
+        conversation_id = self.cursor.execute('SELECT MAX(conversation_id) FROM chat_history;').fetchone()[0]
+
+        return conversation_id if conversation_id is not None else 1
+
+
+    def read_chat_history(self, conversation_id=None, limit=None, before_id=None):
+        """
+        Reads a page of the messages of a conversation (by default, the latest), in the order they were sent.
+
+        If limit is specified, only the latest limit messages are read, sent before the message
+        with id before_id if specified, so that earlier pages can be read on demand. Each message is
+        a dictionary containing the id, role, content and created_at timestamp of the message.
+        """
+
+        if conversation_id is None:
+            conversation_id = self.get_latest_conversation_id()
+
+        # Read the page newest first using the conversation index, then reverse it into the order sent.
+        # A negative limit means no limit in SQLite.
+        parameters = [conversation_id]
+        if before_id is not None:
+            parameters.append(before_id)
+        parameters.append(limit if limit is not None else -1)
+        self.cursor.execute(f'''
+            SELECT id, role, content, created_at FROM chat_history
+            WHERE conversation_id = ? {'AND id < ?' if before_id is not None else ''}
+            ORDER BY id DESC
+            LIMIT ?;
+        ''', parameters)
+        rows = self.cursor.fetchall()
+        rows.reverse()
+
+        # Reformat data into a list of dictionaries.
+        chat_history = []
+        for row in rows:
+            id, role, content, created_at = row
+            chat_history.append({'id': id, 'role': role, 'content': content, 'created_at': created_at})
+
+        return chat_history
+
+
+    def write_login_details(self, username, password):
+        """
+        Writes login details to the login_details table.
+        """
+
+        # Delete any previous details.
+        self.cursor.execute('DELETE FROM login_details')
+
+        # Insert login details into database.
+        self.cursor.execute('''
+            INSERT INTO login_details (username, password)
+            VALUES (?, ?);
+        ''', (username, password))
+
+        # Commit changes to database.
+        self.conn.commit()
+        self.invalidate_cache('login_details')
+    
+
+    def delete_login_details(self):
+        """
+        Deletes login details from the login_details table.
+        """
+
+        # Delete all rows from the login_details table.
+        self.cursor.execute('DELETE FROM login_details')
+
+        # Forget sync state and logged changes, so that the next user to log in starts with a full sync.
+        self.cursor.execute('DELETE FROM sync_state')
+        self.cursor.execute('DELETE FROM change_log')
+
+        # Commit changes to database.
+        self.conn.commit()
+        self.invalidate_cache('login_details')
+
+    
+    def read_login_details(self):
+        """
+        Reads login details from the login_details table. Results are cached until login details are written or deleted.
+        """
+
+        # Get login details from the login_details table, or from the cache if they have not changed since last read.
+        rows = self.read_cached('login_details', lambda: self.cursor.execute('SELECT * FROM login_details;').fetchall())
+
+        # Check if login details exist.
+        if len(rows) == 0:
+            # No login details found. Return None.
+            return None
+        
+        # Login details found. Format in to dictionary and return them.
+        login_details = {
+            'username': rows[0][1],
+            'password': rows[0][2]
+        }
+
+        return login_details
+
+
+    def check_if_logged_in(self):
+        """
+        Checks if the user is logged in, returning True if so and False if not.
+        """
+
+        # Read login details from the login_details table.
+        login_details = self.read_login_details()
+
+        # Check if login details exist.
+        if login_details is None:
+            # Login details not found.
+            return False
+        
+        # Login details found.
+        return True
+
+
+    def write_fingerprint(self, project_path, zip_size, crc_digest, migration_id):
+        """
+        Records the fingerprint of the zip file a project was extracted from, and the migration
+        whose file statistics were recorded from the extracted tree.
+        """
+
+        # Insert fingerprint, replacing any previous fingerprint for this project.
+        self.cursor.execute('''
+            INSERT OR REPLACE INTO extraction_fingerprints (project_path, zip_size, crc_digest, migration_id)
+            VALUES (?, ?, ?, ?);
+        ''', (project_path, zip_size, crc_digest, migration_id))
+
+        # Commit changes to database.
+        self.conn.commit()
+
+
+    def read_fingerprint(self, project_path):
+        """
+        Reads the fingerprint of the zip file a project was last extracted from.
+        Returns None if the project has never been extracted.
+        """
+
+        # Get fingerprint from the extraction_fingerprints table.
+        self.cursor.execute('SELECT zip_size, crc_digest FROM extraction_fingerprints WHERE project_path = ?;', (project_path,))
+        row = self.cursor.fetchone()
+
+        # Check if fingerprint exists.
+        if row is None:
+            return None
+
+        return {'zip_size': row[0], 'crc_digest': row[1]}
+
+
+    def write_file_stats(self, migration_id, project_path, file_stats):
+        """
+        Writes the statistics of every file extracted from a project, replacing any
+        previously recorded for that project in the given migration.
+        """
+
+        # Delete previous statistics for this project.
+        self.cursor.execute('DELETE FROM files WHERE migration_id = ? AND project_path = ?;', (migration_id, project_path))
+
+        # Insert statistics for each file.
+        self.cursor.executemany('''
+            INSERT INTO files (migration_id, project_path, relative_path, name, extension, size, mtime, line_count, is_text, content_hash)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?);
+        ''', [(migration_id, project_path, file['relative_path'], file['name'], file['extension'], file['size'], file['mtime'],
+               file['line_count'], file['is_text'], file['content_hash']) for file in file_stats])
+
+        # Commit changes to database.
+        self.conn.commit()
+
+
+    def copy_file_stats(self, migration_id, project_path):
+        """
+        Copies the most recently recorded file statistics of a project into the given migration,
+        if that migration has none. Used when a project is unchanged and extraction is skipped.
+        Only migrations with the same output directory are considered, since project paths are
+        relative to it (ex. each account of a batch migration has its own output directory).
+        """
+
+        # Exit if statistics already exist for this migration.
+        existing = self.cursor.execute('SELECT 1 FROM files WHERE migration_id = ? AND project_path = ? LIMIT 1;', (migration_id, project_path)).fetchone()
+        if existing is not None:
+            return
+
+        # Copy statistics from the latest migration into the same output directory which recorded them.
+        self.cursor.execute('''
+            INSERT INTO files (migration_id, project_path, relative_path, name, extension, size, mtime, line_count, is_text, content_hash)
+            SELECT ?, project_path, relative_path, name, extension, size, mtime, line_count, is_text, content_hash FROM files
+            WHERE project_path = ? AND migration_id = (
+                SELECT MAX(files.migration_id) FROM files JOIN migrations ON migrations.id = files.migration_id
+                WHERE files.project_path = ? AND migrations.output_path IS (SELECT output_path FROM migrations WHERE id = ?)
+            );
+        ''', (migration_id, project_path, project_path, migration_id))
+
+        # Commit changes to database.
+        self.conn.commit()
+
+
+    def read_file_signatures(self, migration_id):
+        """
+        Reads the size, modification time and content hash recorded for every file of a migration,
+        keyed by (project path, relative path). Used to detect files changed since they were recorded.
+        """
+
+        self.cursor.execute('SELECT project_path, relative_path, size, mtime, content_hash FROM files WHERE migration_id = ?;', (migration_id,))
+
+        return {(project_path, relative_path): (size, mtime, content_hash) for project_path, relative_path, size, mtime, content_hash in self.cursor.fetchall()}
+
+
+    def update_file_stats(self, migration_id, file_stats, touched_files, deleted_files):
+        """
+        Replaces the statistics of individual files of a migration, in a single transaction.
+        file_stats is a list of (project path, file statistics) tuples for added or changed files,
+        touched_files a list of (project path, relative path, mtime) tuples for files whose content
+        is unchanged but whose modification time changed, and deleted_files a list of (project path,
+        relative path) tuples for files which no longer exist.
+        """
 
-        return migrations
+        replaced_files = [(project_path, file['relative_path']) for project_path, file in file_stats]
+
+        with self.conn:
+            # Only the modification time of touched files is rewritten.
+            self.cursor.executemany('UPDATE files SET mtime = ? WHERE migration_id = ? AND project_path = ? AND relative_path = ?;',
+                                    [(mtime, migration_id, project_path, relative_path) for project_path, relative_path, mtime in touched_files])
+            self.cursor.executemany('DELETE FROM files WHERE migration_id = ? AND project_path = ? AND relative_path = ?;',
+                                    [(migration_id, project_path, relative_path) for project_path, relative_path in deleted_files + replaced_files])
+            self.cursor.executemany('''
+                INSERT INTO files (migration_id, project_path, relative_path, name, extension, size, mtime, line_count, is_text, content_hash)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?);
+            ''', [(migration_id, project_path, file['relative_path'], file['name'], file['extension'], file['size'], file['mtime'],
+                   file['line_count'], file['is_text'], file['content_hash']) for project_path, file in file_stats])
 
 
-    def write_projects(self, projects, table_id=None, login_details=None):
+    def read_line_counts_by_extension(self, table_id=None):
         """
-        Writes project data to the specified migration table, identified by id.
-        If user is logged in, uploads projects to the Replit Migrator Database Server.
+        Reads the total number of lines of each text file type, by file extension, as well
+        as the total number of text files, for the specified migration.
+
+        Returns None if no file statistics were recorded for the migration.
         """
 
-        # If migration table id not specified, use id of the latest migration table created.
+        # If id not specified, use id of the latest migration table created.
         if table_id is None:
             table_id = self.cursor.execute('SELECT id FROM migrations ORDER BY id DESC LIMIT 1;').fetchone()[0]
-            
-        # Form name of migration table.
-        table_name = f'projects_{table_id}'
 
-        # Delete all rows from the migration table.
-        self.cursor.execute(f'DELETE FROM {table_name}')
+        # Check whether statistics were recorded for this migration.
+        if self.cursor.execute('SELECT 1 FROM files WHERE migration_id = ? LIMIT 1;', (table_id,)).fetchone() is None:
+            return None
 
-        # Insert new rows into the migration table with project data.
-        for name, project_data in projects.items():
-            self.cursor.execute(f'''
-                INSERT INTO {table_name} (name, path, link, last_modified, size)
-                VALUES (?, ?, ?, ?, ?);
-            ''', (name, project_data['path'], project_data['link'], project_data['last_modified'], project_data['size']))
+        # Sum line counts of text files, grouped by extension.
+        self.cursor.execute('''
+            SELECT extension, SUM(line_count), COUNT(*) FROM files
+            WHERE migration_id = ? AND is_text = 1
+            GROUP BY extension;
+        ''', (table_id,))
+        rows = self.cursor.fetchall()
 
-        # Commit changes to database.
-        self.conn.commit()
+        # Reformat data into a dictionary and a total file count.
+        type_count = {extension: line_count for extension, line_count, file_count in rows}
+        text_file_count = sum([file_count for extension, line_count, file_count in rows])
 
-        # Check if user is logged in.
-        if self.check_if_logged_in():
-            # User is logged in. Get login details.
-            login_details = self.read_login_details()
-            # Upload projects to the Replit Migrator Database Server.
-            self.upload_database_to_server(login_details['username'], login_details['password'])
+        return type_count, text_file_count
 
 
-    def read_projects(self, table_id=None):
+    def read_files_by_name(self, pattern, table_id=None):
         """
-        Reads project data from the specified projects table and returns it.
+        Reads the statistics of every file in the specified migration whose name matches the
+        regular expression pattern, ordered by path. Each file is a dictionary containing its
+        project path, relative path, name, extension, size, mtime, line count, text flag and the
+        output path of the migration (None if it was not recorded).
+
+        Returns None if no file statistics were recorded for the migration.
         """
 
+        # Check the pattern before querying, so that an invalid pattern raises re.error rather than a database error.
+        re.compile(pattern)
+
         # If id not specified, use id of the latest migration table created.
         if table_id is None:
-            table_id = self.cursor.execute('SELECT id FROM migrations ORDER BY id DESC LIMIT 1;').fetchone()[0]
-
-        # Form name of migration table.
-        table_name = f'projects_{table_id}'
+            row = self.cursor.execute('SELECT id FROM migrations ORDER BY id DESC LIMIT 1;').fetchone()
+            if row is None:
+                return None
+            table_id = row[0]
 
-        # Get all rows from the migration table.
-        self.cursor.execute(f'SELECT * FROM {table_name};')
-        rows = self.cursor.fetchall()
+        # Check whether statistics were recorded for this migration.
+        if self.cursor.execute('SELECT 1 FROM files WHERE migration_id = ? LIMIT 1;', (table_id,)).fetchone() is None:
+            return None
 
-        # Reformat data into a dictionary.
-        projects = {}
-        for row in rows:
-            id, name, path, link, last_modified, size = row
-            projects[name] = {'path': path, 'link': link, 'last_modified': last_modified, 'size': size}
+        # Names matching a pattern anchored at the start share its literal prefix, so only the range of names which begin
+        # with the prefix is read using the index on (migration_id, name). Otherwise, every name of the migration is matched.
+        conditions = ['files.migration_id = ?', 'files.name REGEXP ?']
+        parameters = [table_id, pattern]
+        prefix = self.get_literal_prefix(pattern)
+        if prefix:
+            conditions.append('files.name >= ?')
+            parameters.append(prefix)
+            # Names beginning with the prefix sort before the prefix with its last character incremented.
+            next_code_point = ord(prefix[-1]) + 1
+            if 0xD800 <= next_code_point <= 0xDFFF:
+                # Surrogates can't be stored as UTF-8, and sort with the characters after them.
+                next_code_point = 0xE000
+            if next_code_point <= 0x10FFFF:
+                conditions.append('files.name < ?')
+                parameters.append(prefix[:-1] + chr(next_code_point))
+
+        # Also read the output directory recorded with the migration, which the paths are relative to.
+        self.cursor.execute(f'''
+            SELECT files.project_path, files.relative_path, files.name, files.extension, files.size, files.mtime, files.line_count, files.is_text,
+                   migrations.output_path
+            FROM files JOIN migrations ON migrations.id = files.migration_id
+            WHERE {' AND '.join(conditions)}
+            ORDER BY files.project_path, files.relative_path;
+        ''', parameters)
+        columns = ['project_path', 'relative_path', 'name', 'extension', 'size', 'mtime', 'line_count', 'is_text', 'output_path']
 
-        return projects
+        return [dict(zip(columns, row)) for row in self.cursor.fetchall()]
 
 
-    def write_chat_history(self, chat_history):
+    def read_unindexed_files(self, table_id):
         """
-        Writes chat history data to the chat_history table.
-        If user is logged in, uploads chat history to the Replit Migrator Database Server.
+        Reads the project path and relative path of one text file of the specified migration for
+        each distinct content which is not yet in the full-text index, keyed by content hash.
         """
 
-        # Delete all rows from the chat_history table.
-        self.cursor.execute('DELETE FROM chat_history')
+        self.cursor.execute('''
+            SELECT content_hash, project_path, relative_path FROM files
+            WHERE migration_id = ? AND is_text = 1 AND content_hash NOT IN (SELECT content_hash FROM file_contents)
+            GROUP BY content_hash;
+        ''', (table_id,))
+
+        return {content_hash: (project_path, relative_path) for content_hash, project_path, relative_path in self.cursor.fetchall()}
+
+
+    def write_file_not_text(self, migration_id, project_path, relative_path):
+        """
+        Records that a file of a migration is not text, so that it is not indexed.
+        """
 
-        # Insert new rows into the chat_history table.
-        for message in chat_history:
+        with self.conn:
             self.cursor.execute('''
-                INSERT INTO chat_history (role, content)
-                VALUES (?, ?);
-            ''', (message['role'], message['content']))
+                UPDATE files SET is_text = 0
+                WHERE migration_id = ? AND project_path = ? AND relative_path = ?;
+            ''', (migration_id, project_path, relative_path))
 
-        # Commit changes to database.
-        self.conn.commit()
 
-        # Check if user is logged in.
-        if self.check_if_logged_in():
-            # User is logged in. Get login details.
-            login_details = self.read_login_details()
-            # Upload chat history to the Replit Migrator Database Server.
-            self.upload_database_to_server(login_details['username'], login_details['password'])
-    
+    def write_indexed_lines(self, content_hash, lines):
+        """
+        Adds the lines of a file's content to the full-text index, in a single transaction.
+        lines is an iterable of strings, which is consumed lazily.
+        """
+
+        with self.conn:
+            self.cursor.execute('INSERT OR IGNORE INTO file_contents (content_hash) VALUES (?);', (content_hash,))
+            content_id = self.cursor.execute('SELECT id FROM file_contents WHERE content_hash = ?;', (content_hash,)).fetchone()[0]
+
+            # Replace any lines of a previous, interrupted attempt.
+            first_rowid = content_id << self.LINE_NUMBER_BITS
+            self.cursor.execute('DELETE FROM file_lines WHERE rowid BETWEEN ? AND ?;', (first_rowid, first_rowid + (1 << self.LINE_NUMBER_BITS) - 1))
+            self.cursor.executemany('INSERT INTO file_lines (rowid, line) VALUES (?, ?);',
+                                    ((first_rowid + line_number, line) for line_number, line in enumerate(lines)))
 
-    def read_chat_history(self):
+
+    def delete_unreferenced_contents(self):
         """
-        Reads chat history data from the chat_history table.
+        Removes contents which no file refers to any more (ex. after a project was re-extracted
+        or a migration was pruned) from the full-text index. Returns the number removed.
         """
 
-        # Get all rows from the chat_history table.
-        self.cursor.execute('SELECT * FROM chat_history;')
-        rows = self.cursor.fetchall()
+        if not self.content_index_supported:
+            return 0
 
-        # Reformat data into a list of dictionaries.
-        chat_history = []
-        for row in rows:
-            id, role, content = row
-            chat_history.append({'role': role, 'content': content})
+        with self.conn:
+            self.cursor.execute('SELECT id FROM file_contents WHERE content_hash NOT IN (SELECT content_hash FROM files WHERE content_hash IS NOT NULL);')
+            content_ids = [row[0] for row in self.cursor.fetchall()]
+            self.cursor.executemany('DELETE FROM file_lines WHERE rowid BETWEEN ? AND ?;',
+                                    [(id << self.LINE_NUMBER_BITS, ((id + 1) << self.LINE_NUMBER_BITS) - 1) for id in content_ids])
+            self.cursor.executemany('DELETE FROM file_contents WHERE id = ?;', [(id,) for id in content_ids])
 
-        return chat_history
+        return len(content_ids)
 
 
-    def write_login_details(self, username, password):
+    def build_scope_clause(self, output_paths):
         """
-        Writes login details to the login_details table.
+        Builds a WITH clause defining the table scope, which identifies the files currently extracted
+        under some output directories: for each project of the migrations recorded with those output
+        paths, the latest migration which recorded its files. output_paths maps each recorded output
+        path (None for migrations recorded without one) to the directory it refers to, which is the
+        output_path column of scope. Returns the clause and its parameters.
         """
 
-        # Delete any previous details.
-        self.cursor.execute('DELETE FROM login_details')
+        # Several recorded paths (ex. with and without a trailing separator) may refer to the same directory.
+        clause = f'''
+            WITH roots (recorded_path, output_path) AS (VALUES {', '.join('(?, ?)' for output_path in output_paths)}),
+            scope AS (
+                SELECT roots.output_path, files.project_path, MAX(files.migration_id) AS migration_id
+                FROM roots
+                JOIN migrations ON migrations.output_path IS roots.recorded_path
+                JOIN files ON files.migration_id = migrations.id
+                GROUP BY roots.output_path, files.project_path
+            )
+        '''
 
-        # Insert login details into database.
-        self.cursor.execute('''
-            INSERT INTO login_details (username, password)
-            VALUES (?, ?);
-        ''', (username, password))
+        return clause, [path for item in output_paths.items() for path in item]
 
-        # Commit changes to database.
-        self.conn.commit()
-    
 
-    def delete_login_details(self):
+    def read_scope_migrations(self, output_paths):
         """
-        Deletes login details from the login_details table.
+        Reads the (migration id, output path) pairs of the migrations which the files in scope
+        (see build_scope_clause()) were recorded by.
         """
 
-        # Delete all rows from the login_details table.
-        self.cursor.execute('DELETE FROM login_details')
+        if len(output_paths) == 0:
+            return []
 
-        # Commit changes to database.
-        self.conn.commit()
+        clause, parameters = self.build_scope_clause(output_paths)
 
-    
-    def read_login_details(self):
+        return self.cursor.execute(clause + 'SELECT DISTINCT migration_id, output_path FROM scope ORDER BY migration_id;', parameters).fetchall()
+
+
+    def check_content_index_complete(self, output_paths):
         """
-        Reads login details from the login_details table.
+        Checks whether the full-text index holds the contents of every text file in scope (see
+        build_scope_clause()). Returns False if no file statistics were recorded in scope.
         """
 
-        # Get login details from the login_details table.
-        self.cursor.execute('SELECT * FROM login_details;')
-        rows = self.cursor.fetchall()
+        if not self.content_index_supported or len(output_paths) == 0:
+            return False
 
-        # Check if login details exist.
-        if len(rows) == 0:
-            # No login details found. Return None.
-            return None
-        
-        # Login details found. Format in to dictionary and return them.
-        login_details = {
-            'username': rows[0][1],
-            'password': rows[0][2]
-        }
+        clause, parameters = self.build_scope_clause(output_paths)
+        if self.cursor.execute(clause + 'SELECT 1 FROM scope LIMIT 1;', parameters).fetchone() is None:
+            return False
 
-        return login_details
+        missing = self.cursor.execute(clause + '''
+            SELECT 1 FROM scope
+            JOIN files ON files.migration_id = scope.migration_id AND files.project_path = scope.project_path
+            WHERE files.is_text = 1 AND files.content_hash NOT IN (SELECT content_hash FROM file_contents)
+            LIMIT 1;
+        ''', parameters).fetchone()
 
+        return missing is None
 
-    def check_if_logged_in(self):
+
+    def read_indexed_lines(self, query, output_paths):
         """
-        Checks if the user is logged in, returning True if so and False if not.
+        Yields every line of the text files in scope (see build_scope_clause()) which matches an FTS5
+        query on the full-text index, as (output path, project path, relative path, name, line number,
+        line). A line of content shared by several files is yielded once for each file.
         """
 
-        # Read login details from the login_details table.
-        login_details = self.read_login_details()
+        if len(output_paths) == 0:
+            return
 
-        # Check if login details exist.
-        if login_details is None:
-            # Login details not found.
-            return False
-        
-        # Login details found.
-        return True
+        # Use a separate cursor, since the caller may use the shared cursor between lines.
+        clause, parameters = self.build_scope_clause(output_paths)
+        yield from self.conn.execute(clause + f'''
+            SELECT scope.output_path, files.project_path, files.relative_path, files.name, file_lines.rowid & ?, file_lines.line
+            FROM file_lines
+            JOIN file_contents ON file_contents.id = file_lines.rowid >> {self.LINE_NUMBER_BITS}
+            JOIN files ON files.content_hash = file_contents.content_hash
+            JOIN scope ON scope.migration_id = files.migration_id AND scope.project_path = files.project_path
+            WHERE file_lines MATCH ?
+            ORDER BY scope.output_path, files.project_path, files.relative_path, file_lines.rowid;
+        ''', parameters + [(1 << self.LINE_NUMBER_BITS) - 1, query])
 
 
     def convert_database_to_dict(self):
@@ -294,13 +1418,16 @@ class DatabaseHandler:
         # Get migrations data.
         migrations = self.get_migration_tables()
 
-        # Add projects data to migrations and add to data.
+        # Add projects data to migrations and add to data. Projects are read without caching, as every migration is read once.
         for migration in migrations:
-            migration['projects'] = self.read_projects(migration['id'])
+            projects = self.query_projects(migration['id'])
+            migration['projects'] = {name: project.to_dict() for name, project in projects.items()}
             data['migrations'].append(migration)
         
-        # Get chat history data.
-        chat_history = self.read_chat_history()
+        # Get chat history data, including ids so that the server can apply later changes to individual messages.
+        self.cursor.execute('SELECT id, role, content, conversation_id, created_at FROM chat_history ORDER BY id;')
+        chat_history = [{'id': id, 'role': role, 'content': content, 'conversation_id': conversation_id, 'created_at': created_at}
+                        for id, role, content, conversation_id, created_at in self.cursor.fetchall()]
 
         # Add chat history data to data.
         data['chat_history'] = chat_history
@@ -311,62 +1438,494 @@ class DatabaseHandler:
     def load_database_from_dict(self, data):
         """
         Accepts a dictionary containing data and loads it into the SQLite3 database.
+
+        The data is merged in place, in a single transaction (see load_database_from_records()).
+        Login details and data describing this machine's files are kept.
         """
 
         # Check if data is empty. If so, exit function.
         if len(data) == 0:
             return
 
-        # Get current login details so they can be restored after database is cleared.
-        login_details = self.read_login_details()
-
-        # Get list of all tables in existing database.
-        self.cursor.execute('SELECT name FROM sqlite_master WHERE type="table";')
+        self.load_database_from_records(self.iterate_dict_records(data))
 
-        # Delete all tables in existing database.
-        for table in self.cursor.fetchall():
-            self.cursor.execute(f'DROP TABLE {table[0]};')
 
-        # Create new tables.
-        self.create_tables()
+    def iterate_dict_records(self, data):
+        """
+        Yields sync records for data in the format returned by convert_database_to_dict().
+        """
 
-        # Add migrations data to database.
         for migration in data['migrations']:
-            self.create_migration_table(migration['date_time'])
-            self.write_projects(migration['projects'], migration['id'])
+            yield {'table': 'migrations', 'row': migration}
+        for migration in data['migrations']:
+            # Projects uploaded by older versions only have the scraped strings, so resolve them against the migration's date.
+            reference_time = time.mktime(time.strptime(migration['date_time'], '%Y-%m-%d %H:%M:%S'))
+            for name, project_data in migration['projects'].items():
+                project_data = ProjectRecord.from_dict(name, project_data, reference_time).to_dict()
+                yield {'table': 'projects', 'row': dict(project_data, migration_id=migration['id'], name=name)}
+
+        # Messages uploaded by older versions have no ids or conversations, so number them in order as the first conversation.
+        for i, message in enumerate(data['chat_history']):
+            yield {'table': 'chat_history', 'row': dict(message, id=message.get('id', i + 1), conversation_id=message.get('conversation_id', 1))}
+
+
+    def load_database_from_records(self, records):
+        """
+        Loads an iterable of sync records (see sync_stream) into the SQLite3 database, so that
+        the migration, project and chat history data matches the records.
+
+        Records are first staged in tables in the database file as they are read, so they never need
+        to be held in memory at once (temporary tables would be, see connect()). The data is then merged
+        in place: only rows which were added, changed or removed are written, so loading an almost
+        unchanged copy of the data is cheap. Loading never uploads data to the server.
+        """
+
+        with self.conn:
+            # Begin explicitly, so that the staging tables are created and dropped in the same transaction as the load,
+            # and are never left behind if it fails.
+            self.conn.execute('BEGIN;')
+
+            # Create an empty staging table for each synced table, with the same column types and a unique index on
+            # the same key columns as the table, so that staged rows can be matched to existing rows by index.
+            for table, columns in self.SYNCED_COLUMNS.items():
+                self.cursor.execute(f'CREATE TABLE loaded_{table} AS SELECT {", ".join(columns)} FROM {table} LIMIT 0;')
+                self.cursor.execute(f'CREATE UNIQUE INDEX loaded_{table}_key ON loaded_{table} ({", ".join(self.SYNCED_KEYS[table])});')
+
+            # Stage each run of consecutive rows of a table with one batched statement.
+            for table, table_records in itertools.groupby(records, key=lambda record: record['table']):
+                columns = self.SYNCED_COLUMNS[table]
+                self.cursor.executemany(f'''
+                    INSERT OR REPLACE INTO loaded_{table} ({', '.join(columns)})
+                    VALUES ({', '.join('?' * len(columns))});
+                ''', (tuple(record['row'].get(column) for column in columns) for record in table_records))
+
+            # Migrations which the merge removes, or replaces with another migration of the same id (ex. one made on another
+            # machine), lose the file statistics and fingerprints recorded on this machine, as when pruned.
+            removed_ids = [row[0] for row in self.cursor.execute('''
+                SELECT migrations.id FROM migrations
+                LEFT JOIN loaded_migrations ON loaded_migrations.id = migrations.id
+                WHERE loaded_migrations.id IS NULL OR loaded_migrations.date_time IS NOT migrations.date_time;
+            ''').fetchall()]
+            self.delete_migration_files(removed_ids)
+
+            # Merge staged rows into each table, then drop the staging table.
+            for table in self.SYNCED_COLUMNS:
+                self.merge_loaded_rows(table)
+                self.cursor.execute(f'DROP TABLE loaded_{table};')
+
+            # Resolve sizes and dates of projects uploaded by older versions.
+            self.backfill_project_values()
+
+        # Remove contents of files which only removed migrations had from the full-text index.
+        if len(removed_ids) > 0:
+            self.delete_unreferenced_contents()
+
+        # Loaded data may change any migration or project.
+        self.invalidate_cache()
+
+
+    def merge_loaded_rows(self, table):
+        """
+        Makes a synced table match its staging table, without committing. Rows are inserted,
+        updated (only if a value differs) or deleted as needed; identical rows are left untouched.
+        """
+
+        columns = self.SYNCED_COLUMNS[table]
+        keys = self.SYNCED_KEYS[table]
+        values = [column for column in columns if column not in keys]
+
+        # Insert new rows and update changed ones. "WHERE true" is required by SQLite's parser before ON CONFLICT.
+        self.cursor.execute(f'''
+            INSERT INTO {table} ({', '.join(columns)})
+            SELECT {', '.join(columns)} FROM loaded_{table} WHERE true
+            ON CONFLICT ({', '.join(keys)}) DO UPDATE SET
+                {', '.join(f'{column} = excluded.{column}' for column in values)}
+            WHERE {' OR '.join(f'{table}.{column} IS NOT excluded.{column}' for column in values)};
+        ''')
+
+        # Delete rows which are not in the loaded data.
+        self.cursor.execute(f'''
+            DELETE FROM {table}
+            WHERE NOT EXISTS (
+                SELECT 1 FROM loaded_{table}
+                WHERE {' AND '.join(f'loaded_{table}.{key} = {table}.{key}' for key in keys)}
+            );
+        ''')
+
+
+    def iterate_database_records(self):
+        """
+        Yields sync records for every row of the synced tables, reading rows lazily.
+        """
 
-        # Add chat history data to database.
-        self.write_chat_history(data['chat_history'])
+        for table, columns in self.SYNCED_COLUMNS.items():
+            # Use a separate cursor, since the caller may use the shared cursor between records.
+            for row in self.conn.execute(f'SELECT {", ".join(columns)} FROM {table} ORDER BY id;'):
+                yield {'table': table, 'row': dict(zip(columns, row))}
 
-        # Restore login details.
-        if login_details is not None:
-            self.write_login_details(login_details['username'], login_details['password'])
+
+    def export_database_to_file(self, file_path):
+        """
+        Writes every migration, project and chat history row to a file as newline-delimited
+        JSON sync records (see sync_stream), one row at a time, so that memory usage does not
+        grow with the size of the database. Files ending in .gz are gzip-compressed.
+        Returns the number of rows written.
+        """
+
+        open_file = gzip.open if file_path.endswith('.gz') else open
+        n_rows = 0
+        with open_file(file_path, 'wt', encoding='utf-8') as file:
+            # Read all tables in one transaction, so that the file is a consistent snapshot even if other connections write meanwhile.
+            self.conn.execute('BEGIN;')
+            try:
+                for record in self.iterate_database_records():
+                    file.write(json.dumps(record, separators=(',', ':')) + '\n')
+                    n_rows += 1
+            finally:
+                self.conn.rollback()
+
+        return n_rows
+
+
+    def import_database_from_file(self, file_path):
+        """
+        Replaces the migration, project and chat history data with the rows of a file written by
+        export_database_to_file(), reading one row at a time. The data is merged in place (see
+        load_database_from_records()). If user is logged in, the imported data is uploaded.
+        Returns the number of rows read.
+        """
+
+        n_rows = 0
+
+        def read_records(file):
+            nonlocal n_rows
+            for line in file:
+                if line.strip():
+                    n_rows += 1
+                    yield json.loads(line)
+
+        open_file = gzip.open if file_path.endswith('.gz') else open
+        with open_file(file_path, 'rt', encoding='utf-8') as file:
+            self.load_database_from_records(read_records(file))
+
+        self.request_sync()
+
+        return n_rows
+
+
+    def iterate_delta_records(self, delta):
+        """
+        Yields sync records for changes returned by build_delta().
+        """
+
+        for table, changes in delta.items():
+            for row in changes['upserted']:
+                yield {'table': table, 'row': row}
+            for key in changes['deleted']:
+                yield {'table': table, 'delete': key}
+
+
+    def read_sync_state(self, username):
+        """
+        Reads the server version the database was last synced with for the given user, and the
+        sequence number of the last change included in that sync. Both are None if the database
+        has never been synced with the server for this user.
+        """
+
+        row = self.cursor.execute('SELECT username, server_version, synced_seq FROM sync_state WHERE id = 1;').fetchone()
+        if row is None or row[0] != username:
+            return {'server_version': None, 'synced_seq': None}
+
+        return {'server_version': row[1], 'synced_seq': row[2]}
+
+
+    def write_sync_state(self, username, server_version, synced_seq):
+        """
+        Records a sync acknowledged by the server, and removes change log entries it included.
+        server_version is None if the server does not support versioning, in which case later
+        changes are not logged, as the next upload sends the whole database.
+        """
+
+        self.cursor.execute('''
+            INSERT OR REPLACE INTO sync_state (id, username, server_version, synced_seq)
+            VALUES (1, ?, ?, ?);
+        ''', (username, server_version, synced_seq))
+        self.cursor.execute('DELETE FROM change_log WHERE seq <= ?;', (synced_seq,))
 
         # Commit changes to database.
         self.conn.commit()
 
 
+    def get_latest_change_seq(self):
+        """
+        Returns the sequence number of the latest logged change, or 0 if none were ever logged.
+        """
+
+        row = self.cursor.execute('SELECT seq FROM sqlite_sequence WHERE name = ?;', ('change_log',)).fetchone()
+
+        return row[0] if row is not None else 0
+
+
+    def build_delta(self, after_seq, up_to_seq):
+        """
+        Collects the current state of every row changed between two change log sequence numbers.
+
+        Returns a dictionary with, for each synced table, the rows to upsert and the keys of the rows
+        to delete, or None if nothing changed.
+        """
+
+        # Exit if nothing changed.
+        if up_to_seq <= after_seq:
+            return None
+
+        delta = {}
+        changed_keys = '''
+            SELECT DISTINCT row_id, row_name FROM change_log
+            WHERE table_name = ? AND seq > ? AND seq <= ?
+        '''
+
+        # Collect changed migrations. Changed rows which no longer exist were deleted.
+        self.cursor.execute(f'''
+            SELECT changed.row_id, migrations.date_time, migrations.account, migrations.output_path
+            FROM ({changed_keys}) AS changed LEFT JOIN migrations ON migrations.id = changed.row_id;
+        ''', ('migrations', after_seq, up_to_seq))
+        rows = self.cursor.fetchall()
+        delta['migrations'] = {
+            'upserted': [{'id': id, 'date_time': date_time, 'account': account, 'output_path': output_path} for id, date_time, account, output_path in rows if date_time is not None],
+            'deleted': [id for id, date_time, account, output_path in rows if date_time is None]
+        }
+
+        # Collect changed projects.
+        self.cursor.execute(f'''
+            SELECT changed.row_id, changed.row_name, projects.id, projects.path, projects.link, projects.last_modified, projects.size,
+                projects.size_bytes, projects.modified_at
+            FROM ({changed_keys}) AS changed
+            LEFT JOIN projects ON projects.migration_id = changed.row_id AND projects.name = changed.row_name;
+        ''', ('projects', after_seq, up_to_seq))
+        rows = self.cursor.fetchall()
+        delta['projects'] = {
+            'upserted': [{'migration_id': migration_id, 'name': name, 'path': path, 'link': link, 'last_modified': last_modified, 'size': size,
+                          'size_bytes': size_bytes, 'modified_at': modified_at}
+                         for migration_id, name, id, path, link, last_modified, size, size_bytes, modified_at in rows if id is not None],
+            'deleted': [[migration_id, name] for migration_id, name, id, *values in rows if id is None]
+        }
+
+        # Collect changed chat messages.
+        self.cursor.execute(f'''
+            SELECT changed.row_id, chat_history.role, chat_history.content, chat_history.conversation_id, chat_history.created_at
+            FROM ({changed_keys}) AS changed LEFT JOIN chat_history ON chat_history.id = changed.row_id;
+        ''', ('chat_history', after_seq, up_to_seq))
+        rows = self.cursor.fetchall()
+        delta['chat_history'] = {
+            'upserted': [{'id': id, 'role': role, 'content': content, 'conversation_id': conversation_id, 'created_at': created_at}
+                         for id, role, content, conversation_id, created_at in rows if role is not None],
+            'deleted': [id for id, role, content, conversation_id, created_at in rows if role is None]
+        }
+
+        return delta
+
+
+    def request_sync(self):
+        """
+        Uploads local changes to the Replit Migrator Database Server if the user is logged in.
+
+        If a sync handler is set, the upload is queued and performed in the background.
+        Otherwise, the upload is performed before returning.
+        """
+
+        # Queue upload in the background.
+        if self.sync_handler is not None:
+            self.sync_handler.request_sync()
+            return
+
+        # Check if user is logged in.
+        if self.check_if_logged_in():
+            # User is logged in. Get login details.
+            login_details = self.read_login_details()
+            # Upload database to the Replit Migrator Database Server.
+            self.upload_database_to_server(login_details['username'], login_details['password'])
+
+
     def upload_database_to_server(self, username, password):
         """
         Uploads the database for the given user to the Replit Migrator Database Server.
+
+        If the server acknowledged a previous sync, only rows changed since then are uploaded.
+        Otherwise, or if the server rejects the changes (ex. its copy was changed by another
+        device), the whole database is uploaded. Returns the server's response, or None if
+        there was nothing to upload.
         """
 
-        # Convert SQLite3 database to dictionary.
-        user_data = self.convert_database_to_dict()
+        # Try uploading only the changes since the last acknowledged sync.
+        sync_state = self.read_sync_state(username)
+        if sync_state['server_version'] is not None:
+            up_to_seq = self.get_latest_change_seq()
+            delta = self.build_delta(sync_state['synced_seq'], up_to_seq)
+
+            # Exit if there is nothing to upload.
+            if delta is None:
+                return None
+
+            # Stream changes if supported by the server, otherwise send them as a form value.
+            response = self.post_records(username, password, self.iterate_delta_records(delta), sync_state['server_version'])
+            if response is None:
+                response = requests.post(f'{self.API_ROOT_URL}api/delta/', data={
+                    'username': username,
+                    'password': password,
+                    'base_version': sync_state['server_version'],
+                    'json': json.dumps(delta)
+                })
+            server_version = self.get_response_version(response)
+            if server_version is not None:
+                # Changes acknowledged.
+                self.write_sync_state(username, server_version, up_to_seq)
+                return response
+
+        # Fall back to uploading the whole database.
+        return self.upload_full_database_to_server(username, password)
+
+
+    def upload_full_database_to_server(self, username, password):
+        """
+        Uploads the whole database for the given user to the Replit Migrator Database Server.
+        """
+
+        # Log changes made during the upload, then note the latest change before reading, so that changes made during the
+        # upload are sent next time if the server acknowledges a version. Any previous version no longer applies.
+        self.cursor.execute('INSERT OR REPLACE INTO sync_state (id, username, server_version, synced_seq) VALUES (1, ?, NULL, NULL);', (username,))
+        self.conn.commit()
+        up_to_seq = self.get_latest_change_seq()
 
-        # Upload existing migration data and chat history to Replit Migrator Database.
-        response = requests.post(f'{self.API_ROOT_URL}api/', data={'username': username, 'password': password, 'json': json.dumps(user_data)})
+        # Stream all rows if supported by the server.
+        response = self.post_records(username, password, self.iterate_database_records())
+        if response is None:
+            # Convert SQLite3 database to dictionary.
+            user_data = self.convert_database_to_dict()
+
+            # Upload existing migration data and chat history to Replit Migrator Database.
+            response = requests.post(f'{self.API_ROOT_URL}api/', data={'username': username, 'password': password, 'json': json.dumps(user_data)})
+
+        # If the server supports versioning, later uploads only need to send changes. Either way, the changes
+        # uploaded no longer need to be logged.
+        server_version = self.get_response_version(response)
+        if server_version is not None or self.check_response_succeeded(response):
+            self.write_sync_state(username, server_version, up_to_seq)
 
         return response
 
 
+    def post_records(self, username, password, records, base_version=None):
+        """
+        Uploads sync records to the server's streaming endpoint as a compressed stream, replacing
+        the user's data, or applying changes to it if base_version is specified.
+
+        Returns the server's response, or None if the server does not support streaming.
+        """
+
+        # Skip request if the server is already known not to support streaming.
+        if self.streaming_supported is False:
+            return None
+
+        # Credentials (and the version a delta applies to) are sent in the body, as the first record, rather than in the URL.
+        header = {'username': username, 'password': password}
+        if base_version is not None:
+            header['base_version'] = base_version
+
+        # Send records as they are encoded, using chunked transfer encoding.
+        response = requests.post(f'{self.API_ROOT_URL}api/stream/', data=sync_stream.encode_records(itertools.chain([header], records)), headers={
+            'Content-Type': 'application/x-ndjson',
+            'Content-Encoding': 'gzip'
+        })
+
+        return response if self.check_streaming_response(response, ('application/json',)) else None
+
+
+    def check_streaming_response(self, response, content_types):
+        """
+        Checks whether a request to the streaming endpoint was served by it: the response has a 2xx
+        status and one of the expected content types. The result is remembered, to avoid repeating
+        unsupported requests, unless the request may have failed for another reason (ex. a server
+        error), in which case streaming is tried again next time.
+        """
+
+        is_success = 200 <= response.status_code < 300
+        if is_success and response.headers.get('Content-Type', '').startswith(content_types):
+            self.streaming_supported = True
+            return True
+
+        # The endpoint does not exist, or was answered by something else (ex. an HTML page).
+        if is_success or response.status_code in (404, 405):
+            self.streaming_supported = False
+
+        return False
+
+
+    def check_response_succeeded(self, response):
+        """
+        Returns whether a server response reports success: a 2xx status, without an error in its JSON body (if any).
+        """
+
+        if not 200 <= response.status_code < 300:
+            return False
+
+        try:
+            response_json = json.loads(response.text)
+        except ValueError:
+            return True
+
+        return not (isinstance(response_json, dict) and response_json.get('status') == 'error')
+
+
+    def get_response_version(self, response):
+        """
+        Returns the data version acknowledged in a successful server response, or None if the
+        request failed or the server does not support versioning.
+        """
+
+        try:
+            response_json = json.loads(response.text)
+        except ValueError:
+            # Not a JSON response (ex. an error page from a server without the requested endpoint).
+            return None
+
+        if not isinstance(response_json, dict) or response_json.get('status') == 'error':
+            return None
+
+        return response_json.get('version')
+
+
     def download_database_from_server(self, username, password):
         """
         Downloads the database for the given user from the Replit Migrator Database Server.
+
+        If the local database was last synced with the server's current version, the server
+        responds with 304 Not Modified and nothing is downloaded or reloaded.
+
+        Returns the error message reported by the server, or None on success.
         """
 
+        # Identify the version held locally (as an ETag), so that the server can skip sending unchanged data.
+        headers = {}
+        server_version = self.read_sync_state(username)['server_version']
+        if server_version is not None:
+            headers['If-None-Match'] = f'"{server_version}"'
+
+        # Stream data if supported by the server. Only the streaming endpoint responds to it with 304 Not Modified.
+        if self.streaming_supported is not False:
+            response = requests.get(f'{self.API_ROOT_URL}api/stream/', params={'username': username, 'password': password}, headers=headers, stream=True)
+            if response.status_code == 304:
+                # Local database is up to date.
+                self.streaming_supported = True
+                return None
+            if self.check_streaming_response(response, ('application/x-ndjson', 'application/json')):
+                return self.load_streamed_response(username, response)
+            response.close()
+
         # Attempt to retrieve user migration data from the API.
-        response = requests.get(f'{self.API_ROOT_URL}api/', params={'username': username, 'password': password})
+        response = requests.get(f'{self.API_ROOT_URL}api/', params={'username': username, 'password': password}, headers=headers)
+        if response.status_code == 304:
+            # Local database is up to date.
+            return None
 
         # Parse and store JSON data in variable.
         response_json = json.loads(response.text)
@@ -374,10 +1933,49 @@ class DatabaseHandler:
         # Check for error.
         if 'status' in response_json and response_json['status'] == 'error':
             # Server responded with an error. Notify user of error and exit.
-            return response
+            return response_json['message']
         
         # Send JSON data to database handler for parsing and storage.
         self.load_database_from_dict(response_json)
 
-        return response
+        # The local database now matches the server, so only later changes need to be uploaded.
+        if response_json.get('version') is not None:
+            self.write_sync_state(username, response_json['version'], self.get_latest_change_seq())
+
+        return None
+
+
+    def load_streamed_response(self, username, response):
+        """
+        Loads the records of a streamed download into the database as they arrive.
+
+        Returns the error message reported by the server, or None on success. If the response
+        is malformed (ex. empty or not JSON), nothing is loaded and an error message is returned.
+        """
+
+        invalid_response_message = 'The server sent an invalid response.'
+
+        with response:
+            try:
+                # Errors are reported as a single JSON object, rather than a stream of records.
+                if response.headers.get('Content-Type', '').startswith('application/json'):
+                    response_json = json.loads(response.text)
+                    return response_json.get('message') or invalid_response_message if isinstance(response_json, dict) else invalid_response_message
+
+                # The first record holds the version of the data. Compressed responses are decompressed by requests.
+                records = sync_stream.decode_records(response.iter_content(sync_stream.CHUNK_SIZE), compressed=False)
+                header = next(records, None)
+                if not isinstance(header, dict) or 'version' not in header:
+                    return invalid_response_message
+                version = header['version']
+
+                # Loading is a single transaction, so a malformed record leaves the database unchanged.
+                self.load_database_from_records(records)
+            except (ValueError, KeyError, TypeError):
+                # Malformed JSON or records.
+                return invalid_response_message
+
+        # The local database now matches the server, so only later changes need to be uploaded.
+        self.write_sync_state(username, version, self.get_latest_change_seq())
 
+        return None
@@ -0,0 +1,387 @@
+import os
+import time
+import zipfile
+import hashlib
+import codecs
+
+
+class ExtractionHandler:
+    """
+    Handles the extraction of downloaded Repl zip files.
+
+    Zip members are streamed to disk in fixed-size chunks, so memory usage stays flat
+    regardless of archive size. Per-file and per-project byte caps prevent a single
+    Repl from filling the disk; members exceeding them are skipped and reported.
+
+    Extraction is also the only pass over each file's contents: members listed in
+    replit_ignore.txt are never written, and statistics for every extracted file
+    (size, modification time, line count, text/binary classification and content hash)
+    are computed while it is streamed, so that later features never need to rescan the tree.
+    """
+
+
+    # Default limits, used when none are specified.
+    DEFAULT_MAX_FILE_SIZE = 100 * 1024**2       # 100 MiB
+    DEFAULT_MAX_PROJECT_SIZE = 1024**3          # 1 GiB
+    DEFAULT_CHUNK_SIZE = 64 * 1024              # 64 KiB
+
+
+    def __init__(self, max_file_size=None, max_project_size=None, chunk_size=None, ignore_file_path=None):
+        # Initialize limits from parameters, falling back to defaults.
+        self.max_file_size = max_file_size if max_file_size is not None else self.DEFAULT_MAX_FILE_SIZE
+        self.max_project_size = max_project_size if max_project_size is not None else self.DEFAULT_MAX_PROJECT_SIZE
+        self.chunk_size = chunk_size if chunk_size is not None else self.DEFAULT_CHUNK_SIZE
+
+        # List of configuration files/directories/file extensions to ignore during extraction.
+        self.replit_ignore_dirs = []
+        self.replit_ignore_files = []
+        self.replit_ignore_extensions = []
+        # Read files to ignore from the ignore file, if specified.
+        if ignore_file_path is not None:
+            self.read_ignore_file(ignore_file_path)
+
+
+    def read_ignore_file(self, ignore_file_path):
+        """
+        Reads files to ignore from an ignore file (ex. replit_ignore.txt).
+        """
+
+        with open(ignore_file_path, 'r') as file:
+            # Tracks the type of item currently being read (directories or files).
+            currently_reading = None
+            for line in file:
+                if line.startswith('#'):
+                    # Ignore comments.
+                    continue
+                if line.startswith('@'):
+                    if line.startswith('@(DIRECTORIES)'):
+                        # Begin reading directories
+                        currently_reading = 'directories'
+                        continue
+                    if line.startswith('@(FILES)'):
+                        # Begin reading files
+                        currently_reading = 'files'
+                        continue
+                line = line.strip()
+                if len(line) > 0:
+                    # Add item name to appropriate list.
+                    if currently_reading == 'directories':
+                        self.replit_ignore_dirs.append(line)
+                    elif currently_reading == 'files':
+                        if line.startswith('*.'):
+                            # Add file extension to list of extensions to ignore.
+                            self.replit_ignore_extensions.append(line[2:])
+                        else:
+                            self.replit_ignore_files.append(line)
+
+
+    def is_ignored(self, member_name):
+        """
+        Checks whether a zip member is listed in the ignore file, either directly
+        or because one of its parent directories is.
+        """
+
+        parts = [part for part in member_name.split('/') if part]
+        if len(parts) == 0:
+            return False
+
+        # Check if any directory along the path is ignored. The last part is only a directory for directory members.
+        directories = parts if member_name.endswith('/') else parts[:-1]
+        if any(directory in self.replit_ignore_dirs for directory in directories):
+            return True
+        if member_name.endswith('/'):
+            return False
+
+        # Check if file name or extension is ignored.
+        file_name = parts[-1]
+        if file_name in self.replit_ignore_files:
+            return True
+        if self.get_extension(file_name) in self.replit_ignore_extensions:
+            return True
+
+        return False
+
+
+    def get_extension(self, file_name):
+        """
+        Returns the extension of a file name (the text after the last period, or the whole name if there is none).
+        """
+
+        return file_name.split('.')[-1]
+
+
+    def extract(self, zip_file_path, extract_to_path):
+        """
+        Extracts the target zip file to the designated path, member by member.
+
+        Files left in the folder by a previous extraction which were not extracted this time
+        (ex. files since deleted from the Repl) are removed, so the folder matches the zip file.
+
+        Returns a dictionary summarizing the extraction, containing the number of files
+        and bytes extracted, the number of ignored members, a list of (member name, reason)
+        tuples for skipped members, a list of statistics for every extracted file, and the
+        number of stale files removed.
+        """
+
+        # Create dictionary to summarize extraction.
+        result = {
+            'extracted_files': 0,
+            'extracted_bytes': 0,
+            'ignored': 0,
+            'skipped': [],
+            'files': [],
+            'removed_files': 0
+        }
+        extracted_paths = set()
+
+        extract_root = os.path.abspath(extract_to_path)
+        os.makedirs(extract_root, exist_ok=True)
+
+        with zipfile.ZipFile(zip_file_path, 'r') as zip_ref:
+            for member in zip_ref.infolist():
+                # Never write members listed in the ignore file.
+                if self.is_ignored(member.filename):
+                    result['ignored'] += 1
+                    continue
+
+                # Determine destination path, refusing members which would escape the extraction folder.
+                destination = self.get_destination(extract_root, member.filename)
+                if destination is None:
+                    result['skipped'].append((member.filename, 'unsafe path'))
+                    continue
+
+                # Directories only need to be created.
+                if member.is_dir():
+                    os.makedirs(destination, exist_ok=True)
+                    continue
+
+                # Check the size declared in the archive against both limits before writing anything.
+                if member.file_size > self.max_file_size:
+                    result['skipped'].append((member.filename, 'exceeds per-file size limit'))
+                    continue
+                if result['extracted_bytes'] + member.file_size > self.max_project_size:
+                    result['skipped'].append((member.filename, 'exceeds per-project size limit'))
+                    continue
+
+                # Stream the member to disk. The declared size may be wrong, so limits are enforced again while writing.
+                remaining_project_bytes = self.max_project_size - result['extracted_bytes']
+                limit = min(self.max_file_size, remaining_project_bytes)
+                file_stats = self.stream_member(zip_ref, member, destination, limit)
+                if file_stats is None:
+                    result['skipped'].append((member.filename, 'actual size exceeds size limit'))
+                    continue
+
+                result['extracted_files'] += 1
+                result['extracted_bytes'] += file_stats['size']
+                result['files'].append(file_stats)
+                extracted_paths.add(destination)
+
+        # Remove stale files of a previous extraction.
+        for root, dirs, files in os.walk(extract_root):
+            for file_name in files:
+                file_path = os.path.join(root, file_name)
+                if file_path not in extracted_paths:
+                    os.remove(file_path)
+                    result['removed_files'] += 1
+
+        return result
+
+
+    def check_extracted(self, zip_file_path, extract_to_path):
+        """
+        Checks whether a folder still holds exactly the files a zip file extracts to: every member
+        which is not ignored exists with its size and modification time, and there are no other files.
+        Only the archive's central directory is read, and files on disk are only stat'ed.
+
+        Files edited, added or deleted since extraction (ex. by the user) make the check fail.
+        """
+
+        extract_root = os.path.abspath(extract_to_path)
+
+        # Collect the expected size and modification time of every file.
+        expected = {}
+        with zipfile.ZipFile(zip_file_path, 'r') as zip_ref:
+            for member in zip_ref.infolist():
+                destination = self.get_destination(extract_root, member.filename)
+                if self.is_ignored(member.filename) or member.is_dir() or destination is None:
+                    continue
+                expected[destination] = (member.file_size, self.get_member_mtime(member))
+
+        for root, dirs, files in os.walk(extract_root):
+            for file_name in files:
+                file_path = os.path.join(root, file_name)
+                if file_path not in expected:
+                    return False
+                size, mtime = expected.pop(file_path)
+                stat = os.stat(file_path)
+                if stat.st_size != size or (mtime is not None and int(stat.st_mtime) != mtime):
+                    return False
+
+        # Files which are missing were deleted.
+        return len(expected) == 0
+
+
+    def compute_fingerprint(self, zip_file_path):
+        """
+        Computes a cheap fingerprint of a zip file from its size and the CRC of every member.
+
+        Only the archive's central directory is read, so this is fast even for large archives.
+        Returns a dictionary containing the zip size and a digest of the member CRCs.
+        """
+
+        zip_size = os.path.getsize(zip_file_path)
+
+        # Hash the name, size and CRC of every member, in a consistent order.
+        digest = hashlib.sha1()
+        with zipfile.ZipFile(zip_file_path, 'r') as zip_ref:
+            for member in sorted(zip_ref.infolist(), key=lambda member: member.filename):
+                digest.update(f'{member.filename}\0{member.file_size}\0{member.CRC}\n'.encode('utf-8'))
+
+        return {'zip_size': zip_size, 'crc_digest': digest.hexdigest()}
+
+
+    def get_destination(self, extract_root, member_name):
+        """
+        Returns the absolute destination path of a zip member, or None if the member
+        would be written outside of the extraction folder (ex. absolute paths or '..').
+        """
+
+        destination = os.path.abspath(os.path.join(extract_root, member_name))
+        if os.path.commonpath([extract_root, destination]) != extract_root:
+            return None
+
+        return destination
+
+
+    def stream_member(self, zip_ref, member, destination, limit):
+        """
+        Copies a single zip member to the destination in fixed-size chunks, computing
+        its statistics along the way.
+
+        Returns a dictionary of file statistics (relative path, name, extension, size, modification
+        time, line count, text/binary flag and SHA-256 content hash), or None if the member exceeded
+        the byte limit, in which case the partially written file is removed. The extracted file keeps
+        the modification time recorded in the zip file.
+        """
+
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+
+        with zip_ref.open(member, 'r') as source, open(destination, 'wb') as target:
+            content_stats = self.read_content_stats(source, target, limit)
+
+        # Remove partial file if the limit was exceeded.
+        if content_stats is None:
+            os.remove(destination)
+            return None
+
+        # Preserve the modification time recorded in the zip file, so that it matches the recorded statistics.
+        mtime = self.get_member_mtime(member)
+        if mtime is not None:
+            os.utime(destination, (mtime, mtime))
+
+        return self.build_file_stats(member.filename, mtime, content_stats)
+
+
+    def read_file_stats(self, file_path, relative_path):
+        """
+        Computes the statistics of a file already on disk (ex. one changed since extraction), in the
+        same form as stream_member(). relative_path is the path of the file within its project, using '/'.
+        """
+
+        # Read the modification time first, so that a change made while reading is detected next time.
+        mtime = int(os.stat(file_path).st_mtime)
+        with open(file_path, 'rb') as source:
+            content_stats = self.read_content_stats(source)
+
+        return self.build_file_stats(relative_path, mtime, content_stats)
+
+
+    def read_content_stats(self, source, target=None, limit=None):
+        """
+        Reads a binary file object in fixed-size chunks, copying them to target if specified, and
+        returns a tuple of its size, line count, text/binary flag and SHA-256 content hash.
+
+        Returns None if the content exceeded the byte limit (if any), in which case it is only partially copied.
+        """
+
+        # Track statistics while streaming. A file is text if it contains no null bytes and is valid UTF-8.
+        written = 0
+        line_count = 0
+        last_byte = b''
+        is_text = True
+        decoder = codecs.getincrementaldecoder('utf-8')()
+        digest = hashlib.sha256()
+
+        while True:
+            chunk = source.read(self.chunk_size)
+            if not chunk:
+                break
+            written += len(chunk)
+            if limit is not None and written > limit:
+                return None
+            if target is not None:
+                target.write(chunk)
+
+            # Update statistics with this chunk.
+            digest.update(chunk)
+            line_count += chunk.count(b'\n')
+            last_byte = chunk[-1:]
+            if is_text:
+                is_text = self.is_text_chunk(decoder, chunk)
+
+        # Check that the file does not end partway through a character.
+        if is_text:
+            is_text = self.is_text_chunk(decoder, b'', final=True)
+
+        # A final line without a trailing newline still counts as a line.
+        if written > 0 and last_byte != b'\n':
+            line_count += 1
+
+        return written, line_count, is_text, digest.hexdigest()
+
+
+    def build_file_stats(self, relative_path, mtime, content_stats):
+        """
+        Combines a file's path, modification time and content statistics (see read_content_stats()) into a dictionary of file statistics.
+        """
+
+        size, line_count, is_text, content_hash = content_stats
+
+        return {
+            'relative_path': relative_path,
+            'name': os.path.basename(relative_path),
+            'extension': self.get_extension(os.path.basename(relative_path)),
+            'size': size,
+            'mtime': mtime,
+            'line_count': line_count if is_text else None,
+            'is_text': is_text,
+            'content_hash': content_hash
+        }
+
+
+    def get_member_mtime(self, member):
+        """
+        Returns the modification time of a zip member as a Unix timestamp, or None if it is invalid.
+        Zip files record local times without a time zone, so they are interpreted in local time.
+        """
+
+        try:
+            return int(time.mktime(member.date_time + (0, 0, -1)))
+        except (OverflowError, ValueError):
+            return None
+
+
+    def is_text_chunk(self, decoder, chunk, final=False):
+        """
+        Checks whether a chunk of a file looks like text, feeding it to an incremental UTF-8 decoder.
+        """
+
+        if b'\0' in chunk:
+            return False
+
+        try:
+            decoder.decode(chunk, final)
+        except UnicodeDecodeError:
+            return False
+
+        return True
@@ -0,0 +1,446 @@
+"""
+A local stand-in for the Replit Migrator Database Server.
+
+Implements the parts of the server API used by this application (registration, chat, and
+syncing, including the streaming endpoint described in sync_stream), storing data in memory,
+so that syncing can be tested and benchmarked without the real server. Chat responses are
+canned, as no OpenAI API key is involved. Run it as a module from the top level directory
+(ex. `python -m replit_migrator.local_server --port 8000`) and point the application at it
+by setting the REPLIT_MIGRATOR_API_URL environment variable (ex. `http://127.0.0.1:8000/`).
+"""
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+import argparse
+import json
+import threading
+
+from replit_migrator import sync_stream
+
+
+class LocalServer:
+    """
+    An in-memory server implementing the Replit Migrator Database API.
+
+    Each user's data is stored normalized by row key, with a version number that is
+    incremented on every accepted upload, so that delta uploads can be validated.
+
+    If streaming is False, the streaming endpoint is not served, imitating an older server.
+    The number of request and response body bytes is counted (and reported at stats/), to measure
+    sync payload sizes.
+    """
+
+
+    def __init__(self, host='127.0.0.1', port=0, streaming=True):
+        # Stores data of each user, keyed by username.
+        self.users = {}
+        self.lock = threading.Lock()
+        self.streaming = streaming
+
+        # Body bytes transferred since the last call to reset_traffic(), as sent over the network (ex. compressed).
+        self.bytes_received = 0
+        self.bytes_sent = 0
+
+        # Create HTTP server. A port of 0 selects any free port.
+        self.httpd = ThreadingHTTPServer((host, port), self.create_request_handler())
+        self.thread = None
+
+
+    @property
+    def url(self):
+        """
+        The API root URL of the server.
+        """
+
+        host, port = self.httpd.server_address[:2]
+        return f'http://{host}:{port}/'
+
+
+    def start(self):
+        """
+        Starts serving requests in a background thread.
+        """
+
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+
+
+    def stop(self):
+        """
+        Stops serving requests and releases the port.
+        """
+
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+    def add_user(self, username, password):
+        """
+        Creates a user with no data. Returns False if the username is taken.
+        """
+
+        with self.lock:
+            if username in self.users:
+                return False
+            self.users[username] = {
+                'password': password,
+                'version': 0,
+                'migrations': {},
+                'projects': {},
+                'chat_history': {}
+            }
+
+        return True
+
+
+    def register(self, username, password):
+        """
+        Registers a new user, in the format of the server's registration endpoint.
+        """
+
+        if not username or not password:
+            return self.error('Username and password must not be empty.')
+        if not self.add_user(username, password):
+            return self.error('Username already exists.')
+
+        return {'status': 'success'}
+
+
+    def chat(self, chat_history):
+        """
+        Responds to a chat conversation, in the format of the server's chat endpoint.
+        The response simply echoes the latest user message.
+        """
+
+        user_messages = [message['content'] for message in chat_history if message['role'] == 'user']
+        if not user_messages:
+            return {'chat_response': 'Hello! This is the local test server.'}
+
+        return {'chat_response': f'You said: {user_messages[-1]}'}
+
+
+    def count_traffic(self, received=0, sent=0):
+        """
+        Adds to the number of body bytes received and sent.
+        """
+
+        with self.lock:
+            self.bytes_received += received
+            self.bytes_sent += sent
+
+
+    def reset_traffic(self):
+        """
+        Resets the number of body bytes received and sent, returning the previous counts as (received, sent).
+        """
+
+        with self.lock:
+            traffic = (self.bytes_received, self.bytes_sent)
+            self.bytes_received = 0
+            self.bytes_sent = 0
+
+        return traffic
+
+
+    def authenticate(self, username, password):
+        """
+        Returns the data of the given user, or None if the credentials are invalid.
+        """
+
+        user = self.users.get(username)
+        if user is None or user['password'] != password:
+            return None
+
+        return user
+
+
+    def get_data(self, username, password):
+        """
+        Returns the data of a user, in the format accepted by DatabaseHandler.load_database_from_dict().
+        """
+
+        with self.lock:
+            user = self.authenticate(username, password)
+            if user is None:
+                return self.error('Invalid username or password.')
+
+            # Group projects by migration.
+            migrations = {id: dict(migration, projects={}) for id, migration in user['migrations'].items()}
+            for (migration_id, name), project in user['projects'].items():
+                if migration_id in migrations:
+                    migrations[migration_id]['projects'][name] = project
+
+            return {
+                'version': user['version'],
+                'migrations': [migrations[id] for id in sorted(migrations)],
+                'chat_history': [user['chat_history'][id] for id in sorted(user['chat_history'])]
+            }
+
+
+    def put_data(self, username, password, data):
+        """
+        Replaces all data of a user with the given data, in the format returned by
+        DatabaseHandler.convert_database_to_dict().
+        """
+
+        with self.lock:
+            user = self.authenticate(username, password)
+            if user is None:
+                return self.error('Invalid username or password.')
+
+            # Normalize data by row key.
+            user['migrations'] = {}
+            user['projects'] = {}
+            for migration in data['migrations']:
+                user['migrations'][migration['id']] = {key: value for key, value in migration.items() if key != 'projects'}
+                for name, project in migration['projects'].items():
+                    user['projects'][(migration['id'], name)] = project
+            user['chat_history'] = {}
+            for i, message in enumerate(data['chat_history']):
+                id = message.get('id', i + 1)
+                user['chat_history'][id] = dict(message, id=id)
+
+            user['version'] += 1
+            return {'status': 'success', 'version': user['version']}
+
+
+    def apply_delta(self, username, password, base_version, delta):
+        """
+        Applies changes in the format returned by DatabaseHandler.build_delta() to a user's data.
+
+        The changes are rejected if the user's data has changed since base_version, in which
+        case the client must upload all of its data instead.
+        """
+
+        with self.lock:
+            user = self.authenticate(username, password)
+            if user is None:
+                return self.error('Invalid username or password.')
+            if base_version != user['version']:
+                return self.error('Server data has changed since the last sync.')
+
+            # Apply deletions and upserts to each table.
+            for id in delta['migrations']['deleted']:
+                user['migrations'].pop(id, None)
+            for migration in delta['migrations']['upserted']:
+                user['migrations'][migration['id']] = migration
+            for migration_id, name in delta['projects']['deleted']:
+                user['projects'].pop((migration_id, name), None)
+            for project in delta['projects']['upserted']:
+                key = (project['migration_id'], project['name'])
+                user['projects'][key] = {field: value for field, value in project.items() if field not in ('migration_id', 'name')}
+            for id in delta['chat_history']['deleted']:
+                user['chat_history'].pop(id, None)
+            for message in delta['chat_history']['upserted']:
+                user['chat_history'][message['id']] = message
+
+            user['version'] += 1
+            return {'status': 'success', 'version': user['version']}
+
+
+    def read_records_as_data(self, records):
+        """
+        Collects streamed records of a full upload into the format accepted by put_data().
+        """
+
+        migrations = {}
+        data = {'migrations': [], 'chat_history': []}
+        for record in records:
+            row = record['row']
+            if record['table'] == 'migrations':
+                migrations[row['id']] = dict(row, projects={})
+                data['migrations'].append(migrations[row['id']])
+            elif record['table'] == 'projects':
+                migrations[row['migration_id']]['projects'][row['name']] = {field: value for field, value in row.items() if field not in ('migration_id', 'name')}
+            elif record['table'] == 'chat_history':
+                data['chat_history'].append(row)
+
+        return data
+
+
+    def read_records_as_delta(self, records):
+        """
+        Collects streamed records of a delta upload into the format accepted by apply_delta().
+        """
+
+        delta = {table: {'upserted': [], 'deleted': []} for table in ['migrations', 'projects', 'chat_history']}
+        for record in records:
+            if 'row' in record:
+                delta[record['table']]['upserted'].append(record['row'])
+            else:
+                delta[record['table']]['deleted'].append(record['delete'])
+
+        return delta
+
+
+    def iterate_records(self, data):
+        """
+        Yields data returned by get_data() as streamed download records, beginning with the version.
+        """
+
+        yield {'version': data['version']}
+        for migration in data['migrations']:
+            yield {'table': 'migrations', 'row': {key: value for key, value in migration.items() if key != 'projects'}}
+        for migration in data['migrations']:
+            for name, project in migration['projects'].items():
+                yield {'table': 'projects', 'row': dict(project, migration_id=migration['id'], name=name)}
+        for message in data['chat_history']:
+            yield {'table': 'chat_history', 'row': message}
+
+
+    def error(self, message):
+        """
+        Forms an error response.
+        """
+
+        return {'status': 'error', 'message': message}
+
+
+    def create_request_handler(self):
+        """
+        Creates the class which handles HTTP requests, routing them to this server's API methods.
+        """
+
+        server = self
+
+
+        class RequestHandler(BaseHTTPRequestHandler):
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                params = {key: values[0] for key, values in parse_qs(url.query).items()}
+                if url.path == '/stats/':
+                    # Report and reset traffic counts, for benchmarks running the server in another process.
+                    bytes_received, bytes_sent = server.reset_traffic()
+                    self.send_json({'bytes_received': bytes_received, 'bytes_sent': bytes_sent}, count=False)
+                    return
+                if url.path not in ('/api/', '/api/stream/') or (url.path == '/api/stream/' and not server.streaming):
+                    self.send_error(404)
+                    return
+
+                data = server.get_data(params.get('username'), params.get('password'))
+                if data.get('status') == 'error':
+                    self.send_json(data)
+                elif self.headers.get('If-None-Match') == f'"{data["version"]}"':
+                    # Client already has this version of the data.
+                    self.send_response(304)
+                    self.send_header('ETag', f'"{data["version"]}"')
+                    self.end_headers()
+                elif url.path == '/api/stream/':
+                    self.send_records(server.iterate_records(data), data['version'])
+                else:
+                    self.send_json(data, data['version'])
+
+
+            def do_POST(self):
+                url = urlparse(self.path)
+                if url.path == '/api/stream/' and not server.streaming:
+                    # Read the whole body before responding, so that the client is not cut off mid-upload.
+                    for chunk in self.read_body_chunks():
+                        pass
+                    self.send_error(404)
+                    return
+                if url.path == '/api/stream/':
+                    # The first record holds the credentials, and the base version of a delta.
+                    records = sync_stream.decode_records(self.read_body_chunks(), compressed=self.headers.get('Content-Encoding') == 'gzip')
+                    header = next(records, {})
+                    if 'base_version' in header:
+                        delta = server.read_records_as_delta(records)
+                        self.send_json(server.apply_delta(header.get('username'), header.get('password'), int(header['base_version']), delta))
+                    else:
+                        data = server.read_records_as_data(records)
+                        self.send_json(server.put_data(header.get('username'), header.get('password'), data))
+                    return
+
+                length = int(self.headers.get('Content-Length', 0))
+                body = self.rfile.read(length)
+                server.count_traffic(received=len(body))
+                form = {key: values[0] for key, values in parse_qs(body.decode('utf-8')).items()}
+                if url.path == '/api/':
+                    self.send_json(server.put_data(form.get('username'), form.get('password'), json.loads(form['json'])))
+                elif url.path == '/api/delta/':
+                    base_version = int(form['base_version'])
+                    self.send_json(server.apply_delta(form.get('username'), form.get('password'), base_version, json.loads(form['json'])))
+                elif url.path == '/register/':
+                    self.send_json(server.register(form.get('username'), form.get('password')))
+                elif url.path == '/chat/':
+                    self.send_json(server.chat(json.loads(form['chat_history'])))
+                else:
+                    self.send_error(404)
+
+
+            def read_body_chunks(self):
+                # Read request body, which is sent with chunked transfer encoding when streamed.
+                if self.headers.get('Transfer-Encoding') != 'chunked':
+                    body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                    server.count_traffic(received=len(body))
+                    yield body
+                    return
+                while True:
+                    size = int(self.rfile.readline().split(b';')[0], 16)
+                    if size == 0:
+                        # Skip trailer headers, which end with an empty line.
+                        while self.rfile.readline().strip():
+                            pass
+                        return
+                    chunk = self.rfile.read(size)
+                    server.count_traffic(received=len(chunk))
+                    yield chunk
+                    self.rfile.readline()
+
+
+            def send_records(self, records, version):
+                # Stream compressed records. The end of the body is marked by closing the connection.
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/x-ndjson')
+                self.send_header('Content-Encoding', 'gzip')
+                self.send_header('ETag', f'"{version}"')
+                self.end_headers()
+                for chunk in sync_stream.encode_records(records):
+                    server.count_traffic(sent=len(chunk))
+                    self.wfile.write(chunk)
+
+
+            def send_json(self, data, version=None, count=True):
+                body = json.dumps(data).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                if version is not None:
+                    self.send_header('ETag', f'"{version}"')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                if count:
+                    server.count_traffic(sent=len(body))
+                self.wfile.write(body)
+
+
+            def log_message(self, format, *args):
+                # Silence per-request logging.
+                pass
+
+
+        return RequestHandler
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run a local stand-in for the Replit Migrator Database Server.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--user', action='append', default=[], help='Create a user, as username:password. May be repeated.')
+    parser.add_argument('--no-streaming', action='store_true', help='Do not serve the streaming endpoint, like an older server.')
+    args = parser.parse_args()
+
+    server = LocalServer(args.host, args.port, streaming=not args.no_streaming)
+    for user in args.user:
+        username, password = user.split(':', 1)
+        server.add_user(username, password)
+
+    print(f'Serving Replit Migrator Database API at {server.url}', flush=True)
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.httpd.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,410 @@
+# Webscraping modules.
+from selenium import webdriver
+from selenium.webdriver.chrome.service import Service as ChromeService
+from selenium.webdriver.common.by import By
+from selenium.webdriver.chrome.options import Options
+from urllib.parse import urlparse, urlunparse
+
+# Utility modules.
+import os
+import time
+import zipfile
+
+from replit_migrator.project_record import ProjectRecord
+from replit_migrator.search_handler import SearchHandler
+
+
+class MigrationHandler:
+    """
+    Handles the migration of a single Replit account: scraping and downloading its Repls,
+    then organizing the downloaded zip files into the output directory.
+
+    The handler does not depend on the GUI. Status updates and prompts to the user are
+    delegated to callbacks, so the same migration logic is used by the scraper screen
+    and by batch mode.
+    """
+
+
+    def __init__(self, data_handler, extraction_handler, output_path, print_status, notify, update_gui=None):
+        """
+        Initialize the migration handler.
+
+        print_status(text, indent=0) reports progress, notify(title, message) asks the user to
+        confirm before continuing (ex. after completing a CAPTCHA), and update_gui(), if specified,
+        is called regularly during long operations on the calling thread to prevent freezing.
+        """
+
+        # Initialize core attributes from parameters.
+        self.data_handler = data_handler
+        self.extraction_handler = extraction_handler
+        self.output_path = output_path
+        self.print_status = print_status
+        self.notify = notify
+        self.update_gui = update_gui
+        self.search_handler = SearchHandler(data_handler)
+
+        self.projects = {} # Stores project records (name, path, link, last modified, size), keyed by name.
+
+
+    def scrape(self, username, email, password, confirm_downloads=True):
+        """
+        Logs into Replit and downloads every Repl of the given user to the output directory.
+
+        If confirm_downloads is True, the user is asked to confirm that downloads have finished
+        before the browser is closed. Otherwise, the output directory is polled until they have.
+        """
+
+        # Create webdriver.
+        self.print_status('Creating browser emulator...')
+        driver = self.setup_webdriver()
+
+        try:
+            # Login to replit.
+            self.print_status('Logging into Replit...')
+            self.login_replit(driver, email, password)
+            self.print_status('Login successful.')
+
+            # Start the recursive repl downloading process.
+            self.print_status('Beginning download process...')
+            downloaded_folders = set()      # Stores the names of folders that have already been downloaded.
+            self.download_repls_recursive(driver, username, f'https://replit.com/@{username}', downloaded_folders)
+            self.print_status('Download process complete.')
+
+            # Scanning is complete. Ensure downloads have finished before the browser is closed.
+            if confirm_downloads:
+                self.notify('Scan Complete', 'The scan is complete, however, the downloads may still be in progress. Please ensure the downloads are finished before clicking OK.')
+            elif not self.wait_for_downloads():
+                self.print_status('Timed out waiting for downloads to finish. Missing projects will be reported when organizing.')
+        finally:
+            # Clean up resources.
+            self.print_status('Exiting browser emulator...')
+            driver.quit()
+
+
+    def login_replit(self, driver, email, password):
+        """
+        Uses existing driver to log into replit.
+        """
+
+        # Navigate to login page.
+        driver.get('https://replit.com/login')
+
+        # Fill in the login form.
+        email_input = driver.find_element(By.NAME, 'username')
+        password_input = driver.find_element(By.NAME, 'password')
+        email_input.send_keys(email)
+        password_input.send_keys(password)
+
+        # Click the Log In button.
+        login_button = driver.find_element(By.CSS_SELECTOR, '[data-cy="log-in-btn"]')
+        login_button.click()
+
+        # Allow user to handle CAPTCHA if it appears.
+        self.notify('Complete CAPTCHA if applicable', 'If a CAPTCHA appeared, please complete it, click Login, and then click OK. If no CAPTCHA appeared, simply click OK.')
+
+
+    def setup_webdriver(self):
+        """
+        Creates the webdriver used to access Replit.
+        """
+
+        # Setup Selenium WebDriver
+        chrome_driver_path = r'replit_migrator\chromedriver.exe'
+
+        # Configure ChromeOptions to set the download directory.
+        chrome_options = Options()
+        prefs = {'download.default_directory': self.output_path}
+        chrome_options.add_experimental_option('prefs', prefs)
+
+        # Create driver.
+        chrome_service = ChromeService(chrome_driver_path)
+        driver = webdriver.Chrome(service=chrome_service, options=chrome_options)
+
+        return driver
+
+
+    def download_repls_recursive(self, driver, username, folder_link, downloaded_folders, path=''):
+        """
+        Recursively downloads repls inside folder and all subfolders.
+        """
+
+        # Exit if the folder has already been processed (avoid double downloading a folder).
+        if folder_link in downloaded_folders:
+            return
+
+        # Add the current folder to the set of downloaded folders.
+        downloaded_folders.add(folder_link)
+
+        # Open the folder tab.
+        new_handle = self.open_tab(driver, folder_link)
+
+        # Switch to the newly opened tab.
+        driver.switch_to.window(new_handle)
+        time.sleep(3)   # Wait for the page to load.
+
+        # Download repls inside the current folder.
+        self.print_status('Currently downloading folder: '+path)
+        self.download_repls_in_folder(driver, username, path)
+
+        # Extract links to subfolders.
+        self.print_status('Extracting subfolders...')
+        subfolder_links = [a.get_attribute('href') for a in driver.find_elements(By.XPATH, f'//a[contains(@href, "/@{username}?path=folder")]')]
+
+        # Recursively download repls inside subfolders.
+        for subfolder_link in subfolder_links:
+            new_path = path+f'{subfolder_link.split("/")[-1]}/'
+            self.download_repls_recursive(driver, username, subfolder_link, downloaded_folders, new_path)
+
+        # Close original tab after all finished with.
+        driver.switch_to.window(new_handle)
+        driver.close()
+        driver.switch_to.window(driver.window_handles[-1])  # Switch to the last tab, or else the driver will be stuck on the closed tab.
+
+
+    def download_repls_in_folder(self, driver, username, path):
+        """
+        Downloads all repls in the folder of the currently opened tab of the driver.
+        """
+
+        # Extract links to repls inside the current folder
+        anchor_attributes = driver.find_elements(By.XPATH, f'//a[contains(@href, "/@{username}/") and not(contains(@href, "?path="))]')
+        repl_links = [a.get_attribute('href') for a in anchor_attributes]
+        last_modified = [a.find_elements(By.XPATH, './div[1]/div[2]/div[1]/span[1]')[0].text for a in anchor_attributes]
+        size = [a.find_elements(By.XPATH, './div[1]/div[2]/div[1]/span[2]')[0].text for a in anchor_attributes]
+
+        # Record the time of scraping, against which relative last modified dates are resolved.
+        scraped_at = time.time()
+
+        # Download repls from all links.
+        old_handles = driver.window_handles # stored to track when download tabs close.
+        n_repls = len(repl_links)
+        for i, link in enumerate(repl_links):
+            file_name = link.split('/')[-1]
+            self.projects[file_name] = ProjectRecord(file_name, path, link, last_modified[i], size[i], scraped_at)
+            download_url = f'{self.remove_query_params(link)}.zip'
+            self.print_status(f'({i+1}/{n_repls}) Downloading project "{file_name}"...', indent=1)
+            driver.execute_script(f'window.open("{download_url}", "_blank");')
+
+        # Wait for download tabs to close.
+        start_time = time.time()
+        last_update_time = start_time
+        while len(driver.window_handles) != len(old_handles):
+            # Give an update on elapsed time every 5 seconds.
+            if time.time() - last_update_time > 5:
+                self.print_status(f'Waiting for tabs to clear - {round(time.time() - start_time)} seconds elapsed...', indent=2)
+                last_update_time = time.time()
+
+
+    def download_existing_scan(self, email, password, migration_id):
+        """
+        Downloads every project of an existing scan, using the links stored in the database.
+        """
+
+        # Retrieve data for selected scan.
+        self.projects = self.data_handler.read_projects(migration_id)
+
+        # Extract the repl links from the projects.
+        repl_links = [project.link for project in self.projects.values()]
+
+        # Create webdriver.
+        driver = self.setup_webdriver()
+
+        # Login to replit.
+        self.login_replit(driver, email, password)
+
+        # Open all repl links in new tabs to download them.
+        for link in repl_links:
+            driver.execute_script(f'window.open("{link}.zip", "_blank");')
+
+        # Ask the user to wait for the downloads to finish.
+        self.notify('Downloads in progress', 'Repl downloading is in progress. Please ensure the downloads are finished before clicking OK.')
+
+
+    def remove_query_params(self, url):
+        """
+        Remove query parameters from a URL.
+        """
+
+        parts = urlparse(url)
+        return urlunparse(parts._replace(query=''))
+
+
+    def open_tab(self, driver, link):
+        """
+        Opens a tab, waits for it to open, and returns its handle.
+        """
+
+        # Store old handles (compared to new handles).
+        old_handles = driver.window_handles
+
+        # Open a new tab to navigate to the folder
+        driver.execute_script(f'window.open("{link}", "_blank");')
+
+        # Wait for tab to open and return its handle.
+        timeout = 10
+        start_time = time.time()
+        while time.time() - start_time < timeout:
+            new_handles = [handle for handle in driver.window_handles if handle not in old_handles]
+            if new_handles:
+                return new_handles[0]
+
+        raise TimeoutError('Timed out waiting for the new tab to open.')
+
+
+    def wait_for_downloads(self, timeout=600, poll_interval=1):
+        """
+        Waits until the zip file of every project exists in the output directory and no
+        downloads are in progress, without requiring confirmation from the user.
+
+        Returns True if all downloads finished before the timeout and False otherwise.
+        """
+
+        expected_files = [f'{project_name}.zip' for project_name in self.projects]
+
+        start_time = time.time()
+        last_update_time = start_time
+        while time.time() - start_time < timeout:
+            # Chrome writes partially downloaded files with a .crdownload extension.
+            existing_files = set(os.listdir(self.output_path))
+            in_progress = [file for file in existing_files if file.endswith('.crdownload')]
+            missing = [file for file in expected_files if file not in existing_files]
+            if len(in_progress) == 0 and len(missing) == 0:
+                return True
+
+            # Give an update every 10 seconds.
+            if time.time() - last_update_time > 10:
+                self.print_status(f'Waiting for {len(missing)} downloads to finish - {round(time.time() - start_time)} seconds elapsed...', indent=1)
+                last_update_time = time.time()
+
+            time.sleep(poll_interval)
+
+        return False
+
+
+    def organize_files(self, migration_id):
+        """
+        Unzips and organizes the downloaded files into folders based on the file hierarchy.
+        Statistics for every extracted file are recorded under the given migration, and the
+        contents of text files are added to the full-text index used by content search.
+
+        Returns a dictionary summarizing the number of projects extracted, skipped (unchanged)
+        and failed, the total number of files and bytes extracted, the number of files changed
+        on disk since they were recorded, and the number of files indexed.
+        """
+
+        # Create dictionary to summarize organization.
+        summary = {
+            'extracted_projects': 0,
+            'skipped_projects': 0,
+            'failed_projects': 0,
+            'extracted_files': 0,
+            'extracted_bytes': 0,
+            'changed_files': 0,
+            'indexed_files': 0
+        }
+
+        for project_name, project in self.projects.items():
+            # Determine absolute paths of source file and destination folder.
+            project_location = project.path
+            source_file = os.path.join(self.output_path, f'{project_name}.zip')
+            destination_folder = os.path.join(self.output_path, project_location, project_name)
+
+            # Skip projects whose extracted tree already matches the downloaded zip file (ex. on a rerun).
+            # Fingerprints are keyed by absolute destination, since several output directories may share a database.
+            # Trees which were edited since extraction are extracted again.
+            project_path = os.path.join(project_location, project_name)
+            fingerprint_key = os.path.abspath(destination_folder)
+            fingerprint = self.get_fingerprint(source_file)
+            if fingerprint is not None and os.path.isdir(destination_folder):
+                if self.data_handler.read_fingerprint(fingerprint_key) == fingerprint and self.check_extracted(source_file, destination_folder):
+                    self.print_status(f'Skipping {project_name} (unchanged since last extraction).')
+                    self.data_handler.copy_file_stats(migration_id, project_path)
+                    # This migration's statistics also come from the tree, so the fingerprint is kept while this migration is.
+                    self.data_handler.write_fingerprint(fingerprint_key, fingerprint['zip_size'], fingerprint['crc_digest'], migration_id)
+                    os.remove(source_file)
+                    summary['skipped_projects'] += 1
+                    continue
+
+            # Update GUI to prevent freezing during unzipping process.
+            self.print_status(f'Unzipping {project_name}...')
+            if self.update_gui is not None:
+                self.update_gui()
+
+            # Unzip the file, move it to the proper directory, and delete the zip file.
+            result = self.unzip_and_delete(source_file, destination_folder)
+            if result is None:
+                summary['failed_projects'] += 1
+                continue
+
+            summary['extracted_projects'] += 1
+            summary['extracted_files'] += result['extracted_files']
+            summary['extracted_bytes'] += result['extracted_bytes']
+
+            # Record statistics of the extracted files.
+            self.data_handler.write_file_stats(migration_id, project_path, result['files'])
+
+            # Record fingerprint so that this project can be skipped on future reruns. Projects with skipped members
+            # are not, so that they are extracted again (ex. once the size limits are raised).
+            if fingerprint is not None and len(result['skipped']) == 0:
+                self.data_handler.write_fingerprint(fingerprint_key, fingerprint['zip_size'], fingerprint['crc_digest'], migration_id)
+
+        # Index contents of the extracted text files. Contents of unchanged projects are already indexed, but files
+        # of skipped projects may have been edited since they were recorded, so those changes are picked up first.
+        self.print_status('Indexing file contents...')
+        index_summary = self.search_handler.update_index(migration_id, self.output_path)
+        summary['changed_files'] = index_summary['added_files'] + index_summary['changed_files'] + index_summary['deleted_files']
+        summary['indexed_files'] = index_summary['indexed_files']
+        if summary['changed_files'] > 0:
+            self.print_status(f'Updated {summary["changed_files"]} files added, changed or deleted since extraction.')
+
+        return summary
+
+
+    def get_fingerprint(self, zip_file_path):
+        """
+        Returns the fingerprint of the target zip file, or None if it cannot be read.
+        """
+
+        try:
+            return self.extraction_handler.compute_fingerprint(zip_file_path)
+        except (OSError, zipfile.BadZipFile):
+            # Missing or corrupt zip file. The error is reported when unzipping is attempted.
+            return None
+
+
+    def check_extracted(self, zip_file_path, extract_to_path):
+        """
+        Returns whether the target folder still matches the zip file it was extracted from, or False if it cannot be checked.
+        """
+
+        try:
+            return self.extraction_handler.check_extracted(zip_file_path, extract_to_path)
+        except (OSError, zipfile.BadZipFile):
+            return False
+
+
+    def unzip_and_delete(self, zip_file_path, extract_to_path):
+        """
+        Unzips target zip file to designated path, skipping ignored files. Deletes zip file once complete.
+        Returns the extraction summary if the zip file was extracted successfully and None otherwise.
+        """
+
+        try:
+            # Stream the contents to the specified path, within the configured size limits.
+            result = self.extraction_handler.extract(zip_file_path, extract_to_path)
+
+            # Report any members which were skipped.
+            for member_name, reason in result['skipped']:
+                self.print_status(f'Skipped "{member_name}" ({reason}).', indent=1)
+            if result['removed_files'] > 0:
+                self.print_status(f'Removed {result["removed_files"]} files left from a previous extraction.', indent=1)
+
+            # Remove the zip file after extraction.
+            os.remove(zip_file_path)
+
+        except Exception as e:
+            # Report any exceptions that occur.
+            self.print_status(f'Error: {e}', indent=1)
+            return None
+
+        return result
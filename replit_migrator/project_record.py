@@ -0,0 +1,143 @@
+import time
+
+
+class ProjectRecord:
+    """
+    A compact record holding the data for a single Repl project.
+
+    Records are used everywhere project data is handled, from scraping through storage,
+    search and reporting. The display strings scraped from Repl.it (ex. '1.2 MiB' and
+    '4 weeks ago') are parsed once, when the record is created, into a size in bytes and
+    an absolute timestamp.
+    """
+
+
+    # Slots avoid a per-instance dictionary, keeping memory usage low for accounts with many Repls.
+    __slots__ = ('name', 'path', 'link', 'last_modified', 'size', 'size_bytes', 'modified_at')
+
+    # Multipliers for the size units displayed by Repl.it.
+    SIZE_UNITS = {
+        'b': 1,
+        'kb': 1000, 'kib': 1024,
+        'mb': 1000**2, 'mib': 1024**2,
+        'gb': 1000**3, 'gib': 1024**3
+    }
+
+    # Length of each time unit displayed by Repl.it, in seconds. A month is assumed to be 30 days, a year 365 days.
+    TIME_UNITS = {
+        'second': 1,
+        'minute': 60,
+        'hour': 60*60,
+        'day': 24*60*60,
+        'week': 7*24*60*60,
+        'month': 30*24*60*60,
+        'year': 365*24*60*60
+    }
+
+
+    def __init__(self, name, path, link, last_modified, size, reference_time=None, size_bytes=None, modified_at=None):
+        """
+        Creates a project record from the scraped strings.
+
+        reference_time is the Unix timestamp at which last_modified was scraped, used to
+        resolve relative dates. If not specified, the current time is used. Values parsed
+        previously (ex. stored in the database) may be given as size_bytes and modified_at,
+        in which case they are used instead of parsing the strings again.
+        """
+
+        self.name = name
+        self.path = path
+        self.link = link
+        self.last_modified = last_modified
+        self.size = size
+
+        # Parse display strings once, so that consumers never need to re-parse them.
+        self.size_bytes = size_bytes if size_bytes is not None else self.parse_size(size)
+        self.modified_at = modified_at if modified_at is not None else self.parse_relative_time(last_modified, reference_time)
+
+
+    def __repr__(self):
+        return f'ProjectRecord({self.name!r}, path={self.path!r}, size={self.size!r}, last_modified={self.last_modified!r})'
+
+
+    def to_dict(self):
+        """
+        Returns the project data as a dictionary, in the format used by the Replit Migrator Database Server.
+        """
+
+        return {
+            'path': self.path,
+            'link': self.link,
+            'last_modified': self.last_modified,
+            'size': self.size,
+            'size_bytes': self.size_bytes,
+            'modified_at': self.modified_at
+        }
+
+
+    @classmethod
+    def from_dict(cls, name, project_data, reference_time=None):
+        """
+        Creates a project record from a dictionary in the format returned by to_dict().
+        Parsed values are optional, for data written by older versions.
+        """
+
+        return cls(name, project_data['path'], project_data['link'], project_data['last_modified'], project_data['size'], reference_time,
+                   project_data.get('size_bytes'), project_data.get('modified_at'))
+
+
+    @staticmethod
+    def parse_size(size):
+        """
+        Converts a size string (ex. '1.2 MiB') to a number of bytes.
+        Returns None if the string cannot be interpreted.
+        """
+
+        bits = size.split()
+        if len(bits) != 2:
+            return None
+
+        magnitude, unit = bits
+        multiplier = ProjectRecord.SIZE_UNITS.get(unit.lower())
+        if multiplier is None:
+            return None
+
+        try:
+            return int(float(magnitude) * multiplier)
+        except ValueError:
+            return None
+
+
+    @staticmethod
+    def parse_relative_time(raw_date, reference_time=None):
+        """
+        Converts a layman representation of a date (ex. '4 weeks ago') to a Unix timestamp,
+        relative to the reference time. Returns None if the string cannot be interpreted.
+
+        Assumes a format of '<magnitude> <unit> ago', where magnitude may also be 'a' or 'an'.
+        Given ambiguity in the date, the most recent possible time is returned.
+        """
+
+        # If reference time is not specified, use the current time.
+        if reference_time is None:
+            reference_time = time.time()
+
+        bits = raw_date.split()
+        if len(bits) < 2:
+            return None
+
+        # Interpret magnitude.
+        if bits[0] in ('a', 'an'):
+            magnitude = 1
+        else:
+            try:
+                magnitude = int(bits[0])
+            except ValueError:
+                return None
+
+        # Interpret unit and subtract the relevant interval from the reference time.
+        for unit, seconds in ProjectRecord.TIME_UNITS.items():
+            if unit in bits[1]:
+                return int(reference_time - magnitude*seconds)
+
+        return None
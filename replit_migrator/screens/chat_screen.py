@@ -12,13 +12,19 @@ class ChatScreen(Screen):
     The screen which allows users to chat with an AI chatbot.
     """
 
+    # Number of messages loaded at a time from chat history.
+    PAGE_SIZE = 50
+
 
     def __init__(self, root, change_screen, data_handler, API_ROOT_URL):
         # Call superclass constructor to initalize core functionality.
         super().__init__(root, change_screen, data_handler)
 
         self.API_ROOT_URL = API_ROOT_URL
-        self.chat_history = self.data_handler.read_chat_history()
+
+        # Load the latest page of the current conversation. Earlier messages are loaded on demand.
+        self.conversation_id = self.data_handler.get_latest_conversation_id()
+        self.chat_history = self.data_handler.read_chat_history(self.conversation_id, limit=self.PAGE_SIZE)
 
         self.create_gui()
 
@@ -35,6 +41,11 @@ class ChatScreen(Screen):
         self.title_label = ttk.Label(self.frame, text='Chat', style='Header1.TLabel')
         self.title_label.pack()
 
+        # Create button to show earlier messages, if any exist beyond the loaded page.
+        self.earlier_button = ttk.Button(self.frame, text='Show Earlier Messages', command=self.show_earlier_messages, style='Small.TButton')
+        if len(self.chat_history) == self.PAGE_SIZE:
+            self.earlier_button.pack()
+
         # Create chatbox which displays message history.
         self.chatbox = scrolledtext.ScrolledText(self.frame, width=60, height=15, font=('Microsoft Sans Serif', 10), wrap=tk.WORD, state='disabled')
         for message in self.chat_history:
@@ -72,32 +83,57 @@ class ChatScreen(Screen):
             
             # Display response in chatbox.
             self.display_message('assistant', response)
-            self.data_handler.write_chat_history(self.chat_history)
+
+            # Save only the new messages, recording their ids.
+            new_messages = self.chat_history[-2:]
+            ids = self.data_handler.append_chat_messages(new_messages, self.conversation_id)
+            for message, id in zip(new_messages, ids):
+                message['id'] = id
 
             # Clear input entry.
             self.input_entry.delete(0, tk.END)
 
 
-    def display_message(self, role, message):
+    def display_message(self, role, message, index=tk.END):
         """
-        Display a message in the chatbox.
+        Display a message in the chatbox, at the end unless another index is specified.
         """
 
         self.chatbox.configure(state='normal')
         if role == 'user':
-            self.chatbox.insert(tk.END, 'You: ' + message + '\n\n')
+            self.chatbox.insert(index, 'You: ' + message + '\n\n')
         elif role == 'assistant':
-            self.chatbox.insert(tk.END, 'ChatGPT: ' + message + '\n\n')
-        self.chatbox.see(tk.END)
+            self.chatbox.insert(index, 'ChatGPT: ' + message + '\n\n')
+        if index == tk.END:
+            self.chatbox.see(tk.END)
         self.chatbox.configure(state='disabled')
 
 
+    def show_earlier_messages(self):
+        """
+        Loads the page of messages before the earliest displayed message, and displays it above.
+        """
+
+        earlier_messages = self.data_handler.read_chat_history(self.conversation_id, limit=self.PAGE_SIZE, before_id=self.chat_history[0]['id'])
+
+        # Insert messages at the top of the chatbox, latest first.
+        for message in reversed(earlier_messages):
+            self.display_message(message['role'], message['content'], '1.0')
+        self.chatbox.see('1.0')
+        self.chat_history = earlier_messages + self.chat_history
+
+        # Hide button once the start of the conversation is reached.
+        if len(earlier_messages) < self.PAGE_SIZE:
+            self.earlier_button.pack_forget()
+
+
     def get_openai_response(self):
         """
         Send a message to server to get a response from OpenAI API.
         """
 
-        chat_history_json = json.dumps(self.chat_history)
+        # Send only the role and content of each message.
+        chat_history_json = json.dumps([{'role': message['role'], 'content': message['content']} for message in self.chat_history])
         response = requests.post(f'{self.API_ROOT_URL}chat/', data={'chat_history': chat_history_json})
         response_json = json.loads(response.text)
         return response_json['chat_response']
@@ -105,7 +141,7 @@ class ChatScreen(Screen):
 
     def clear_chat(self):
         """
-        Clears the chat history from both screen and database.
+        Clears the current conversation from both screen and database.
         """
 
         # Show messagebox asking if user is sure they want to clear chat history.
@@ -117,6 +153,8 @@ class ChatScreen(Screen):
         self.chatbox.delete(1.0, tk.END)
         self.chatbox.configure(state='disabled')
 
-        # Clear database history.
+        # Clear the current conversation from the database, and start a new conversation.
         self.chat_history = []
-        self.data_handler.write_chat_history(self.chat_history)
+        self.data_handler.clear_chat_history(self.conversation_id)
+        self.conversation_id += 1
+        self.earlier_button.pack_forget()
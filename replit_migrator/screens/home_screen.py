@@ -67,6 +67,11 @@ class HomeScreen(Screen):
             # User is logged in. Create logout button.
             self.logout_button = ttk.Button(self.frame, text='Logout', command=self.logout, style='Small.TButton')
             self.logout_button.pack(pady=button_pady)
+
+            # Create label showing cloud sync status, refreshed while the screen is displayed.
+            self.sync_status_label = ttk.Label(self.frame, style='Small.TLabel')
+            self.sync_status_label.place(relx=0.5, y=540, anchor='center')
+            self.frame.bind('<Map>', lambda event: self.update_sync_status())
         else:
             # Create login/register button.
             self.login_button = ttk.Button(self.frame, text='Login/Register', command=lambda: self.change_screen('login'), style='Small.TButton')
@@ -78,6 +83,22 @@ class HomeScreen(Screen):
         self.help_about_button.pack(pady=button_pady)
 
 
+    def update_sync_status(self):
+        """
+        Displays the current cloud sync status, refreshing periodically until the screen is hidden.
+        """
+
+        # Stop refreshing once another screen is displayed.
+        if not self.frame.winfo_ismapped():
+            return
+
+        sync_handler = self.data_handler.sync_handler
+        if sync_handler is not None:
+            self.sync_status_label.configure(text=sync_handler.describe_status())
+
+        self.frame.after(500, self.update_sync_status)
+
+
     def logout(self):
         """
         Logs the user out of their Replit Migrator account.
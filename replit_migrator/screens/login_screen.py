@@ -74,15 +74,12 @@ class LoginScreen(Screen):
         password = self.password_entry.get()
 
         # Attempt to retrieve user migration data from the API.
-        response = self.data_handler.download_database_from_server(username, password)
-
-        # Parse and store JSON data from response.
-        response_json = json.loads(response.text)
+        error_message = self.data_handler.download_database_from_server(username, password)
 
         # Check for error.
-        if 'status' in response_json and response_json['status'] == 'error':
+        if error_message is not None:
             # Server responded with an error. Notify user of error and exit.
-            messagebox.showerror('Error', response_json['message'])
+            messagebox.showerror('Error', error_message)
             return
 
         # Save login details for future requests.
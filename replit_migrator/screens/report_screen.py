@@ -4,6 +4,7 @@ from reportlab.lib.pagesizes import letter
 from reportlab.lib.units import inch
 from reportlab.pdfgen import canvas
 import matplotlib.pyplot as plt
+import datetime
 import os
 
 from .screen_superclass import Screen
@@ -19,9 +20,6 @@ class ReportScreen(Screen):
         # Call superclass constructor to initalize core functionality.
         super().__init__(root, change_screen, data_handler)
 
-        # Read project data from database.
-        self.data = self.data_handler.read_projects()
-
         self.pdf_canvas = None  # Canvas for PDF document, initialized when needed.
         self.line_begin = inch  # Tracks the y coordinate of the beginning of the next line to be drawn.
         self.report_options = { # Tracks which report options are enabled.
@@ -88,7 +86,8 @@ class ReportScreen(Screen):
         # Gather data.
         file_type_count, file_count = self.count_files_and_types()
         total_lines = sum(file_type_count.values())
-        total_size = sum([float(self.data[project]['size'].split(' ')[0]) for project in self.data])
+        project_totals = self.data_handler.read_project_totals()
+        total_size = project_totals['size_bytes'] / 1024**2
 
         # Draw the report.
         # Draw the title.
@@ -97,13 +96,13 @@ class ReportScreen(Screen):
         if self.report_options['Line Counts']:
             self.draw_pie_chart(file_type_count.values(), file_type_count.keys(), 'File Types', 3.5*inch)
         if self.report_options['Total Metrics']:
-            self.draw_text(f'Total projects: {len(self.data)}')
+            self.draw_text(f'Total projects: {project_totals["projects"]}')
             self.draw_text(f'Total files: {file_count}')
             self.draw_text(f'Total lines of code: {total_lines}')
             self.draw_text(f'Total size: {round(total_size, 2)} MiB')
             self.draw_text('', font_size=0, line_spacing=10)
         if self.report_options['Average Metrics']:
-            self.draw_text(f'Average files per project: {round(len(self.data)/file_count, 2)}')
+            self.draw_text(f'Average files per project: {round(project_totals["projects"]/file_count, 2)}')
             self.draw_text(f'Average lines per file: {round(total_lines/file_count, 2)}')
             self.draw_text(f'Average size per file: {round(total_size/file_count, 2)} MiB')
             self.draw_text('', font_size=0, line_spacing=10)
@@ -114,9 +113,13 @@ class ReportScreen(Screen):
             # Place project index on separate page.
             self.next_page()
             self.draw_text('Project Index', font_size=15, line_spacing=20)
-            self.draw_project_details(None, header=True)
-            for project_name in self.data:
-                self.draw_project_details(project_name)
+            self.draw_project_details('Name', 'Last Modified', 'Size', 'Path')
+            for project in self.data_handler.read_shared_projects().values():
+                # Show the last modified date resolved when the project was scraped, if it could be interpreted.
+                last_modified = project.last_modified
+                if project.modified_at is not None:
+                    last_modified = datetime.date.fromtimestamp(project.modified_at).isoformat()
+                self.draw_project_details(project.name, last_modified, project.size, project.path)
 
         # Save the PDF.
         self.pdf_canvas.save()
@@ -186,50 +189,38 @@ class ReportScreen(Screen):
         self.line_begin = inch
 
 
-    def draw_project_details(self, project_name, header=False):
+    def draw_project_details(self, name, last_modified, size, path):
         """
         Draws the details for a single project in the project index.
+        Also used to draw the header row, by passing the column titles.
         """
 
-        temp = None
-        if header:
-            # Draw the header row.
-            project_name = 'Name'
-            try:
-                temp = self.data['Name']
-            except KeyError:
-                pass
-            self.data['Name'] = {
-                'last_modified': 'Last Modified',
-                'size': 'Size',
-                'path': 'Path'
-            }
-
         # Draw each project detail, moving to the next column after each.
         cur_x = inch
-        self.draw_text(project_name, x=cur_x, y=self.line_begin)
+        self.draw_text(name, x=cur_x, y=self.line_begin)
         cur_x += inch*1.5
-        self.draw_text(self.data[project_name]['last_modified'], x=cur_x, y=self.line_begin)
+        self.draw_text(last_modified, x=cur_x, y=self.line_begin)
         cur_x += inch*1.5
-        self.draw_text(self.data[project_name]['size'], x=cur_x, y=self.line_begin)
+        self.draw_text(size, x=cur_x, y=self.line_begin)
         cur_x += inch*1.5
-        self.draw_text(self.data[project_name]['path'], x=cur_x, y=self.line_begin)
+        self.draw_text(path, x=cur_x, y=self.line_begin)
         self.draw_text('')
 
-        if header:
-            # Restore original project titled 'Name' if it existed.
-            if temp is not None:
-                self.data['Name'] = temp
-            else:
-                del self.data['Name']
-
 
     def count_files_and_types(self):
         """
         Counts the total number of lines of each file type, by file extension,
         as well as the total number of code files (e.g. not images).
+
+        Uses the file statistics recorded during extraction. Migrations organized before
+        file statistics were recorded fall back to scanning the output directory.
         """
 
+        # Use file statistics from the database if they exist.
+        recorded_counts = self.data_handler.read_line_counts_by_extension()
+        if recorded_counts is not None:
+            return recorded_counts
+
         # Store the count of each file type in a dictionary.
         # Key: file extension, Value: count
         type_count = dict()
@@ -22,6 +22,16 @@ class Screen:
         self.data_handler = data_handler
 
 
+    def leave(self):
+        """
+        Called when the screen stops being displayed (see change_screen() of app_handler).
+
+        Screens which run work in the background override this to stop it.
+        """
+
+        pass
+
+
     def create_gui(self):
         """
         Creates the Tkinter GUI for the screen.
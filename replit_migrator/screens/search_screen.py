@@ -2,14 +2,18 @@
 import tkinter as tk
 from tkinter import scrolledtext
 from tkinter import ttk
+from tkinter import messagebox
 import tkcalendar
 
 # Utility modules.
 import datetime
 import os
 import re
+import time
 
 from .screen_superclass import Screen
+from replit_migrator import config
+from replit_migrator.search_handler import SearchHandler
 
 
 class SearchScreen(Screen):
@@ -22,8 +26,11 @@ class SearchScreen(Screen):
         # Call superclass constructor to initalize core functionality.
         super().__init__(root, change_screen, data_handler)
 
-        # Get project data from the database.
-        self.data = self.data_handler.read_projects()
+        # Searches file contents using the full-text index where possible.
+        self.search_handler = SearchHandler(self.data_handler)
+
+        # Content scan running in the background, if any.
+        self.scan = None
 
         self.create_gui()
 
@@ -78,9 +85,13 @@ class SearchScreen(Screen):
         self.end_date_calendar = tkcalendar.DateEntry(self.end_date_frame, width=12)
         self.end_date_calendar.pack()
 
-        # Create button to initiate search.
-        self.search_button = ttk.Button(self.frame, text='Search', command=self.search)
-        self.search_button.grid(row=3, column=0, pady=(10, 20))
+        # Create button to initiate search, and widgets to follow and cancel a content scan (shown while scanning).
+        self.search_button_frame = ttk.Frame(self.frame)
+        self.search_button_frame.grid(row=3, column=0, pady=(10, 20))
+        self.search_button = ttk.Button(self.search_button_frame, text='Search', command=self.search)
+        self.search_button.pack(side='left')
+        self.cancel_button = ttk.Button(self.search_button_frame, text='Cancel', command=self.cancel_scan)
+        self.scan_status_label = ttk.Label(self.search_button_frame)
 
         # Create textbox to display search results.
         self.result_text = scrolledtext.ScrolledText(self.frame, width=80, height=15, font=('Microsoft Sans Serif', 10), wrap=tk.WORD, state='disabled')
@@ -137,16 +148,23 @@ class SearchScreen(Screen):
         search_item = self.search_item_combo.get()
         search_type = self.search_type_combo.get()
 
+        # Stop any content scan still running, so that its results are not mixed with those of this search.
+        self.cancel_scan()
+
         if search_item == 'Projects':
             if search_type == 'Project Name':
                 self.search_projects_by_name()
             elif search_type == 'Last Modified Date':
                 self.search_projects_by_date()
         elif search_item == 'Files':
-            if search_type == 'File Name':
-                self.search_files_by_name()
-            elif search_type == 'File Content':
-                self.search_files_by_content()
+            # File searches take a regular expression.
+            try:
+                if search_type == 'File Name':
+                    self.search_files_by_name()
+                elif search_type == 'File Content':
+                    self.search_files_by_content()
+            except re.error as e:
+                messagebox.showerror('Invalid Search Query', f'The search query is not a valid regular expression ({e}).')
 
 
     def search_projects_by_name(self):
@@ -160,10 +178,10 @@ class SearchScreen(Screen):
         # Get the search string.
         target_name = self.search_entry.get()
         
-        # Search through all projects and display those which were last modified in the given interval.
-        for name in self.data:
+        # Search through all projects of the latest migration (shared with other screens) and display those whose names contain the search string.
+        for name, project in self.data_handler.read_shared_projects().items():
             if target_name in name:
-                self.display_project_in_textbox(name)
+                self.display_project_in_textbox(project)
 
 
     def search_projects_by_date(self):
@@ -174,34 +192,35 @@ class SearchScreen(Screen):
         # Clear previous results
         self.clear_results()
         
-        # Get the start and end dates.
+        # Get the start and end dates, as timestamps from the start of the start date to the end of the end date (in local time).
         start_date = self.start_date_calendar.get_date()
-        end_date = self.end_date_calendar.get_date()
+        end_date = self.end_date_calendar.get_date() + datetime.timedelta(days=1)
+        start_time = time.mktime(start_date.timetuple())
+        end_time = time.mktime(end_date.timetuple())
 
-        # Search through all projects and display those which were last modified in the given interval.
-        for name in self.data:
-            project = self.data[name]
-            raw_date_string = project['last_modified']
-            project_date = self.string_to_date(raw_date_string)
-            if start_date <= project_date <= end_date:
-                self.display_project_in_textbox(name)
+        # Query the database for projects which were last modified in the given interval, and display them.
+        for project in self.data_handler.read_projects_modified_between(start_time, end_time).values():
+            self.display_project_in_textbox(project)
 
 
-    def display_project_in_textbox(self, name):
+    def display_project_in_textbox(self, project):
         """
         Displays a project's details in the textbox.
         """
 
-        # Get the project's details.
-        project_details = self.data[name]
+        # Show the last modified date resolved when the project was scraped, if it could be interpreted.
+        last_modified = project.last_modified
+        if project.modified_at is not None:
+            last_modified = datetime.date.fromtimestamp(project.modified_at).isoformat()
 
-        # Create output string.
-        formatted_path = os.path.normpath(f'output/{project_details["path"]}{name}/')
+        # Create output string. Projects shown are of the latest migration, so are under its output directory.
+        output_path = self.data_handler.get_migration_tables()[-1]['output_path'] or os.path.join(os.getcwd(), config.OUTPUT_PATH)
+        formatted_path = os.path.normpath(os.path.join(output_path, project.path, project.name))
         output = ''
-        output += f'Project: {name}\n'
+        output += f'Project: {project.name}\n'
         output += f'Path: {formatted_path}\n'
-        output += f'Last Modified: {project_details["last_modified"]}\n'
-        output += f'Size: {project_details["size"]}\n'
+        output += f'Last Modified: {last_modified}\n'
+        output += f'Size: {project.size}\n'
         output += '\n'
 
         # Insert output into textbox.
@@ -218,13 +237,23 @@ class SearchScreen(Screen):
         # Clear previous results
         self.clear_results()
 
-        # Search through the files in the output directory for the search_string.
+        # Search the file statistics recorded during extraction, if they exist.
         search_string = self.search_entry.get()
-        search_dir = os.path.join(os.getcwd(), 'output/')
+        files = self.data_handler.read_files_by_name(search_string)
+        if files is not None:
+            for file in files:
+                # Paths are relative to the output directory recorded with the migration (older versions always used the default).
+                output_path = file['output_path'] or os.path.join(os.getcwd(), config.OUTPUT_PATH)
+                formatted_path = os.path.normpath(os.path.join(output_path, file['project_path'], file['relative_path']))
+                self.display_file_result(file['name'], formatted_path)
+            return
+
+        # Migrations organized before file statistics were recorded fall back to searching through the files in the output directory.
+        search_dir = os.path.join(os.getcwd(), config.OUTPUT_PATH)
         for root, dirs, files in os.walk(search_dir):
             for file_name in files:
                 if re.search(search_string, file_name):
-                    self.display_file_in_textbox(root, file_name, search_dir)
+                    self.display_file_in_textbox(root, file_name)
 
 
     def search_files_by_content(self):
@@ -235,31 +264,88 @@ class SearchScreen(Screen):
         # Clear previous results
         self.clear_results()
 
-        # Search through the files in the output directory for the search_string.
+        # Search the full-text index of the files in the output directory, if it can answer the search.
         search_string = self.search_entry.get()
-        search_dir = os.path.join(os.getcwd(), 'output/')
-        for root, dirs, files in os.walk(search_dir):
-            for file_name in files:
-                file_path = os.path.normpath(os.path.join(root, file_name))
-                # Search through the specific file using regular expressions.
-                with open(file_path, 'r') as file:
-                    try:
-                        for line_number, line in enumerate(file):
-                            if re.search(search_string, line):
-                                self.display_file_in_textbox(root, file_name, search_dir, (line_number, line.strip()))
-                    except UnicodeDecodeError:
-                        # Not a readable file (perhaps an image or binary file), skip.
-                        pass
+        search_dir = os.path.join(os.getcwd(), config.OUTPUT_PATH)
+        hits = self.search_handler.search_index(search_string, search_dir)
+        if hits is not None:
+            for output_path, project_path, relative_path, file_name, line_number, line in hits:
+                formatted_path = os.path.normpath(os.path.join(output_path, project_path, relative_path))
+                self.display_file_result(file_name, formatted_path, (line_number, line.strip()))
+            return
+
+        # Otherwise, scan the files in the output directory in the background, displaying results as they are found.
+        self.scan = self.search_handler.start_scan(search_string, search_dir)
+        self.cancel_button.pack(side='left', padx=(10, 0))
+        self.scan_status_label.pack(side='left', padx=(10, 0))
+        self.update_scan()
+
+
+    def update_scan(self):
+        """
+        Displays results of the content scan found since the last update, refreshing periodically until it finishes.
+        """
+
+        if self.scan is None:
+            return
+
+        # Check whether the scan has finished before collecting results, so that none are missed.
+        finished = self.scan.finished.is_set()
+        for file_path, line_number, line in self.scan.get_hits():
+            self.display_file_in_textbox(os.path.dirname(file_path), os.path.basename(file_path), (line_number, line))
+
+        if not finished:
+            self.scan_status_label.configure(text=f'Scanned {self.scan.scanned_files} files...')
+            self.frame.after(100, self.update_scan)
+            return
+
+        # Scan complete.
+        if self.scan.error is not None:
+            messagebox.showerror('Search Failed', f'The search could not be completed ({self.scan.error}).')
+        self.scan = None
+        self.cancel_button.pack_forget()
+        self.scan_status_label.pack_forget()
+
+
+    def leave(self):
+        """
+        Cancels the content scan when another screen is displayed, or the window is closed. Scans continue
+        while the window is minimized. Widgets are not updated, as they are discarded (or already destroyed).
+        """
+
+        if self.scan is not None:
+            self.scan.cancel()
+            self.scan = None
+
+
+    def cancel_scan(self):
+        """
+        Cancels the content scan running in the background, if any.
+        """
+
+        if self.scan is None:
+            return
+
+        self.scan.cancel()
+        self.scan = None
+        self.cancel_button.pack_forget()
+        self.scan_status_label.pack_forget()
     
 
-    def display_file_in_textbox(self, root, file_name, search_dir, line_data=None):
+    def display_file_in_textbox(self, root, file_name, line_data=None):
+        """
+        Displays the details of a single file result (found in the directory root) in the textbox.
+        """
+
+        formatted_path = os.path.normpath(os.path.join(root, file_name))
+        self.display_file_result(file_name, formatted_path, line_data)
+
+
+    def display_file_result(self, file_name, formatted_path, line_data=None):
         """
-        Displays the details of a single file result in the textbox.
+        Displays a file's name, path and (optionally) matching line in the textbox.
         """
 
-        absolute_file_path = os.path.normpath(os.path.join(root, file_name))
-        relative_file_path = os.path.relpath(absolute_file_path, search_dir)
-        formatted_path = os.path.normpath(f'output/{relative_file_path}')
         result = ''
         result += f'File: {file_name}\n'
         result += f'Path: {formatted_path}\n'
@@ -285,35 +371,3 @@ class SearchScreen(Screen):
         self.result_text.configure(state='normal')
         self.result_text.delete(1.0, tk.END)
         self.result_text.configure(state='disabled')
-
-
-    def string_to_date(self, raw_date):
-        """
-        Converts a layman representation of a date (ex. '4 weeks ago') to a datetime object.
-
-        Assumes a format of '<magnitude> <unit> ago' where unit is one of 'days', 'weeks', 'months', 'years'.
-        Given ambiguity in the date, the most recent possible date is returned.
-        """
-
-        # Get the current date.
-        cur_date = datetime.date.today()
-
-        # Interpret the raw_date string and subtract the relevant interval from the current date.
-        bits = raw_date.split()
-        magnitude = int(bits[0])
-        actual_date = None
-        if 'day' in bits[1]:
-            actual_date = cur_date - datetime.timedelta(days=magnitude)
-        elif 'week' in bits[1]:
-            actual_date = cur_date - datetime.timedelta(weeks=magnitude)
-        elif 'month' in bits[1]:
-            # Assume a month is 30 days.
-            actual_date = cur_date - datetime.timedelta(days=magnitude*30)
-        elif 'year' in bits[1]:
-            actual_date = cur_date - datetime.timedelta(days=magnitude*365)
-        elif 'minute' in bits[1] or 'second' in bits[1] or 'hour' in bits[1]:
-            # File modified today.
-            actual_date = cur_date
-
-        return actual_date
-    
\ No newline at end of file
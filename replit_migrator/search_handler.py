@@ -0,0 +1,572 @@
+import os
+import re
+import mmap
+import multiprocessing
+import codecs
+import queue
+import threading
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+from replit_migrator import config
+from replit_migrator.extraction_handler import ExtractionHandler
+
+# The regular expression parser is only exposed as a private module since Python 3.11.
+try:
+    from re import _parser as sre_parse
+except ImportError:
+    import sre_parse
+
+
+class SearchHandler:
+    """
+    Handles searching the contents of extracted files.
+
+    The contents of every extracted text file are added to a persistent trigram index (see
+    DatabaseHandler.create_content_index()) once a migration has been organized, so that content
+    searches are answered by the database instead of reading every file under the output directory.
+
+    Search patterns are regular expressions. The literals which any match must contain are
+    extracted from the parsed pattern and looked up in the index, and the full pattern is then
+    run only on the candidate lines found, so results are identical to scanning the files.
+
+    Files may change on disk after extraction (ex. when edited by the user). update_index()
+    compares each file's size and modification time with those recorded, and only rereads
+    files which differ, so the index is kept up to date without rebuilding it.
+    """
+
+
+    # Trigrams are the shortest substrings which the index can match.
+    MIN_INDEXED_LENGTH = 3
+
+
+    def __init__(self, data_handler):
+        # Initialize core attributes from parameters.
+        self.data_handler = data_handler
+
+        # Computes the statistics of files changed on disk, in the same form as during extraction.
+        self.extraction_handler = ExtractionHandler()
+
+
+    def update_index(self, migration_id, output_path):
+        """
+        Brings the recorded file statistics and the full-text index of a migration up to date with
+        its extracted files under the output directory. Files whose size or modification time differ
+        from those recorded are rehashed, files not recorded are added, and files which no longer
+        exist are removed. Only new contents are then indexed, and contents no longer referred to
+        are dropped.
+
+        Returns a dictionary summarizing the number of files added, changed, deleted and indexed.
+        """
+
+        summary = {
+            'added_files': 0,
+            'changed_files': 0,
+            'deleted_files': 0,
+            'indexed_files': 0
+        }
+
+        # Recorded files which are not found on disk are left in this dictionary, so they are deleted.
+        recorded_files = self.data_handler.read_file_signatures(migration_id)
+        file_stats = []
+        touched_files = []
+
+        for project in self.data_handler.read_shared_projects(migration_id).values():
+            project_path = os.path.join(project.path, project.name)
+            project_folder = os.path.join(output_path, project_path)
+            for root, dirs, files in os.walk(project_folder):
+                for file_name in files:
+                    file_path = os.path.join(root, file_name)
+                    # Paths are recorded as in the zip file, which always uses '/'.
+                    relative_path = os.path.relpath(file_path, project_folder).replace(os.sep, '/')
+                    signature = recorded_files.pop((project_path, relative_path), None)
+
+                    # Files which keep their recorded size and modification time are unchanged, and are not read.
+                    try:
+                        stat = os.stat(file_path)
+                        if signature is not None and signature[:2] == (stat.st_size, int(stat.st_mtime)):
+                            continue
+                        stats = self.extraction_handler.read_file_stats(file_path, relative_path)
+                    except OSError:
+                        # File vanished or can't be read, so its record is left as is until the next update.
+                        if signature is not None:
+                            recorded_files[(project_path, relative_path)] = signature
+                        continue
+
+                    # Files which were only touched are recorded with their new modification time, but need no reindexing.
+                    if signature is not None and stats['content_hash'] == signature[2]:
+                        touched_files.append((project_path, relative_path, stats['mtime']))
+                        continue
+                    if signature is None:
+                        summary['added_files'] += 1
+                    else:
+                        summary['changed_files'] += 1
+                    file_stats.append((project_path, stats))
+
+        deleted_files = list(recorded_files)
+        summary['deleted_files'] = len(deleted_files)
+        self.data_handler.update_file_stats(migration_id, file_stats, touched_files, deleted_files)
+
+        summary['indexed_files'] = self.index_migration(migration_id, output_path)
+
+        return summary
+
+
+    def index_migration(self, migration_id, output_path):
+        """
+        Adds the contents of the text files of a migration which are not yet indexed to the
+        full-text index, reading them from the output directory. Contents no longer referred
+        to by any file are removed. Returns the number of files indexed.
+        """
+
+        if not self.data_handler.content_index_supported:
+            return 0
+
+        indexed_files = 0
+        for content_hash, (project_path, relative_path) in self.data_handler.read_unindexed_files(migration_id).items():
+            file_path = os.path.join(output_path, project_path, relative_path)
+            try:
+                # Read lines as the fallback scan does, so that line numbers match.
+                with open(file_path, 'r', encoding='utf-8') as file:
+                    self.data_handler.write_indexed_lines(content_hash, file)
+            except UnicodeDecodeError:
+                # File was changed since its statistics were recorded, and is no longer valid UTF-8, so the scan skips it
+                # too. It is recorded as binary, rather than left unindexed (which would make every search scan).
+                self.data_handler.write_file_not_text(migration_id, project_path, relative_path)
+                continue
+            except OSError:
+                # File was moved or changed since extraction. It is searched by scanning instead.
+                continue
+            indexed_files += 1
+
+        self.data_handler.delete_unreferenced_contents()
+
+        return indexed_files
+
+
+    def search_index(self, pattern, search_dir):
+        """
+        Searches the text files extracted under a directory for lines matching the regular
+        expression pattern, using the full-text index. Files are those which a scan of the
+        directory (see start_scan()) would read: the latest recorded files of each project of the
+        migrations downloaded under it, updated first with any changes on disk (see update_index()). Returns a list of (output path, project path, relative path,
+        name, line number, line) tuples, or None if the index can't answer the search, in which case
+        the files must be scanned instead.
+
+        Raises re.error if the pattern is invalid.
+        """
+
+        # Find the literals any matching line must contain. Without any, every line is a candidate, so the index can't help.
+        regex = re.compile(pattern)
+        requirement = self.get_required_literals(sre_parse.parse(pattern))
+        if requirement is None:
+            return None
+
+        # Bring the index up to date with files edited on disk since they were recorded, so that results match a scan.
+        # Only files whose size or modification time changed are reread.
+        output_paths = self.get_output_paths(search_dir)
+        for migration_id, output_path in self.data_handler.read_scope_migrations(output_paths):
+            self.update_index(migration_id, output_path)
+
+        # Files which are not indexed would be missed.
+        if not self.data_handler.check_content_index_complete(output_paths):
+            return None
+
+        # Run the full pattern on candidate lines only. The index also ignores case, so candidates may not match.
+        query = self.build_index_query(requirement)
+        return [hit for hit in self.data_handler.read_indexed_lines(query, output_paths) if regex.search(hit[5])]
+
+
+    def get_output_paths(self, search_dir):
+        """
+        Finds the migrations downloaded under a directory. Returns a dictionary mapping the output
+        path recorded with each of them to the absolute directory it refers to. Migrations recorded
+        without an output path were downloaded to the default output directory.
+        """
+
+        search_dir = os.path.join(os.path.abspath(search_dir), '')
+
+        output_paths = {}
+        for migration in self.data_handler.get_migration_tables():
+            output_path = os.path.abspath(migration['output_path'] or os.path.join(os.getcwd(), config.OUTPUT_PATH))
+            if os.path.join(output_path, '').startswith(search_dir):
+                output_paths[migration['output_path']] = output_path
+
+        return output_paths
+
+
+    def start_scan(self, pattern, search_dir):
+        """
+        Starts scanning the files under a directory for lines matching the regular expression
+        pattern in the background, for searches the index can't answer. Returns the ContentScan.
+
+        Raises re.error if the pattern is invalid.
+        """
+
+        # Check the pattern here, as errors in worker processes would only be seen as failed batches.
+        re.compile(pattern)
+
+        # Literals which locate candidate lines in the raw bytes of each file. Without any, every line is checked.
+        literals = self.get_candidate_literals(self.get_required_literals(sre_parse.parse(pattern)))
+
+        return ContentScan(pattern, search_dir, literals)
+
+
+    def get_required_literals(self, parsed_pattern, ignore_case=None):
+        """
+        Determines the literals which any match of a parsed regular expression must contain.
+
+        Returns a literal string, a tuple of ('and', requirements) or ('or', requirements), or None
+        if a match need not contain any literal long enough to be looked up in the index. Only
+        constructs which are guaranteed to match are considered: literal runs, groups, repeats of
+        at least one and alternations whose every branch has a requirement.
+
+        Literals matched ignoring case (by default, if the pattern's global flags include IGNORECASE)
+        are not considered, as neither the index nor a search of raw bytes matches them the way the
+        pattern does (ex. 'k' also matches the Kelvin sign).
+        """
+
+        if ignore_case is None:
+            ignore_case = bool(parsed_pattern.state.flags & re.IGNORECASE)
+
+        requirements = []
+        literal = ''
+        for op, av in parsed_pattern:
+            if op is sre_parse.LITERAL and not ignore_case:
+                literal += chr(av)
+                continue
+            if op is sre_parse.AT:
+                # Anchors match no characters, so the literals on either side are adjacent.
+                continue
+
+            # Any other element ends the current run of literal characters.
+            requirements.append(literal)
+            literal = ''
+
+            if op is sre_parse.SUBPATTERN:
+                # Groups may turn ignoring case on or off for their contents (ex. '(?i:abc)').
+                group, add_flags, del_flags, item = av
+                group_ignore_case = (ignore_case or bool(add_flags & re.IGNORECASE)) and not del_flags & re.IGNORECASE
+                requirements.append(self.get_required_literals(item, group_ignore_case))
+            elif op in (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT):
+                min_count, max_count, item = av
+                if min_count > 0:
+                    requirements.append(self.get_required_literals(item, ignore_case))
+            elif op is sre_parse.BRANCH:
+                alternatives = [self.get_required_literals(item, ignore_case) for item in av[1]]
+                if all(alternative is not None for alternative in alternatives):
+                    requirements.append(('or', alternatives))
+            # Other elements (ex. character classes, wildcards and lookarounds) require no particular literal.
+
+        requirements.append(literal)
+
+        # Literals too short to contain a trigram can't be looked up.
+        requirements = [requirement for requirement in requirements
+                        if requirement is not None and not (isinstance(requirement, str) and len(requirement) < self.MIN_INDEXED_LENGTH)]
+        if len(requirements) == 0:
+            return None
+        if len(requirements) == 1:
+            return requirements[0]
+
+        return ('and', requirements)
+
+
+    def get_candidate_literals(self, requirement):
+        """
+        Selects literals from a requirement returned by get_required_literals() such that every
+        match contains at least one of them: all alternatives of an 'or', and the longest (most
+        selective) alternatives of an 'and'. Returns a list of literals, or None if there is no requirement.
+        """
+
+        if requirement is None:
+            return None
+        if isinstance(requirement, str):
+            return [requirement]
+
+        operator, requirements = requirement
+        if operator == 'or':
+            return [literal for item in requirements for literal in self.get_candidate_literals(item)]
+
+        return max((self.get_candidate_literals(item) for item in requirements), key=lambda literals: min(len(literal) for literal in literals))
+
+
+    def build_index_query(self, requirement):
+        """
+        Converts a requirement returned by get_required_literals() to an FTS5 query, matching each literal as a phrase.
+        """
+
+        if isinstance(requirement, str):
+            return '"' + requirement.replace('"', '""') + '"'
+
+        operator, requirements = requirement
+        return '(' + f' {operator.upper()} '.join(self.build_index_query(item) for item in requirements) + ')'
+
+
+class ContentScan:
+    """
+    A search of the contents of every file under a directory, run in the background.
+
+    Files are split into small batches, which are scanned by a pool of worker processes so
+    that all cores are used. Each worker compiles the pattern once. Hits are queued as each
+    batch finishes, so they can be displayed while the scan continues, and the scan can be
+    cancelled at any time. Only a few batches are queued at once, so cancelling is quick.
+
+    Binary files are recognized from their first block and skipped without being read further.
+    If literals which every match must contain are given (see SearchHandler.get_candidate_literals()),
+    text files are memory-mapped and searched for them as bytes, and only the lines containing
+    them are decoded and checked against the pattern (see scan_file()).
+    """
+
+
+    # Number of files scanned by a worker in one task.
+    BATCH_SIZE = 32
+
+    # Maximum number of batches queued for each worker at once.
+    BATCHES_PER_WORKER = 2
+
+    # Seconds between checks for cancellation while waiting for batches.
+    POLL_INTERVAL = 0.1
+
+
+    def __init__(self, pattern, search_dir, literals=None, workers=None):
+        # Initialize core attributes from parameters. By default, one worker is used per core.
+        self.pattern = pattern
+        self.search_dir = search_dir
+        self.literals = literals
+        self.workers = workers if workers is not None else os.cpu_count() or 1
+
+        # Hits are lists of (file path, line number, line) tuples, one list per batch.
+        self.hits = queue.Queue()
+        self.cancelled = threading.Event()
+        self.finished = threading.Event()
+        self.scanned_files = 0
+        self.error = None
+
+        # Start scanning in a background thread, which feeds batches to the workers. It is a daemon so that it never keeps the application open.
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+
+    def cancel(self):
+        """
+        Stops the scan. Batches being scanned are finished, but their hits are discarded.
+        """
+
+        self.cancelled.set()
+
+
+    def get_hits(self):
+        """
+        Returns the hits found since the last call, without waiting.
+        """
+
+        hits = []
+        while True:
+            try:
+                hits.extend(self.hits.get_nowait())
+            except queue.Empty:
+                return hits
+
+
+    def run(self):
+        """
+        Feeds batches of files to the worker processes and collects their hits. Runs in the scan thread.
+        """
+
+        try:
+            # Workers are spawned rather than forked, as forking a process running other threads (ex. Tkinter's and the sync
+            # thread) may copy locks held by them, deadlocking the workers.
+            context = multiprocessing.get_context('spawn')
+            with ProcessPoolExecutor(max_workers=self.workers, mp_context=context, initializer=initialize_scan_worker,
+                                     initargs=(self.pattern, self.literals)) as executor:
+                pending = set()
+                for batch in self.iterate_batches():
+                    if self.cancelled.is_set():
+                        break
+                    pending.add(executor.submit(scan_files, batch))
+                    # Wait for a batch to finish before queueing more than the workers can start soon.
+                    while len(pending) >= self.workers * self.BATCHES_PER_WORKER and not self.cancelled.is_set():
+                        pending = self.collect(pending)
+
+                # Wait for remaining batches.
+                while len(pending) > 0 and not self.cancelled.is_set():
+                    pending = self.collect(pending)
+
+                # Drop queued batches if cancelled.
+                if self.cancelled.is_set():
+                    executor.shutdown(wait=False, cancel_futures=True)
+        except Exception as e:
+            # Ex. worker processes could not be started. Hits found so far remain available.
+            self.error = f'{type(e).__name__}: {e}'
+        finally:
+            self.finished.set()
+
+
+    def collect(self, pending):
+        """
+        Waits briefly for batches to finish, queueing their hits. Returns the batches still pending.
+        """
+
+        done, pending = wait(pending, timeout=self.POLL_INTERVAL, return_when=FIRST_COMPLETED)
+        for future in done:
+            scanned_files, hits = future.result()
+            self.scanned_files += scanned_files
+            if len(hits) > 0 and not self.cancelled.is_set():
+                self.hits.put(hits)
+
+        return pending
+
+
+    def iterate_batches(self):
+        """
+        Yields lists of the paths of files under the search directory, BATCH_SIZE at a time.
+        """
+
+        batch = []
+        for root, dirs, files in os.walk(self.search_dir):
+            for file_name in files:
+                batch.append(os.path.join(root, file_name))
+                if len(batch) == self.BATCH_SIZE:
+                    yield batch
+                    batch = []
+
+        if len(batch) > 0:
+            yield batch
+
+
+# Number of bytes at the start of a file used to recognize binary files.
+SNIFF_SIZE = 8 * 1024
+
+# Number of bytes of a memory-mapped file decoded at once when checking that it is valid UTF-8.
+DECODE_CHUNK_SIZE = 1024 * 1024
+
+# Carriage returns which end lines on their own (old Mac line endings), which text mode treats as line breaks.
+LONE_CARRIAGE_RETURN = re.compile(rb'\r(?!\n)')
+
+# Search pattern, and bytes pattern matching any candidate literal (or None), compiled once by each scan worker process.
+scan_regex = None
+scan_literal_regex = None
+
+
+def initialize_scan_worker(pattern, literals):
+    """
+    Compiles the search pattern, and the bytes pattern of its candidate literals if any, when a scan worker process starts.
+    """
+
+    global scan_regex, scan_literal_regex
+    scan_regex = re.compile(pattern)
+    scan_literal_regex = None
+    if literals:
+        # Try longer literals first, as they are rarer.
+        scan_literal_regex = re.compile(b'|'.join(re.escape(literal.encode('utf-8')) for literal in sorted(literals, key=len, reverse=True)))
+
+
+def scan_files(file_paths):
+    """
+    Searches files for lines matching the pattern of the worker process. Runs in a scan worker process.
+    Returns the number of files scanned and a list of (file path, line number, line) tuples.
+    """
+
+    hits = []
+    for file_path in file_paths:
+        try:
+            hits.extend(scan_file(file_path))
+        except (OSError, ValueError):
+            # Not a readable file (including text which turns out not to be UTF-8), skip.
+            continue
+
+    return len(file_paths), hits
+
+
+def scan_file(file_path):
+    """
+    Searches a single file for lines matching the pattern of the worker process, returning a
+    list of (file path, line number, line) tuples. Binary files are skipped after their first block.
+    """
+
+    with open(file_path, 'rb') as file:
+        if is_binary(file.read(SNIFF_SIZE)):
+            return []
+
+        # Empty files can't be memory-mapped (and contain no matches).
+        if os.fstat(file.fileno()).st_size == 0:
+            return []
+
+        if scan_literal_regex is not None:
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                # Lines are split on newlines only, so files with other line breaks are read in text mode below.
+                if not LONE_CARRIAGE_RETURN.search(data):
+                    return scan_mapped_file(file_path, data)
+
+    # Without candidate literals (or with other line breaks), every line is read and checked.
+    with open(file_path, 'r', encoding='utf-8') as file:
+        return [(file_path, line_number, line.strip()) for line_number, line in enumerate(file) if scan_regex.search(line)]
+
+
+def scan_mapped_file(file_path, data):
+    """
+    Searches the bytes of a memory-mapped file for candidate literals, checking only the lines
+    containing them against the pattern. Lines are only decoded, and line numbers only counted,
+    up to each candidate.
+
+    Files which are not valid UTF-8 are skipped, as when read in text mode. The whole file is only
+    decoded to check this if it has hits, since files without any give the same (empty) result.
+    """
+
+    hits = []
+    line_number = 0
+    counted_to = 0
+    position = 0
+    while True:
+        match = scan_literal_regex.search(data, position)
+        if match is None:
+            if len(hits) > 0 and not is_valid_utf8(data):
+                return []
+            return hits
+
+        # Find the line containing the candidate, and count the lines before it.
+        line_start = data.rfind(b'\n', 0, match.start()) + 1
+        line_end = data.find(b'\n', match.start())
+        line_end = len(data) if line_end == -1 else line_end + 1
+        line_number += data[counted_to:line_start].count(b'\n')
+        counted_to = line_start
+
+        # Check the line as it would be read in text mode.
+        line = data[line_start:line_end].decode('utf-8').replace('\r\n', '\n')
+        if scan_regex.search(line):
+            hits.append((file_path, line_number, line.strip()))
+
+        # Continue after this line, which has been checked.
+        position = line_end
+
+
+def is_valid_utf8(data):
+    """
+    Checks whether the bytes of a memory-mapped file are valid UTF-8, decoding a chunk at a time.
+    """
+
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    try:
+        for start in range(0, len(data), DECODE_CHUNK_SIZE):
+            decoder.decode(data[start:start + DECODE_CHUNK_SIZE])
+        decoder.decode(b'', final=True)
+    except UnicodeDecodeError:
+        return False
+
+    return True
+
+
+def is_binary(block):
+    """
+    Checks whether the first block of a file looks binary: it contains a null byte or is not valid UTF-8.
+    """
+
+    if b'\0' in block:
+        return True
+
+    # The block may end partway through a character, so it is decoded as incomplete input.
+    try:
+        codecs.getincrementaldecoder('utf-8')().decode(block, final=False)
+    except UnicodeDecodeError:
+        return True
+
+    return False
@@ -0,0 +1,238 @@
+import json
+import time
+import threading
+
+
+class SyncHandler:
+    """
+    Uploads the local database to the Replit Migrator Database Server in a background thread,
+    so that local writes return immediately instead of waiting for the network. Also refreshes
+    the local database from the server in the background, so that startup is not delayed.
+
+    Sync requests are debounced: each request delays the upload until no further request
+    has arrived for a short period, so a burst of writes (ex. a chat exchange) is coalesced
+    into a single upload. Failed uploads are retried with exponential backoff.
+    """
+
+    # Possible sync statuses.
+    IDLE = 'idle'
+    PENDING = 'pending'
+    SYNCING = 'syncing'
+    REFRESHING = 'refreshing'
+    SYNCED = 'synced'
+    FAILED = 'failed'
+
+
+    def __init__(self, data_handler, debounce=2, min_retry_delay=5, max_retry_delay=300):
+        # Initialize core attributes from parameters.
+        self.data_handler = data_handler
+        self.debounce = debounce
+        self.min_retry_delay = min_retry_delay
+        self.max_retry_delay = max_retry_delay
+
+        # Time (from time.monotonic()) at which the next upload is due, or None if no upload is queued.
+        # Guarded by the condition, which also wakes the worker when a sync is requested.
+        self.condition = threading.Condition()
+        self.due_time = None
+        self.refresh_requested = False
+        self.stopping = False
+
+        # Describe the state of syncing, for display by the GUI.
+        self.status = self.IDLE
+        self.last_synced_at = None
+        self.last_error = None
+        self.failed_attempts = 0
+
+        # Incremented whenever a refresh changes the local database, so that the GUI can redraw.
+        self.refresh_count = 0
+
+        # Start worker thread. It is a daemon so that it never keeps the application open.
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+
+    def request_sync(self):
+        """
+        Queues an upload of the local database, returning immediately.
+        """
+
+        with self.condition:
+            # Push back any queued upload, so that bursts of requests result in a single upload.
+            self.due_time = time.monotonic() + self.debounce
+            if self.status != self.SYNCING:
+                self.status = self.PENDING
+            self.condition.notify()
+
+
+    def request_refresh(self):
+        """
+        Queues a download of the server's copy of the database, returning immediately.
+        The download is skipped cheaply by the server if the local copy is already up to date.
+        """
+
+        with self.condition:
+            self.refresh_requested = True
+            self.condition.notify()
+
+
+    def stop(self, flush=True, timeout=10):
+        """
+        Stops the worker thread. If flush is True, a queued upload is performed immediately
+        (waiting up to timeout seconds) so that recent changes are not lost on exit.
+        """
+
+        with self.condition:
+            self.stopping = True
+            if not flush:
+                self.due_time = None
+            elif self.due_time is not None:
+                self.due_time = time.monotonic()
+            self.condition.notify()
+
+        self.thread.join(timeout)
+
+
+    def run(self):
+        """
+        Runs the worker thread, closing its database connection once stopped.
+        """
+
+        try:
+            self.process_requests()
+        finally:
+            self.data_handler.close_thread_connection()
+
+
+    def process_requests(self):
+        """
+        Performs queued refreshes and uploads until stopped. Runs in the worker thread.
+        """
+
+        while True:
+            with self.condition:
+                # Wait until a refresh is requested or an upload is due, or until stopped with nothing queued.
+                while not self.refresh_requested:
+                    if self.due_time is None:
+                        if self.stopping:
+                            return
+                        self.condition.wait()
+                        continue
+                    remaining = self.due_time - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self.condition.wait(remaining)
+
+                # Refreshes are performed before uploads, leaving any queued upload for later.
+                if self.refresh_requested:
+                    self.refresh_requested = False
+                    previous_status = self.status
+                    self.status = self.REFRESHING
+                else:
+                    previous_status = None
+                    self.due_time = None
+                    self.status = self.SYNCING
+
+            if previous_status is not None:
+                self.refresh()
+                with self.condition:
+                    self.status = self.PENDING if self.due_time is not None else previous_status
+                continue
+
+            succeeded = self.upload()
+
+            with self.condition:
+                if succeeded:
+                    self.failed_attempts = 0
+                    # Another request may have arrived during the upload.
+                    self.status = self.PENDING if self.due_time is not None else self.SYNCED
+                else:
+                    self.failed_attempts += 1
+                    self.status = self.FAILED
+                    # Retry later, unless a newer request is already queued or the application is exiting.
+                    if self.due_time is None and not self.stopping:
+                        self.due_time = time.monotonic() + self.get_retry_delay()
+
+
+    def upload(self):
+        """
+        Uploads the local database if the user is logged in. Returns True on success.
+        """
+
+        try:
+            # Skip syncing if the user has logged out since the request.
+            if not self.data_handler.check_if_logged_in():
+                return True
+            login_details = self.data_handler.read_login_details()
+            response = self.data_handler.upload_database_to_server(login_details['username'], login_details['password'])
+        except Exception as e:
+            # Network or database error.
+            self.last_error = f'{type(e).__name__}: {e}'
+            return False
+
+        # Check for error, which the server reports either by status code or in a JSON response.
+        if response is not None:
+            if response.status_code >= 400:
+                self.last_error = f'Server responded with status {response.status_code}.'
+                return False
+            try:
+                response_json = json.loads(response.text)
+            except ValueError:
+                response_json = None
+            if isinstance(response_json, dict) and response_json.get('status') == 'error':
+                self.last_error = response_json.get('message')
+                return False
+
+        # Nothing to upload, or upload acknowledged.
+        self.last_synced_at = time.time()
+        self.last_error = None
+        return True
+
+
+    def refresh(self):
+        """
+        Downloads the server's copy of the database if the user is logged in.
+        """
+
+        try:
+            if not self.data_handler.check_if_logged_in():
+                return
+            login_details = self.data_handler.read_login_details()
+
+            # Loading downloaded data logs changes, so an unchanged sequence means the server had nothing new.
+            latest_change_seq = self.data_handler.get_latest_change_seq()
+            error_message = self.data_handler.download_database_from_server(login_details['username'], login_details['password'])
+            if error_message is not None:
+                self.last_error = error_message
+            elif self.data_handler.get_latest_change_seq() != latest_change_seq:
+                with self.condition:
+                    self.refresh_count += 1
+        except Exception as e:
+            # Network or database error. The local copy remains usable.
+            self.last_error = f'{type(e).__name__}: {e}'
+
+
+    def get_retry_delay(self):
+        """
+        Returns the number of seconds to wait before retrying, doubling with each consecutive failure.
+        """
+
+        return min(self.min_retry_delay * 2 ** (self.failed_attempts - 1), self.max_retry_delay)
+
+
+    def describe_status(self):
+        """
+        Returns a short, human readable description of the sync status.
+        """
+
+        with self.condition:
+            if self.status == self.PENDING:
+                return 'Cloud sync: changes waiting to upload...'
+            if self.status == self.SYNCING:
+                return 'Cloud sync: uploading changes...'
+            if self.status == self.REFRESHING:
+                return 'Cloud sync: checking for updates...'
+            if self.status == self.FAILED:
+                return f'Cloud sync: upload failed, retrying automatically. ({self.last_error})'
+            if self.status == self.SYNCED:
+                return f'Cloud sync: up to date as of {time.strftime("%H:%M:%S", time.localtime(self.last_synced_at))}.'
+            return 'Cloud sync: up to date.'
@@ -0,0 +1,70 @@
+"""
+Encoding of sync payloads exchanged with the Replit Migrator Database Server's streaming endpoint.
+
+A payload is a gzip-compressed stream of newline-delimited JSON records, each describing one row:
+{"table": "projects", "row": {...}} to upsert a row, or {"table": "projects", "delete": key} to delete one.
+Downloads begin with a {"version": ...} record, and uploads with a {"username": ..., "password": ...} record
+(also holding "base_version" for a delta upload), so that credentials are sent in the body rather than the URL.
+Records are encoded and decoded incrementally, so neither side needs to hold the whole payload in memory.
+"""
+
+import json
+import zlib
+
+
+# Size of uncompressed data buffered before compressing and yielding a chunk.
+CHUNK_SIZE = 64 * 1024
+
+# Window bits selecting the gzip container format in zlib.
+GZIP_WBITS = 16 + zlib.MAX_WBITS
+
+
+def encode_records(records, chunk_size=CHUNK_SIZE):
+    """
+    Encodes an iterable of records as gzip-compressed NDJSON, yielding chunks of compressed bytes.
+    """
+
+    compressor = zlib.compressobj(wbits=GZIP_WBITS)
+    buffer = []
+    buffered_size = 0
+
+    for record in records:
+        line = (json.dumps(record, separators=(',', ':')) + '\n').encode('utf-8')
+        buffer.append(line)
+        buffered_size += len(line)
+
+        # Compress buffered lines once enough have accumulated.
+        if buffered_size >= chunk_size:
+            compressed = compressor.compress(b''.join(buffer))
+            buffer = []
+            buffered_size = 0
+            if compressed:
+                yield compressed
+
+    # Compress remaining lines and finish the gzip stream.
+    yield compressor.compress(b''.join(buffer)) + compressor.flush()
+
+
+def decode_records(chunks, compressed=True):
+    """
+    Decodes chunks of (optionally gzip-compressed) NDJSON bytes, yielding records as they are completed.
+    """
+
+    decompressor = zlib.decompressobj(wbits=GZIP_WBITS) if compressed else None
+    partial_line = b''
+
+    for chunk in chunks:
+        data = decompressor.decompress(chunk) if compressed else chunk
+
+        # Yield all complete lines, keeping the incomplete last line until more data arrives.
+        lines = (partial_line + data).split(b'\n')
+        partial_line = lines.pop()
+        for line in lines:
+            if line:
+                yield json.loads(line)
+
+    # Yield final line, if not terminated by a newline.
+    if compressed:
+        partial_line += decompressor.flush()
+    if partial_line.strip():
+        yield json.loads(partial_line)
@@ -0,0 +1,267 @@
+"""
+Tests for DatabaseHandler: the change log of rows changed since the last sync, the cache of project reads,
+merging loaded data, and exporting and importing data.
+
+Run from the top level directory with `python -m pytest` (or `python -m unittest`).
+"""
+
+import os
+import tempfile
+import unittest
+
+from replit_migrator.database_handler import DatabaseHandler
+from replit_migrator.project_record import ProjectRecord
+
+
+class ChangeLogTest(unittest.TestCase):
+    """
+    Tests that changes are only logged while a delta upload may need them, and that the log is trimmed.
+    """
+
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        self.db_path = os.path.join(self.temp_dir.name, 'db.sqlite3')
+        self.data_handler = self.open_database()
+
+
+    def open_database(self):
+        data_handler = DatabaseHandler(self.db_path, 'http://127.0.0.1:9/')
+        self.addCleanup(data_handler.close)
+        return data_handler
+
+
+    def count_changes(self):
+        return self.data_handler.cursor.execute('SELECT COUNT(*) FROM change_log;').fetchone()[0]
+
+
+    def test_not_logged_before_sync(self):
+        # The first upload sends the whole database, so nothing needs logging.
+        self.data_handler.create_migration_table('2024-01-01 00:00:00', 'user')
+        self.data_handler.append_chat_messages([{'role': 'user', 'content': 'hi'}], 1)
+        self.assertEqual(self.count_changes(), 0)
+
+
+    def test_logged_after_versioned_sync_and_trimmed(self):
+        self.data_handler.write_sync_state('user', 1, self.data_handler.get_latest_change_seq())
+        self.data_handler.create_migration_table('2024-01-01 00:00:00', 'user')
+        self.data_handler.append_chat_messages([{'role': 'user', 'content': 'hi'}], 1)
+        self.assertEqual(self.count_changes(), 2)
+
+        # Acknowledged changes are removed; later ones are kept.
+        synced_seq = self.data_handler.get_latest_change_seq()
+        self.data_handler.append_chat_messages([{'role': 'assistant', 'content': 'hello'}], 1)
+        self.data_handler.write_sync_state('user', 2, synced_seq)
+        self.assertEqual(self.count_changes(), 1)
+
+
+    def test_not_logged_after_unversioned_sync(self):
+        # Servers without versioning are always sent the whole database.
+        self.data_handler.write_sync_state('user', None, self.data_handler.get_latest_change_seq())
+        self.data_handler.create_migration_table('2024-01-01 00:00:00', 'user')
+        self.assertEqual(self.count_changes(), 0)
+
+
+    def test_not_logged_for_local_columns(self):
+        self.data_handler.write_sync_state('user', 1, self.data_handler.get_latest_change_seq())
+        migration_id = self.data_handler.create_migration_table('2024-01-01 00:00:00', 'user')
+        changes = self.count_changes()
+
+        # Pins are not synced.
+        self.data_handler.set_migration_pinned(migration_id)
+        self.assertEqual(self.count_changes(), changes)
+
+
+    def test_stale_entries_removed_at_startup(self):
+        # Ex. entries logged by an older version, which logged every change.
+        with self.data_handler.conn:
+            self.data_handler.cursor.execute("INSERT INTO change_log (table_name, row_id, row_name) VALUES ('migrations', 1, NULL);")
+        self.data_handler.close()
+
+        self.data_handler = self.open_database()
+        self.assertEqual(self.count_changes(), 0)
+
+
+    def test_cleared_on_logout(self):
+        self.data_handler.write_sync_state('user', 1, self.data_handler.get_latest_change_seq())
+        self.data_handler.create_migration_table('2024-01-01 00:00:00', 'user')
+        self.assertGreater(self.count_changes(), 0)
+
+        self.data_handler.delete_login_details()
+        self.assertEqual(self.count_changes(), 0)
+
+
+class ProjectCacheTest(unittest.TestCase):
+    """
+    Tests that cached project reads stay bounded in number of migrations.
+    """
+
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        self.data_handler = DatabaseHandler(os.path.join(self.temp_dir.name, 'db.sqlite3'), 'http://127.0.0.1:9/')
+        self.addCleanup(self.data_handler.close)
+
+        self.migration_ids = []
+        for i in range(5):
+            migration_id = self.data_handler.create_migration_table(f'2024-01-0{i + 1} 00:00:00', 'user')
+            self.data_handler.write_projects({'demo': ProjectRecord('demo', '', 'https://replit.com/@user/demo', '2 days ago', f'{i + 1} KiB')}, migration_id)
+            self.migration_ids.append(migration_id)
+
+
+    def get_cached_project_tables(self):
+        return [key[1] for key in self.data_handler.cache if isinstance(key, tuple) and key[0] == 'projects']
+
+
+    def test_least_recently_read_projects_are_evicted(self):
+        for migration_id in self.migration_ids:
+            self.assertEqual(self.data_handler.read_shared_projects(migration_id)['demo'].size, f'{migration_id} KiB')
+        self.assertEqual(self.get_cached_project_tables(), self.migration_ids[-DatabaseHandler.MAX_CACHED_PROJECT_TABLES:])
+
+        # Reading a cached migration again makes it the most recently read.
+        self.data_handler.read_shared_projects(self.migration_ids[-2])
+        self.data_handler.read_shared_projects(self.migration_ids[0])
+        self.assertEqual(self.get_cached_project_tables(), [self.migration_ids[-2], self.migration_ids[0]])
+
+
+    def test_full_export_is_not_cached(self):
+        data = self.data_handler.convert_database_to_dict()
+        self.assertEqual([migration['projects']['demo']['size'] for migration in data['migrations']], [f'{id} KiB' for id in self.migration_ids])
+        self.assertEqual(self.get_cached_project_tables(), [])
+
+
+class MergeTest(unittest.TestCase):
+    """
+    Tests that merging loaded data removes what this machine recorded for migrations the data no longer has.
+    """
+
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        self.data_handler = DatabaseHandler(os.path.join(self.temp_dir.name, 'db.sqlite3'), 'http://127.0.0.1:9/')
+        self.addCleanup(self.data_handler.close)
+
+        # Record two migrations of one project, each with its own extracted file, fingerprint and indexed content.
+        self.migration_ids = []
+        for i in range(2):
+            migration_id = self.data_handler.create_migration_table(f'2024-01-0{i + 1} 00:00:00', 'user')
+            self.data_handler.write_projects({'demo': ProjectRecord('demo', '', 'https://replit.com/@user/demo', '2 days ago', '1 KiB')}, migration_id)
+            self.data_handler.write_file_stats(migration_id, f'output/{migration_id}/demo', [{
+                'relative_path': 'main.py', 'name': 'main.py', 'extension': '.py', 'size': 6, 'mtime': 1000,
+                'line_count': 1, 'is_text': True, 'content_hash': f'hash{migration_id}'
+            }])
+            self.data_handler.write_fingerprint(f'output/{migration_id}/demo', 100, 'crc', migration_id)
+            if self.data_handler.content_index_supported:
+                self.data_handler.write_indexed_lines(f'hash{migration_id}', [f'print({migration_id})\n'])
+            self.migration_ids.append(migration_id)
+
+
+    def load_without_last_migration(self, replacement=None):
+        data = self.data_handler.convert_database_to_dict()
+        data['migrations'].pop()
+        if replacement is not None:
+            data['migrations'].append(replacement)
+        self.data_handler.load_database_from_dict(data)
+
+
+    def assert_migration_files_removed(self, migration_id, removed):
+        files = self.data_handler.read_file_signatures(migration_id)
+        fingerprint = self.data_handler.read_fingerprint(f'output/{migration_id}/demo')
+        if removed:
+            self.assertEqual((files, fingerprint), ({}, None))
+        else:
+            self.assertEqual((len(files), fingerprint), (1, {'zip_size': 100, 'crc_digest': 'crc'}))
+
+        if self.data_handler.content_index_supported:
+            content_hashes = [row[0] for row in self.data_handler.cursor.execute('SELECT content_hash FROM file_contents;')]
+            self.assertEqual(f'hash{migration_id}' not in content_hashes, removed)
+
+
+    def test_removed_migration(self):
+        self.load_without_last_migration()
+
+        self.assertEqual([migration['id'] for migration in self.data_handler.get_migration_tables()], self.migration_ids[:1])
+        self.assert_migration_files_removed(self.migration_ids[0], removed=False)
+        self.assert_migration_files_removed(self.migration_ids[1], removed=True)
+
+
+    def test_replaced_migration(self):
+        # Ex. a migration made on another machine, which was given the same id by the server.
+        self.load_without_last_migration({'id': self.migration_ids[1], 'date_time': '2024-02-01 00:00:00', 'account': 'user', 'projects': {}})
+
+        self.assertEqual(self.data_handler.get_migration_tables()[-1]['date_time'], '2024-02-01 00:00:00')
+        self.assert_migration_files_removed(self.migration_ids[0], removed=False)
+        self.assert_migration_files_removed(self.migration_ids[1], removed=True)
+
+
+    def test_unchanged_migrations_are_kept(self):
+        self.data_handler.load_database_from_dict(self.data_handler.convert_database_to_dict())
+
+        for migration_id in self.migration_ids:
+            self.assert_migration_files_removed(migration_id, removed=False)
+
+
+class ExportTest(unittest.TestCase):
+    """
+    Tests that importing an exported file restores the exported data.
+    """
+
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        self.data_handler = self.open_database('db.sqlite3')
+
+        for i in range(3):
+            migration_id = self.data_handler.create_migration_table(f'2024-01-0{i + 1} 00:00:00', 'user')
+            self.data_handler.write_projects({
+                'demo': ProjectRecord('demo', 'A demo', 'https://replit.com/@user/demo', '2 days ago', f'{i + 1} KiB'),
+                'héllo': ProjectRecord('héllo', '', 'https://replit.com/@user/hello', '3 hours ago', '12 MiB')
+            }, migration_id)
+        self.data_handler.append_chat_messages([{'role': 'user', 'content': 'hi\nthere'}, {'role': 'assistant', 'content': 'hello'}], 1)
+
+
+    def open_database(self, name):
+        data_handler = DatabaseHandler(os.path.join(self.temp_dir.name, name), 'http://127.0.0.1:9/')
+        self.addCleanup(data_handler.close)
+        return data_handler
+
+
+    def assert_round_trip(self, file_name):
+        file_path = os.path.join(self.temp_dir.name, file_name)
+        # 3 migrations, 6 projects and 2 messages.
+        self.assertEqual(self.data_handler.export_database_to_file(file_path), 11)
+
+        other_handler = self.open_database('other.sqlite3')
+        other_handler.create_migration_table('2023-01-01 00:00:00', 'other')
+        self.assertEqual(other_handler.import_database_from_file(file_path), 11)
+        # Imported data replaces existing data.
+        self.assertEqual(other_handler.convert_database_to_dict(), self.data_handler.convert_database_to_dict())
+
+
+    def test_round_trip(self):
+        self.assert_round_trip('export.ndjson')
+
+
+    def test_compressed_round_trip(self):
+        self.assert_round_trip('export.ndjson.gz')
+
+
+    def test_malformed_file_changes_nothing(self):
+        file_path = os.path.join(self.temp_dir.name, 'export.ndjson')
+        self.data_handler.export_database_to_file(file_path)
+        with open(file_path, 'a', encoding='utf-8') as file:
+            file.write('{"table": "projects", "row": \n')
+
+        other_handler = self.open_database('other.sqlite3')
+        other_handler.create_migration_table('2023-01-01 00:00:00', 'other')
+        with self.assertRaises(ValueError):
+            other_handler.import_database_from_file(file_path)
+        self.assertEqual([migration['account'] for migration in other_handler.get_migration_tables()], ['other'])
+
+
+if __name__ == '__main__':
+    unittest.main()
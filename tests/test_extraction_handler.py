@@ -0,0 +1,241 @@
+"""
+Tests for ExtractionHandler: streaming zip members to disk within size limits, computing file statistics while
+streaming, and checking whether a folder still matches the zip file it was extracted from.
+
+Run from the top level directory with `python -m pytest` (or `python -m unittest`).
+"""
+
+import contextlib
+import hashlib
+import io
+import os
+import tempfile
+import unittest
+import zipfile
+from unittest import mock
+
+from replit_migrator import config
+from replit_migrator.extraction_handler import ExtractionHandler
+
+
+class ExtractionTestCase(unittest.TestCase):
+    """
+    Base class for tests which extract zip files written to a temporary directory.
+    """
+
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        self.zip_path = os.path.join(self.temp_dir.name, 'demo.zip')
+        self.extract_path = os.path.join(self.temp_dir.name, 'output', 'demo')
+
+
+    def write_zip(self, members):
+        """
+        Writes a zip file of the given {member name: bytes} dictionary, with every member modified at the same time.
+        """
+
+        with zipfile.ZipFile(self.zip_path, 'w', zipfile.ZIP_DEFLATED) as zip_ref:
+            for name, content in members.items():
+                zip_ref.writestr(zipfile.ZipInfo(name, date_time=(2024, 1, 2, 3, 4, 6)), content)
+
+
+    def read_extracted(self):
+        """
+        Returns the extracted files as a {relative path: bytes} dictionary.
+        """
+
+        files = {}
+        for root, dirs, file_names in os.walk(self.extract_path):
+            for file_name in file_names:
+                file_path = os.path.join(root, file_name)
+                with open(file_path, 'rb') as file:
+                    files[os.path.relpath(file_path, self.extract_path).replace(os.sep, '/')] = file.read()
+        return files
+
+
+class SizeLimitTest(ExtractionTestCase):
+    """
+    Tests that members are streamed in chunks, and that members exceeding the size limits are skipped.
+    """
+
+
+    def test_chunked_extraction(self):
+        members = {'main.py': b'print("hello")\n' * 100, 'src/empty.txt': b''}
+        self.write_zip(members)
+
+        result = ExtractionHandler(chunk_size=7).extract(self.zip_path, self.extract_path)
+        self.assertEqual(self.read_extracted(), members)
+        self.assertEqual((result['extracted_files'], result['extracted_bytes'], result['skipped']), (2, 1500, []))
+
+
+    def test_file_size_limit(self):
+        self.write_zip({'big.bin': b'x' * 101, 'small.txt': b'x' * 100})
+
+        result = ExtractionHandler(max_file_size=100).extract(self.zip_path, self.extract_path)
+        self.assertEqual(result['skipped'], [('big.bin', 'exceeds per-file size limit')])
+        self.assertEqual(list(self.read_extracted()), ['small.txt'])
+
+
+    def test_project_size_limit(self):
+        self.write_zip({'a.txt': b'x' * 40, 'b.txt': b'x' * 40, 'c.txt': b'x' * 40, 'd.txt': b'x' * 20})
+
+        # Members which fit in the remaining space are still extracted.
+        result = ExtractionHandler(max_project_size=100).extract(self.zip_path, self.extract_path)
+        self.assertEqual(result['skipped'], [('c.txt', 'exceeds per-project size limit')])
+        self.assertEqual(result['extracted_bytes'], 100)
+        self.assertEqual(sorted(self.read_extracted()), ['a.txt', 'b.txt', 'd.txt'])
+
+
+    def test_limit_enforced_while_streaming(self):
+        # The size declared in an archive may be wrong, so the limit is also checked against the bytes read.
+        handler = ExtractionHandler(chunk_size=16)
+        self.assertIsNone(handler.read_content_stats(io.BytesIO(b'x' * 100), io.BytesIO(), limit=50))
+        self.assertEqual(handler.read_content_stats(io.BytesIO(b'x' * 50), io.BytesIO(), limit=50)[0], 50)
+
+
+    def test_unsafe_paths(self):
+        self.write_zip({'../evil.txt': b'x', 'main.py': b'x'})
+
+        result = ExtractionHandler().extract(self.zip_path, self.extract_path)
+        self.assertEqual(result['skipped'], [('../evil.txt', 'unsafe path')])
+        self.assertFalse(os.path.exists(os.path.join(self.temp_dir.name, 'output', 'evil.txt')))
+
+
+class FileStatsTest(ExtractionTestCase):
+    """
+    Tests the statistics computed for each file as it is extracted.
+    """
+
+
+    def extract_stats(self, members, chunk_size=None):
+        self.write_zip(members)
+        result = ExtractionHandler(chunk_size=chunk_size).extract(self.zip_path, self.extract_path)
+        return {file['relative_path']: file for file in result['files']}
+
+
+    def test_stats(self):
+        content = 'print("héllo")\nprint("world")\n'.encode('utf-8')
+        file = self.extract_stats({'src/main.py': content})['src/main.py']
+
+        self.assertEqual(file, {
+            'relative_path': 'src/main.py',
+            'name': 'main.py',
+            'extension': 'py',
+            'size': len(content),
+            'mtime': file['mtime'],
+            'line_count': 2,
+            'is_text': True,
+            'content_hash': hashlib.sha256(content).hexdigest()
+        })
+        # Extracted files keep the modification time recorded in the zip file.
+        self.assertEqual(int(os.stat(os.path.join(self.extract_path, 'src', 'main.py')).st_mtime), file['mtime'])
+
+
+    def test_line_counts(self):
+        files = self.extract_stats({'empty.txt': b'', 'unterminated.txt': b'a\nb', 'blank.txt': b'\n\n'})
+        self.assertEqual({path: file['line_count'] for path, file in files.items()}, {'empty.txt': 0, 'unterminated.txt': 2, 'blank.txt': 2})
+
+
+    def test_binary_files(self):
+        # Binary files have no line count.
+        files = self.extract_stats({'null.bin': b'abc\0def\n', 'latin1.txt': 'café\n'.encode('latin-1'), 'truncated.txt': 'é'.encode('utf-8')[:1]})
+        self.assertEqual({path: (file['is_text'], file['line_count']) for path, file in files.items()},
+                         {'null.bin': (False, None), 'latin1.txt': (False, None), 'truncated.txt': (False, None)})
+
+
+    def test_characters_split_across_chunks(self):
+        content = 'héllo wörld\n'.encode('utf-8') * 10
+        for chunk_size in (1, 2, 3):
+            self.assertTrue(self.extract_stats({'main.txt': content}, chunk_size=chunk_size)['main.txt']['is_text'])
+
+
+    def test_files_on_disk_match_extracted_stats(self):
+        # Statistics of files read back from disk (ex. after being edited) are computed the same way.
+        file = self.extract_stats({'src/main.py': b'print("hello")\n'})['src/main.py']
+        self.assertEqual(ExtractionHandler().read_file_stats(os.path.join(self.extract_path, 'src', 'main.py'), 'src/main.py'), file)
+
+
+class ReextractionTest(ExtractionTestCase):
+    """
+    Tests that extracting over a previous extraction leaves exactly the zip file's files, and detecting edited trees.
+    """
+
+
+    def setUp(self):
+        super().setUp()
+        self.handler = ExtractionHandler()
+        self.write_zip({'main.py': b'print("hello")\n', 'src/util.py': b'pass\n'})
+        self.handler.extract(self.zip_path, self.extract_path)
+
+
+    def test_stale_files_removed(self):
+        # Ex. a file since deleted from the Repl.
+        self.write_zip({'main.py': b'print("goodbye")\n'})
+
+        result = self.handler.extract(self.zip_path, self.extract_path)
+        self.assertEqual(result['removed_files'], 1)
+        self.assertEqual(self.read_extracted(), {'main.py': b'print("goodbye")\n'})
+
+
+    def test_unchanged_tree(self):
+        self.assertTrue(self.handler.check_extracted(self.zip_path, self.extract_path))
+
+
+    def test_edited_tree(self):
+        main_path = os.path.join(self.extract_path, 'main.py')
+        with open(main_path, 'ab') as file:
+            file.write(b'print("edited")\n')
+        self.assertFalse(self.handler.check_extracted(self.zip_path, self.extract_path))
+
+
+    def test_touched_file(self):
+        main_path = os.path.join(self.extract_path, 'main.py')
+        os.utime(main_path, (1000, 1000))
+        self.assertFalse(self.handler.check_extracted(self.zip_path, self.extract_path))
+
+
+    def test_added_and_deleted_files(self):
+        with open(os.path.join(self.extract_path, 'notes.txt'), 'wb') as file:
+            file.write(b'notes\n')
+        self.assertFalse(self.handler.check_extracted(self.zip_path, self.extract_path))
+
+        os.remove(os.path.join(self.extract_path, 'notes.txt'))
+        os.remove(os.path.join(self.extract_path, 'src', 'util.py'))
+        self.assertFalse(self.handler.check_extracted(self.zip_path, self.extract_path))
+
+
+    def test_fingerprint(self):
+        fingerprint = self.handler.compute_fingerprint(self.zip_path)
+        self.assertEqual(self.handler.compute_fingerprint(self.zip_path), fingerprint)
+
+        self.write_zip({'main.py': b'print("hellO")\n', 'src/util.py': b'pass\n'})
+        self.assertNotEqual(self.handler.compute_fingerprint(self.zip_path), fingerprint)
+
+
+class SizeLimitConfigTest(unittest.TestCase):
+    """
+    Tests reading size limits from environment variables.
+    """
+
+
+    def read_int_env(self, value):
+        with mock.patch.dict(os.environ, {'REPLIT_MAX_FILE_SIZE': value}), contextlib.redirect_stdout(io.StringIO()):
+            return config.read_int_env('REPLIT_MAX_FILE_SIZE')
+
+
+    def test_valid(self):
+        self.assertEqual(self.read_int_env('1048576'), 1048576)
+        self.assertEqual(self.read_int_env('0'), 0)
+
+
+    def test_unset_or_malformed(self):
+        # The default limit applies, rather than failing at startup.
+        self.assertIsNone(self.read_int_env(''))
+        self.assertIsNone(self.read_int_env('10MB'))
+        self.assertIsNone(self.read_int_env('-1'))
+
+
+if __name__ == '__main__':
+    unittest.main()
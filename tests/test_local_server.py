@@ -0,0 +1,127 @@
+"""
+Tests for syncing DatabaseHandler with the Replit Migrator Database Server, run locally as a LocalServer.
+
+Run from the top level directory with `python -m pytest` (or `python -m unittest`).
+"""
+
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from replit_migrator.database_handler import DatabaseHandler
+from replit_migrator.local_server import LocalServer
+from replit_migrator.project_record import ProjectRecord
+
+
+class SyncTest(unittest.TestCase):
+    """
+    Tests full and delta uploads, and downloads, against a server with (or without) the streaming endpoint.
+    """
+
+    streaming = True
+
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+
+        self.server = LocalServer(streaming=self.streaming)
+        self.server.add_user('user', 'secret')
+        self.server.start()
+        self.addCleanup(self.server.stop)
+
+        self.data_handler = self.open_database('device1.sqlite3')
+        migration_id = self.data_handler.create_migration_table('2024-01-01 00:00:00', 'user')
+        self.data_handler.write_projects({'demo': ProjectRecord('demo', '', 'https://replit.com/@user/demo', '2 days ago', '1 KiB')}, migration_id)
+        self.data_handler.append_chat_messages([{'role': 'user', 'content': 'hi'}], 1)
+
+
+    def open_database(self, name):
+        data_handler = DatabaseHandler(os.path.join(self.temp_dir.name, name), self.server.url)
+        self.addCleanup(data_handler.close)
+        return data_handler
+
+
+    def read_server_messages(self):
+        return [message['content'] for message in self.server.get_data('user', 'secret')['chat_history']]
+
+
+    def test_full_upload(self):
+        self.data_handler.upload_database_to_server('user', 'secret')
+
+        data = self.server.get_data('user', 'secret')
+        self.assertEqual(data['version'], 1)
+        self.assertEqual([list(migration['projects']) for migration in data['migrations']], [['demo']])
+        self.assertEqual(self.read_server_messages(), ['hi'])
+        self.assertEqual(self.data_handler.read_sync_state('user')['server_version'], 1)
+
+
+    def test_delta_upload(self):
+        self.data_handler.upload_database_to_server('user', 'secret')
+
+        # Only the new message is sent.
+        self.data_handler.append_chat_messages([{'role': 'assistant', 'content': 'hello'}], 1)
+        with mock.patch.object(self.server, 'put_data', wraps=self.server.put_data) as put_data:
+            self.data_handler.upload_database_to_server('user', 'secret')
+        put_data.assert_not_called()
+        self.assertEqual(self.read_server_messages(), ['hi', 'hello'])
+        self.assertEqual(self.data_handler.read_sync_state('user')['server_version'], 2)
+
+        # Nothing changed since, so nothing is uploaded.
+        self.assertIsNone(self.data_handler.upload_database_to_server('user', 'secret'))
+
+
+    def test_rejected_delta_falls_back_to_full_upload(self):
+        self.data_handler.upload_database_to_server('user', 'secret')
+
+        # Another device changes the server's copy, so changes since the version this device synced no longer apply.
+        other_handler = self.open_database('device2.sqlite3')
+        other_handler.upload_database_to_server('user', 'secret')
+
+        self.data_handler.append_chat_messages([{'role': 'assistant', 'content': 'hello'}], 1)
+        self.data_handler.upload_database_to_server('user', 'secret')
+        self.assertEqual(self.read_server_messages(), ['hi', 'hello'])
+        self.assertEqual(self.data_handler.read_sync_state('user')['server_version'], 3)
+
+
+    def test_download(self):
+        self.data_handler.upload_database_to_server('user', 'secret')
+
+        other_handler = self.open_database('device2.sqlite3')
+        self.assertIsNone(other_handler.download_database_from_server('user', 'secret'))
+        self.assertEqual(other_handler.convert_database_to_dict(), self.data_handler.convert_database_to_dict())
+        self.assertEqual(other_handler.read_sync_state('user')['server_version'], 1)
+
+
+    def test_unchanged_download_is_not_sent(self):
+        self.data_handler.upload_database_to_server('user', 'secret')
+        self.assertIsNone(self.data_handler.download_database_from_server('user', 'secret'))
+
+        # The server responds with 304 Not Modified, without a body, and nothing is reloaded.
+        self.server.reset_traffic()
+        with mock.patch.object(self.data_handler, 'load_database_from_records') as load_database_from_records:
+            self.assertIsNone(self.data_handler.download_database_from_server('user', 'secret'))
+        load_database_from_records.assert_not_called()
+        self.assertEqual(self.server.reset_traffic()[1], 0)
+
+
+    def test_bad_credentials(self):
+        self.data_handler.upload_database_to_server('user', 'wrong')
+        self.assertEqual(self.server.get_data('user', 'secret')['version'], 0)
+        self.assertIsNone(self.data_handler.read_sync_state('user')['server_version'])
+
+        self.assertEqual(self.data_handler.download_database_from_server('user', 'wrong'), 'Invalid username or password.')
+        self.assertEqual(len(self.data_handler.get_migration_tables()), 1)
+
+
+class UnstreamedSyncTest(SyncTest):
+    """
+    Runs the sync tests against a server without the streaming endpoint, like an older server.
+    """
+
+    streaming = False
+
+
+if __name__ == '__main__':
+    unittest.main()
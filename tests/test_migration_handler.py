@@ -0,0 +1,109 @@
+"""
+Tests for MigrationHandler: organizing downloaded zip files, skipping projects unchanged since a previous migration.
+
+Run from the top level directory with `python -m pytest` (or `python -m unittest`).
+"""
+
+import os
+import tempfile
+import unittest
+import zipfile
+
+from replit_migrator.database_handler import DatabaseHandler
+from replit_migrator.extraction_handler import ExtractionHandler
+from replit_migrator.migration_handler import MigrationHandler
+from replit_migrator.project_record import ProjectRecord
+
+
+class OrganizeFilesTest(unittest.TestCase):
+    """
+    Tests that rerunning a migration skips extracting projects whose zip file and extracted tree are unchanged.
+    """
+
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        self.output_path = os.path.join(self.temp_dir.name, 'output', '')
+        os.makedirs(self.output_path)
+
+        self.data_handler = DatabaseHandler(os.path.join(self.temp_dir.name, 'db.sqlite3'), 'http://127.0.0.1:9/')
+        self.addCleanup(self.data_handler.close)
+        self.migration_handler = MigrationHandler(self.data_handler, ExtractionHandler(), self.output_path, self.print_status, None)
+        self.migration_handler.projects = {'demo': ProjectRecord('demo', 'folder', 'https://replit.com/@user/demo', '2 days ago', '1 KiB')}
+        self.extract_path = os.path.join(self.output_path, 'folder', 'demo')
+        self.status = []
+
+        self.members = {'main.py': b'print("hello")\n', 'src/util.py': b'pass\n'}
+
+
+    def print_status(self, text, indent=0):
+        self.status.append(text)
+
+
+    def migrate(self, day):
+        """
+        Downloads the project's zip file (as written from self.members) in a new migration, recording its projects
+        as scraping would, and organizes it. Returns the migration's id and the summary of organizing it.
+        """
+
+        with zipfile.ZipFile(os.path.join(self.output_path, 'demo.zip'), 'w') as zip_ref:
+            for name, content in self.members.items():
+                zip_ref.writestr(zipfile.ZipInfo(name, date_time=(2024, 1, 2, 3, 4, 6)), content)
+
+        migration_id = self.data_handler.create_migration_table(f'2024-01-0{day} 00:00:00', 'user', self.output_path)
+        self.data_handler.write_projects(self.migration_handler.projects, migration_id)
+        return migration_id, self.migration_handler.organize_files(migration_id)
+
+
+    def read_recorded_paths(self, migration_id):
+        return sorted(relative_path for project_path, relative_path in self.data_handler.read_file_signatures(migration_id))
+
+
+    def test_unchanged_project_is_skipped(self):
+        migration_id, summary = self.migrate(1)
+        self.assertEqual((summary['extracted_projects'], summary['skipped_projects']), (1, 0))
+
+        # The previous migration's statistics are copied, and the downloaded zip file is removed.
+        migration_id, summary = self.migrate(2)
+        self.assertEqual((summary['extracted_projects'], summary['skipped_projects']), (0, 1))
+        self.assertEqual(self.read_recorded_paths(migration_id), ['main.py', 'src/util.py'])
+        self.assertFalse(os.path.exists(os.path.join(self.output_path, 'demo.zip')))
+
+
+    def test_changed_zip_is_extracted(self):
+        self.migrate(1)
+
+        # Ex. a file deleted from the Repl, which is also removed from the extracted tree.
+        del self.members['src/util.py']
+        migration_id, summary = self.migrate(2)
+        self.assertEqual((summary['extracted_projects'], summary['skipped_projects']), (1, 0))
+        self.assertEqual(self.read_recorded_paths(migration_id), ['main.py'])
+        self.assertFalse(os.path.exists(os.path.join(self.extract_path, 'src', 'util.py')))
+
+
+    def test_edited_tree_is_extracted(self):
+        self.migrate(1)
+        with open(os.path.join(self.extract_path, 'main.py'), 'ab') as file:
+            file.write(b'print("edited")\n')
+
+        # The tree is restored to match the zip file.
+        migration_id, summary = self.migrate(2)
+        self.assertEqual((summary['extracted_projects'], summary['skipped_projects']), (1, 0))
+        with open(os.path.join(self.extract_path, 'main.py'), 'rb') as file:
+            self.assertEqual(file.read(), self.members['main.py'])
+
+
+    def test_project_with_skipped_members_is_extracted(self):
+        # Members skipped for exceeding a size limit are extracted on a later run, ex. once the limit is raised.
+        self.migration_handler.extraction_handler = ExtractionHandler(max_file_size=8)
+        self.migrate(1)
+
+        self.migration_handler.extraction_handler = ExtractionHandler()
+        migration_id, summary = self.migrate(2)
+        self.assertEqual((summary['extracted_projects'], summary['skipped_projects']), (1, 0))
+        self.assertEqual(self.read_recorded_paths(migration_id), ['main.py', 'src/util.py'])
+
+
+if __name__ == '__main__':
+    unittest.main()
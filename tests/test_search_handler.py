@@ -0,0 +1,288 @@
+"""
+Tests for SearchHandler: literal extraction from search patterns, scanning files, background content scans and
+updating the content index.
+
+Run from the top level directory with `python -m pytest` (or `python -m unittest`).
+"""
+
+import os
+import re
+import tempfile
+import unittest
+
+from replit_migrator import search_handler
+from replit_migrator.database_handler import DatabaseHandler
+from replit_migrator.project_record import ProjectRecord
+from replit_migrator.search_handler import SearchHandler, sre_parse
+
+
+class RequiredLiteralsTest(unittest.TestCase):
+    """
+    Tests get_required_literals() and build_index_query().
+    """
+
+
+    def setUp(self):
+        # Literal extraction does not use the database.
+        self.search_handler = SearchHandler(None)
+
+
+    def get_required_literals(self, pattern):
+        return self.search_handler.get_required_literals(sre_parse.parse(pattern))
+
+
+    def test_literal_run(self):
+        self.assertEqual(self.get_required_literals('hello'), 'hello')
+        self.assertEqual(self.get_required_literals(r'^def\s+main'), ('and', ['def', 'main']))
+
+
+    def test_short_literals_are_dropped(self):
+        # Literals shorter than a trigram can't be looked up.
+        self.assertIsNone(self.get_required_literals('ab'))
+        self.assertEqual(self.get_required_literals(r'ab\d+hello'), 'hello')
+
+
+    def test_alternation(self):
+        self.assertEqual(self.get_required_literals('foo|bar'), ('or', ['foo', 'bar']))
+        # A branch without a requirement may match anything, so the alternation requires nothing.
+        self.assertIsNone(self.get_required_literals('foo|b'))
+        self.assertEqual(self.get_required_literals('import (numpy|pandas)'), ('and', ['import ', ('or', ['numpy', 'pandas'])]))
+
+
+    def test_repeats(self):
+        self.assertEqual(self.get_required_literals('(abc)+'), 'abc')
+        self.assertEqual(self.get_required_literals('(abc){2,5}'), 'abc')
+        # Optional repeats need not match at all.
+        self.assertIsNone(self.get_required_literals('(abc)*'))
+        self.assertIsNone(self.get_required_literals('(abc)?'))
+        self.assertEqual(self.get_required_literals('xyz(abc)*'), 'xyz')
+
+
+    def test_global_ignore_case(self):
+        self.assertIsNone(self.get_required_literals('(?i)hello'))
+        self.assertEqual(self.get_required_literals('(?i)abc(?-i:def)'), 'def')
+
+
+    def test_scoped_ignore_case(self):
+        self.assertEqual(self.get_required_literals('(?i:hello)world'), 'world')
+        self.assertEqual(self.get_required_literals('abc(?i:def)ghi'), ('and', ['abc', 'ghi']))
+        self.assertEqual(self.get_required_literals('a(?i:b(?-i:cde))'), 'cde')
+        self.assertIsNone(self.get_required_literals('(?i:hello)|world'))
+
+
+    def test_build_index_query(self):
+        requirement = self.get_required_literals('import (numpy|pandas)')
+        self.assertEqual(self.search_handler.build_index_query(requirement), '("import " AND ("numpy" OR "pandas"))')
+        # Quotes are escaped within phrases.
+        self.assertEqual(self.search_handler.build_index_query('say "hi"'), '"say ""hi"""')
+
+
+class ScanTest(unittest.TestCase):
+    """
+    Tests that scanning memory-mapped files for candidate literals (see scan_mapped_file()) finds
+    the same lines as reading them in text mode.
+    """
+
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+
+
+    def write_file(self, name, content):
+        file_path = os.path.join(self.temp_dir.name, name)
+        with open(file_path, 'wb') as file:
+            file.write(content)
+        return file_path
+
+
+    def scan(self, pattern, file_path, use_literals):
+        """
+        Scans a file in this process, as a scan worker would, with or without candidate literals.
+        """
+
+        literals = None
+        if use_literals:
+            handler = SearchHandler(None)
+            literals = handler.get_candidate_literals(handler.get_required_literals(sre_parse.parse(pattern)))
+        search_handler.initialize_scan_worker(pattern, literals)
+
+        return search_handler.scan_files([file_path])[1]
+
+
+    def assert_scans_match(self, pattern, file_path):
+        mapped_hits = self.scan(pattern, file_path, use_literals=True)
+        self.assertEqual(mapped_hits, self.scan(pattern, file_path, use_literals=False))
+        return mapped_hits
+
+
+    def test_hits(self):
+        file_path = self.write_file('main.py', 'import os\nprint("héllo world")\n\nprint("hello again")\n'.encode('utf-8'))
+        hits = self.assert_scans_match('hel+o', file_path)
+        self.assertEqual(hits, [(file_path, 3, 'print("hello again")')])
+
+
+    def test_line_endings(self):
+        self.assert_scans_match('hello', self.write_file('crlf.txt', b'first\r\nsay hello\r\nhello\r\n'))
+        self.assert_scans_match('hello', self.write_file('cr.txt', b'first\rsay hello\rlast hello'))
+
+
+    def test_no_trailing_newline(self):
+        self.assert_scans_match('hello$', self.write_file('end.txt', b'a\nb\nsay hello'))
+
+
+    def test_invalid_utf8_after_first_block(self):
+        # Text mode skips the whole file, so the mapped scan must too.
+        file_path = self.write_file('late.txt', b'hello\n' + b'x' * (search_handler.SNIFF_SIZE * 2) + b'\n\xff\n')
+        self.assertEqual(self.assert_scans_match('hello', file_path), [])
+
+
+    def test_binary_and_empty_files(self):
+        self.assertEqual(self.assert_scans_match('hello', self.write_file('data.bin', b'hello\0world\n')), [])
+        self.assertEqual(self.assert_scans_match('hello', self.write_file('empty.txt', b'')), [])
+
+
+class ContentScanTest(unittest.TestCase):
+    """
+    Tests that ContentScan finds hits in every file under a directory using worker processes, and can be cancelled.
+    """
+
+
+    # Seconds to wait for a scan to finish, including starting its worker processes.
+    TIMEOUT = 60
+
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        self.search_handler = SearchHandler(None)
+
+
+    def write_files(self, count):
+        # Spread files over several directories and batches, with a hit in every tenth file.
+        file_paths = []
+        for i in range(count):
+            file_path = os.path.join(self.temp_dir.name, f'project{i % 3}', f'file{i}.py')
+            os.makedirs(os.path.dirname(file_path), exist_ok=True)
+            with open(file_path, 'w', encoding='utf-8') as file:
+                file.write('import os\n' + ('print("hello")\n' if i % 10 == 0 else 'pass\n'))
+            file_paths.append(file_path)
+        return file_paths
+
+
+    def wait(self, scan):
+        scan.thread.join(self.TIMEOUT)
+        self.assertTrue(scan.finished.is_set())
+        self.assertIsNone(scan.error)
+
+
+    def test_hits(self):
+        file_paths = self.write_files(search_handler.ContentScan.BATCH_SIZE * 3)
+        scan = self.search_handler.start_scan('print\\("hel+o"\\)', self.temp_dir.name)
+        self.wait(scan)
+
+        self.assertEqual(scan.scanned_files, len(file_paths))
+        self.assertEqual(sorted(scan.get_hits()), sorted((file_path, 1, 'print("hello")') for file_path in file_paths[::10]))
+        # Hits are only returned once.
+        self.assertEqual(scan.get_hits(), [])
+
+
+    def test_cancel(self):
+        file_paths = self.write_files(search_handler.ContentScan.BATCH_SIZE * 20)
+        scan = self.search_handler.start_scan('hello', self.temp_dir.name)
+        scan.cancel()
+        self.wait(scan)
+
+        # Batches not yet started are dropped.
+        self.assertLess(scan.scanned_files, len(file_paths))
+
+
+    def test_invalid_pattern(self):
+        # Reported before any worker is started.
+        with self.assertRaises(re.error):
+            self.search_handler.start_scan('hello(', self.temp_dir.name)
+
+
+class UpdateIndexTest(unittest.TestCase):
+    """
+    Tests that update_index() records and indexes files changed on disk after extraction.
+    """
+
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+
+        self.data_handler = DatabaseHandler(os.path.join(self.temp_dir.name, 'db.sqlite3'), 'http://127.0.0.1:9/')
+        self.addCleanup(self.data_handler.close)
+        if not self.data_handler.content_index_supported:
+            self.skipTest('SQLite was compiled without FTS5 or its trigram tokenizer.')
+        self.search_handler = SearchHandler(self.data_handler)
+
+        # Record a migration of one project, extracted to the output directory.
+        self.output_path = os.path.join(self.temp_dir.name, 'output', '')
+        self.migration_id = self.data_handler.create_migration_table('2024-01-01 00:00:00', 'user', self.output_path)
+        self.data_handler.write_projects({'demo': ProjectRecord('demo', '', 'https://replit.com/@user/demo', '2 days ago', '1 KiB')}, self.migration_id)
+        self.write_file('main.py', 'print("hello world")\n')
+        self.write_file('docs/readme.md', 'hello docs\n')
+
+
+    def write_file(self, relative_path, content, mtime=None):
+        file_path = os.path.join(self.output_path, 'demo', relative_path)
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        with open(file_path, 'w', encoding='utf-8') as file:
+            file.write(content)
+        if mtime is not None:
+            os.utime(file_path, (mtime, mtime))
+        return file_path
+
+
+    def search(self, pattern):
+        hits = self.search_handler.search_index(pattern, self.output_path)
+        self.assertIsNotNone(hits)
+        return [(relative_path, line_number, line) for output_path, project_path, relative_path, name, line_number, line in hits]
+
+
+    def test_new_files_are_indexed(self):
+        summary = self.search_handler.update_index(self.migration_id, self.output_path)
+        self.assertEqual(summary, {'added_files': 2, 'changed_files': 0, 'deleted_files': 0, 'indexed_files': 2})
+        self.assertEqual(self.search('hello'), [('docs/readme.md', 0, 'hello docs\n'), ('main.py', 0, 'print("hello world")\n')])
+
+        # Nothing changed since, so nothing is reread.
+        summary = self.search_handler.update_index(self.migration_id, self.output_path)
+        self.assertEqual(summary, {'added_files': 0, 'changed_files': 0, 'deleted_files': 0, 'indexed_files': 0})
+
+
+    def test_changed_and_deleted_files(self):
+        self.search_handler.update_index(self.migration_id, self.output_path)
+        self.write_file('main.py', 'print("goodbye world")\n', mtime=1000)
+        os.remove(os.path.join(self.output_path, 'demo', 'docs', 'readme.md'))
+
+        summary = self.search_handler.update_index(self.migration_id, self.output_path)
+        self.assertEqual(summary, {'added_files': 0, 'changed_files': 1, 'deleted_files': 1, 'indexed_files': 1})
+        self.assertEqual(self.search('hello'), [])
+        self.assertEqual(self.search('goodbye'), [('main.py', 0, 'print("goodbye world")\n')])
+
+
+    def test_search_sees_edited_files(self):
+        self.search_handler.update_index(self.migration_id, self.output_path)
+        self.assertEqual(len(self.search('hello')), 2)
+
+        # Files edited after indexing are searched as they are on disk, without reindexing first.
+        self.write_file('main.py', 'print("goodbye world")\n', mtime=1000)
+        self.assertEqual(self.search('hello'), [('docs/readme.md', 0, 'hello docs\n')])
+        self.assertEqual(self.search('goodbye'), [('main.py', 0, 'print("goodbye world")\n')])
+
+
+    def test_touched_files(self):
+        self.search_handler.update_index(self.migration_id, self.output_path)
+        self.write_file('main.py', 'print("hello world")\n', mtime=1000)
+
+        # Only the modification time is updated.
+        summary = self.search_handler.update_index(self.migration_id, self.output_path)
+        self.assertEqual(summary, {'added_files': 0, 'changed_files': 0, 'deleted_files': 0, 'indexed_files': 0})
+        self.assertEqual(self.data_handler.read_file_signatures(self.migration_id)[('demo', 'main.py')][1], 1000)
+
+
+if __name__ == '__main__':
+    unittest.main()
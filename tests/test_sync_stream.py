@@ -0,0 +1,55 @@
+"""
+Tests for sync_stream: encoding and decoding records as gzip-compressed NDJSON.
+
+Run from the top level directory with `python -m pytest` (or `python -m unittest`).
+"""
+
+import gzip
+import unittest
+
+from replit_migrator import sync_stream
+
+
+class RoundTripTest(unittest.TestCase):
+    """
+    Tests that decoding encoded records yields the same records, however the bytes are split into chunks.
+    """
+
+
+    def setUp(self):
+        self.records = [{'version': 3}]
+        self.records += [{'table': 'projects', 'row': {'migration_id': 1, 'name': f'project{i}', 'size': i * 1024}} for i in range(1000)]
+        self.records += [{'table': 'chat_history', 'row': {'id': 1, 'content': 'héllo\nworld'}}, {'table': 'projects', 'delete': [1, 'old']}]
+
+
+    def test_round_trip(self):
+        chunks = list(sync_stream.encode_records(self.records, chunk_size=1024))
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual(list(sync_stream.decode_records(chunks)), self.records)
+
+
+    def test_split_chunks(self):
+        # Records are completed across chunk boundaries, including within multibyte characters.
+        data = b''.join(sync_stream.encode_records(self.records))
+        chunks = [data[i:i + 7] for i in range(0, len(data), 7)]
+        self.assertEqual(list(sync_stream.decode_records(chunks)), self.records)
+
+
+    def test_gzip_format(self):
+        # Payloads are standard gzip, which other implementations of the server can read.
+        data = b''.join(sync_stream.encode_records(self.records))
+        self.assertEqual(gzip.decompress(data).decode('utf-8').splitlines()[0], '{"version":3}')
+
+
+    def test_uncompressed(self):
+        # Ex. a response already decompressed by requests, without a trailing newline.
+        self.assertEqual(list(sync_stream.decode_records([b'{"version":1}\n{"table":', b'"migrations","row":{}}'], compressed=False)),
+                         [{'version': 1}, {'table': 'migrations', 'row': {}}])
+
+
+    def test_empty(self):
+        self.assertEqual(list(sync_stream.decode_records(sync_stream.encode_records([]))), [])
+
+
+if __name__ == '__main__':
+    unittest.main()